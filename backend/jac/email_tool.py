@@ -5,6 +5,8 @@ import logging
 from dotenv import load_dotenv
 from pathlib import Path
 
+import pipeline_trace
+
 # Load environment variables
 # Try loading from default locations
 load_dotenv()
@@ -38,6 +40,7 @@ def send_email_tool(to: str, subject: str, body: str) -> dict:
     smtp_port = int(os.getenv("SMTP_PORT", 587))
     smtp_username = os.getenv("SMTP_USERNAME", "")
     smtp_password = os.getenv("SMTP_PASSWORD", "")
+    smtp_starttls = os.getenv("SMTP_STARTTLS", "true").lower() in ("1", "true", "yes")
 
     try:
         if not smtp_username or not smtp_password:
@@ -50,11 +53,13 @@ def send_email_tool(to: str, subject: str, body: str) -> dict:
         msg['From'] = smtp_username
         msg['To'] = to
 
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(smtp_username, smtp_password)
-        server.sendmail(smtp_username, to, msg.as_string())
-        server.quit()
+        with pipeline_trace.span("smtp.send", **{"smtp.server": smtp_server, "smtp.port": smtp_port}):
+            server = smtplib.SMTP(smtp_server, smtp_port)
+            if smtp_starttls:
+                server.starttls()
+            server.login(smtp_username, smtp_password)
+            server.sendmail(smtp_username, to, msg.as_string())
+            server.quit()
 
         logging.info(f"Email sent successfully to {to}")
         return {"status": "sent", "method": "email"}
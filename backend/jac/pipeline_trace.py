@@ -0,0 +1,60 @@
+import sys
+from pathlib import Path
+
+# Walker side of pipeline tracing. The tracer itself lives with the Python
+# services (backend/python/tracing.py) so every process writes the same
+# OTLP/JSON format to the same file.
+_python_dir = str(Path(__file__).resolve().parent.parent / "python")
+if _python_dir not in sys.path:
+    sys.path.append(_python_dir)
+
+import tracing
+
+tracing.configure("jac_walkers")
+# Every requests.post/get made by a walker gets a client span and carries
+# the walker's traceparent to nlp_service, db_api and notification_service
+tracing.instrument_requests()
+
+span = tracing.span
+
+class WalkerTrace:
+    """
+    Root span of one walker run, active until finish(). Use it as a context
+    manager so the span is exported, and the worker thread's trace context
+    reset, even when the walker raises before reaching finish().
+    """
+
+    def __init__(self, name, attributes=None):
+        self.span = tracing.start_span(name, tracing.KIND_INTERNAL, attributes=attributes, root=True)
+        self._token = tracing.activate(self.span)
+        self.finished = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self.finished:
+            self.finish(error=exc)
+        return False
+
+    def set(self, key, value):
+        self.span.set_attribute(key, value)
+
+    def finish(self, status=None, error=None):
+        if self.finished:
+            return
+        self.finished = True
+        if status is not None:
+            self.span.set_attribute("report.status", status)
+        if error is not None:
+            self.span.record_error(error)
+        tracing.deactivate(self._token)
+        self.span.end()
+
+def start(name, attributes=None):
+    """
+    Start a new trace for a walker:
+        with pipeline_trace.start("IntakeAgent") as trace { ... }
+    finish() records the outcome; leaving the block finishes it otherwise.
+    """
+    return WalkerTrace(name, attributes)
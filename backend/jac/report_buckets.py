@@ -0,0 +1,64 @@
+import threading
+import weakref
+
+# Report nodes created before PostgreSQL became the source of truth hang off
+# per-day ReportBucket nodes (key "YYYY-MM-DD") or, older still, off root.
+# This module caches, per root, the bucket nodes by key and the root-attached
+# reports by day, so walkers that sweep the old graph visit only those shards.
+
+_lock = threading.Lock()
+_indexes = weakref.WeakKeyDictionary()
+
+def bucket_key(submitted_at):
+    """Day bucket for a submitted_at string like '2025-11-02 14:03:11.123'"""
+    return str(submitted_at or "")[:10] or "unknown"
+
+def _kind(node):
+    return type(node).__name__
+
+class BucketIndex:
+    def __init__(self, nodes):
+        self.buckets = {}
+        self.legacy = {}
+        for node in nodes:
+            kind = _kind(node)
+            if kind == "ReportBucket":
+                self.buckets[node.key] = node
+            elif kind == "Report":
+                self.legacy.setdefault(bucket_key(node.submitted_at), []).append(node)
+        self._sorted = None
+
+    def keys_desc(self):
+        if self._sorted is None:
+            self._sorted = sorted(set(self.buckets) | set(self.legacy), reverse=True)
+        return self._sorted
+
+def get_index(graph_root, list_nodes):
+    """Bucket index for a root; list_nodes() (root's out-nodes) is only called on a miss"""
+    try:
+        index = _indexes.get(graph_root)
+    except TypeError:
+        index = None
+    if index is None:
+        with _lock:
+            index = BucketIndex(list_nodes())
+            try:
+                _indexes[graph_root] = index
+            except TypeError:
+                pass  # root can't be weak-referenced; rebuild next time
+    return index
+
+def shard_nodes(graph_root, list_nodes, since_key=None):
+    """
+    Day buckets (plus pre-bucketing reports still on root) newest first, for
+    walkers that `visit` them; organisations and policies are never included
+    """
+    index = get_index(graph_root, list_nodes)
+    nodes = []
+    for key in index.keys_desc():
+        if since_key and key < since_key:
+            break
+        if key in index.buckets:
+            nodes.append(index.buckets[key])
+        nodes.extend(index.legacy.get(key, []))
+    return nodes
@@ -0,0 +1,148 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+import requests
+
+# Read side of the Jac walkers. PostgreSQL (through db_api) is the only copy
+# of report state; walkers read it here and write status changes through
+# update_report(), which keeps a small cache coherent instead of mirroring
+# fields onto graph nodes.
+
+DB_API_URL = os.getenv("DB_API_URL", "http://127.0.0.1:8002")
+REQUEST_TIMEOUT_SECONDS = 10
+
+# Feed pages and analytics are reused for a few seconds; any write through
+# this module drops them immediately
+FEED_TTL_SECONDS = 5
+# Per-report status rows kept for tracking lookups (least recently used evicted,
+# and re-fetched once older than this in case another process changed them)
+MAX_CACHED_REPORTS = 2048
+SUMMARY_TTL_SECONDS = 30
+
+_lock = threading.Lock()
+_summaries = OrderedDict()
+_pages = {}
+
+def _cached_page(key, fetch):
+    now = time.time()
+    hit = _pages.get(key)
+    if hit and now - hit[0] < FEED_TTL_SECONDS:
+        return hit[1]
+    value = fetch()
+    with _lock:
+        _pages[key] = (now, value)
+    return value
+
+def _remember(report_id, summary):
+    with _lock:
+        _summaries[report_id] = (time.time(), summary)
+        _summaries.move_to_end(report_id)
+        while len(_summaries) > MAX_CACHED_REPORTS:
+            _summaries.popitem(last=False)
+
+def invalidate():
+    """Drop cached feed pages, analytics and report statuses (after writes that bypass update_report)"""
+    with _lock:
+        _pages.clear()
+        _summaries.clear()
+
+def feed(limit=25, offset=0, include_entities=False):
+    """Newest non-duplicate reports as the feed walkers return them; [] if the DB API is down"""
+    def fetch():
+        response = requests.get(
+            DB_API_URL + "/feed/reports",
+            params={"limit": limit, "offset": offset, "include_entities": include_entities},
+            timeout=REQUEST_TIMEOUT_SECONDS
+        )
+        response.raise_for_status()
+        return response.json()
+
+    try:
+        rows = _cached_page(("feed", limit, offset, include_entities), fetch)
+    except requests.RequestException as e:
+        logging.error(f"report_store: feed unavailable: {e}")
+        return []
+    for row in rows:
+        _remember(row["id"], {k: row[k] for k in ("id", "status", "category", "urgency", "submitted_at")})
+    return rows
+
+def report_summary(report_id):
+    """{id, status, category, urgency, submitted_at} for one report, or None"""
+    with _lock:
+        cached = _summaries.get(report_id)
+    if cached is not None and time.time() - cached[0] < SUMMARY_TTL_SECONDS:
+        return dict(cached[1])
+    try:
+        response = requests.get(DB_API_URL + "/feed/reports/" + report_id, timeout=REQUEST_TIMEOUT_SECONDS)
+    except requests.RequestException as e:
+        logging.error(f"report_store: lookup of {report_id} failed: {e}")
+        return None
+    # 404 for unknown ids, 422 for ids that aren't UUIDs
+    if response.status_code != 200:
+        return None
+    summary = response.json()
+    _remember(report_id, summary)
+    return dict(summary)
+
+def update_report(report_id, **fields):
+    """PATCH report fields in PostgreSQL, then update the cache; True if the report exists"""
+    fields = {k: v for k, v in fields.items() if v is not None}
+    if not fields:
+        return False
+    try:
+        response = requests.patch(DB_API_URL + "/reports/" + report_id, json=fields, timeout=REQUEST_TIMEOUT_SECONDS)
+    except requests.RequestException as e:
+        logging.error(f"report_store: update of {report_id} failed: {e}")
+        return False
+    if response.status_code != 200:
+        return False
+    with _lock:
+        cached = _summaries.get(report_id)
+        if cached is not None:
+            cached[1].update({k: v for k, v in fields.items() if k in cached[1]})
+        _pages.clear()
+    return True
+
+def _empty_metrics():
+    return {
+        "totalReports": 0,
+        "uniqueReports": 0,
+        "duplicateReports": 0,
+        "resolvedReports": 0,
+        "reportsByCategory": {},
+        "reportsByUrgency": {},
+        "reportsByStatus": {},
+        "avgResolutionTime": 5.0,
+        "monthlyTrend": []
+    }
+
+def analytics(since=""):
+    """Dashboard metrics in the shape get_analytics has always reported"""
+    def fetch():
+        response = requests.get(
+            DB_API_URL + "/analytics",
+            params={"since": since} if since else {},
+            timeout=REQUEST_TIMEOUT_SECONDS
+        )
+        response.raise_for_status()
+        return response.json()
+
+    metrics = _empty_metrics()
+    try:
+        data = _cached_page(("analytics", since), fetch)
+    except requests.RequestException as e:
+        logging.error(f"report_store: analytics unavailable: {e}")
+        return metrics
+
+    metrics["totalReports"] = data["total"]
+    metrics["duplicateReports"] = data["duplicates"]
+    metrics["uniqueReports"] = data["total"] - data["duplicates"]
+    metrics["resolvedReports"] = data["resolved"]
+    metrics["reportsByCategory"] = data["by_category"]
+    metrics["reportsByUrgency"] = data["by_urgency"]
+    metrics["reportsByStatus"] = data["by_status"]
+    metrics["monthlyTrend"] = data["monthly"]
+    return metrics
@@ -0,0 +1,414 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+import weakref
+
+# Category -> organisation types, used when no policy rule matches.
+# "*" means every organisation. A policy may override this with
+# "category_org_types".
+DEFAULT_CATEGORY_ORG_TYPES = {
+    "infrastructure": ["utility", "government"],
+    "safety": ["government"],
+    "utility": ["utility"],
+    "*": ["*"],
+}
+
+# How long the DB-side organisation index is trusted before its fingerprint is re-checked
+DB_TABLE_TTL_SECONDS = 30
+
+# Optional JSON policy file; when set it takes precedence over the Policy
+# node (and the routing_policies table) and is hot-reloaded when its mtime
+# changes
+ROUTING_POLICY_FILE = os.getenv("ROUTING_POLICY_FILE", "")
+POLICY_FILE_CHECK_SECONDS = 5
+
+_lock = threading.Lock()
+_rules = {}
+_rules_version = 0
+_policy_file = {"mtime": None, "checked_at": 0.0}
+
+# Organisation indexes are cached per root node; entries vanish with the root object
+_graph_tables = weakref.WeakKeyDictionary()
+_db_table = {"fingerprint": None, "policy_fingerprint": None, "checked_at": 0.0, "index": None}
+
+def _get(obj, key, default=None):
+    return obj.get(key, default) if isinstance(obj, dict) else getattr(obj, key, default)
+
+def _lower_set(values):
+    return frozenset(str(v).strip().lower() for v in values or [])
+
+def parse_rules(rules):
+    """Policy.rules is stored as a JSON string; tolerate dicts and bad JSON"""
+    if isinstance(rules, dict):
+        return rules
+    try:
+        return json.loads(rules) if rules else {}
+    except (TypeError, ValueError):
+        logging.warning("Ignoring unparseable routing policy rules")
+        return {}
+
+# ============ Policy compilation ============
+#
+# Policy JSON:
+# {
+#   "category_org_types": {"health": ["government"]},
+#   "rules": [
+#     {
+#       "name": "nairobi-water-emergencies",
+#       "priority": 10,
+#       "match": {
+#         "category": ["utility"],
+#         "urgency": ["high"],
+#         "min_confidence": 0.6,
+#         "location": ["Nairobi", "Embakasi"],
+#         "entities": {"organisations": ["NCWSC"]}
+#       },
+#       "route_to": {"org_types": ["utility"], "organisations": ["Nairobi County Government"]},
+#       "stop": true
+#     }
+#   ]
+# }
+#
+# Every match key is optional; lists match if any value matches
+# (case-insensitive). Matching rules are applied highest priority first and
+# their targets are combined until one has "stop" (the default). If no rule
+# matches, category_org_types decides.
+
+class CompiledRule:
+    __slots__ = ("name", "priority", "urgency", "min_confidence", "max_confidence",
+                 "locations", "entities", "org_types", "org_names", "stop")
+
+    def __init__(self, rule):
+        match = rule.get("match", {})
+        target = rule.get("route_to", {})
+        self.name = rule.get("name", "")
+        self.priority = rule.get("priority", 0)
+        self.urgency = _lower_set(match.get("urgency"))
+        self.min_confidence = match.get("min_confidence")
+        self.max_confidence = match.get("max_confidence")
+        self.locations = _lower_set(match.get("location"))
+        self.entities = {k: _lower_set(v) for k, v in match.get("entities", {}).items()}
+        self.org_types = frozenset(target.get("org_types", []))
+        self.org_names = _lower_set(target.get("organisations"))
+        self.stop = rule.get("stop", True)
+
+    def matches(self, urgency, confidence, entities):
+        if self.urgency and urgency not in self.urgency:
+            return False
+        if self.min_confidence is not None and (confidence is None or confidence < self.min_confidence):
+            return False
+        if self.max_confidence is not None and (confidence is None or confidence > self.max_confidence):
+            return False
+        if self.locations and not (self.locations & entities.get("locations", frozenset())):
+            return False
+        for kind, wanted in self.entities.items():
+            if wanted and not (wanted & entities.get(kind, frozenset())):
+                return False
+        return True
+
+class CompiledPolicy:
+    """Rules indexed by category, each bucket pre-sorted by priority"""
+
+    def __init__(self, rules):
+        self.category_org_types = dict(DEFAULT_CATEGORY_ORG_TYPES)
+        self.category_org_types.update(rules.get("category_org_types", {}))
+
+        by_category = {}
+        wildcard = []
+        for rule in rules.get("rules", []):
+            compiled = CompiledRule(rule)
+            categories = rule.get("match", {}).get("category")
+            if categories:
+                for category in _lower_set(categories):
+                    by_category.setdefault(category, []).append(compiled)
+            else:
+                wildcard.append(compiled)
+
+        # Category-less rules apply to every category, so merge them into
+        # each bucket now rather than at evaluation time
+        self.by_category = {
+            category: tuple(sorted(bucket + wildcard, key=lambda r: -r.priority))
+            for category, bucket in by_category.items()
+        }
+        self.wildcard = tuple(sorted(wildcard, key=lambda r: -r.priority))
+        self.rule_count = len(rules.get("rules", []))
+
+    def default_org_types(self, category):
+        return self.category_org_types.get(category, self.category_org_types.get("*", ["*"]))
+
+    def decide(self, report):
+        """
+        Targets for a report as (org_types, org_names, matched_rule_names);
+        "*" in org_types means every organisation.
+        """
+        category = str(_get(report, "category", "") or "").lower()
+        urgency = str(_get(report, "urgency", "") or "").lower()
+        confidence = _get(report, "confidence")
+        entities = {k: _lower_set(v) for k, v in _parse_entities(_get(report, "entities")).items()}
+
+        org_types, org_names, matched = set(), set(), []
+        for rule in self.by_category.get(category, self.wildcard):
+            if rule.matches(urgency, confidence, entities):
+                org_types |= rule.org_types
+                org_names |= rule.org_names
+                matched.append(rule.name)
+                if rule.stop:
+                    break
+
+        if not matched:
+            org_types = set(self.default_org_types(category))
+        return org_types, org_names, matched
+
+def _parse_entities(entities):
+    if isinstance(entities, str):
+        try:
+            entities = json.loads(entities) if entities else {}
+        except ValueError:
+            entities = {}
+    return entities if isinstance(entities, dict) else {}
+
+_policy = CompiledPolicy({})
+
+def set_policy_rules(rules):
+    """Compile and install new routing rules; every organisation index is invalidated"""
+    global _rules, _rules_version, _policy
+    parsed = parse_rules(rules)
+    compiled = CompiledPolicy(parsed)
+    with _lock:
+        _rules = parsed
+        _policy = compiled
+        _rules_version += 1
+        # Rules installed from elsewhere; re-check the persisted policy next time
+        _db_table["policy_fingerprint"] = None
+    logging.info(f"Routing policy installed ({compiled.rule_count} rules)")
+
+def invalidate():
+    """Force organisation indexes to be rebuilt (call after adding or editing organisations)"""
+    global _rules_version
+    with _lock:
+        _rules_version += 1
+        _db_table["checked_at"] = 0.0
+
+def _maybe_reload_policy_file():
+    """Hot-reload ROUTING_POLICY_FILE if it changed (checked every few seconds)"""
+    if not ROUTING_POLICY_FILE:
+        return
+    now = time.time()
+    if now - _policy_file["checked_at"] < POLICY_FILE_CHECK_SECONDS:
+        return
+    _policy_file["checked_at"] = now
+    try:
+        mtime = os.path.getmtime(ROUTING_POLICY_FILE)
+    except OSError:
+        return
+    if mtime != _policy_file["mtime"]:
+        with open(ROUTING_POLICY_FILE) as f:
+            set_policy_rules(f.read())
+        _policy_file["mtime"] = mtime
+
+def policy_summary():
+    return {
+        "version": _rules_version,
+        "rules": _rules,
+        "rule_count": _policy.rule_count,
+        "source": ROUTING_POLICY_FILE or "Policy node",
+    }
+
+def org_types_for(category):
+    """Default organisation types for a category under the current policy ([] = any)"""
+    org_types = _policy.default_org_types(category)
+    return [] if "*" in org_types else list(org_types)
+
+# ============ Organisation indexes ============
+
+class OrgIndex:
+    """Organisations indexed by type and by lower-cased name"""
+
+    def __init__(self, organisations):
+        self.all = list(organisations)
+        self.by_type = {}
+        self.by_name = {}
+        for org in self.all:
+            self.by_type.setdefault(_get(org, "type"), []).append(org)
+            self.by_name[str(_get(org, "name", "")).lower()] = org
+
+    def resolve(self, org_types, org_names):
+        if "*" in org_types:
+            return list(self.all)
+        selected, seen = [], set()
+        for org_type in org_types:
+            for org in self.by_type.get(org_type, []):
+                if id(org) not in seen:
+                    seen.add(id(org))
+                    selected.append(org)
+        for name in org_names:
+            org = self.by_name.get(name)
+            if org is not None and id(org) not in seen:
+                seen.add(id(org))
+                selected.append(org)
+        return selected
+
+def route(index, report):
+    """Organisations for a report (dict/node) or a bare category string"""
+    if isinstance(report, str):
+        report = {"category": report}
+    org_types, org_names, _ = _policy.decide(report)
+    return index.resolve(org_types, org_names)
+
+def explain(report):
+    """Which rules matched and what they target (for the policy debug walker)"""
+    org_types, org_names, matched = _policy.decide(report)
+    return {"org_types": sorted(org_types), "organisations": sorted(org_names), "matched_rules": matched}
+
+# ============ Graph (Jac node) tables ============
+
+def _build_graph_index(nodes):
+    organisations = []
+    for node in nodes:
+        kind = type(node).__name__
+        if kind == "Organisation":
+            organisations.append(node)
+        elif kind == "Policy" and getattr(node, "name", "") == "auto_routing" and not ROUTING_POLICY_FILE:
+            rules = parse_rules(node.rules)
+            if rules != _rules:
+                set_policy_rules(rules)
+    return OrgIndex(organisations)
+
+def _graph_index(graph_root, list_nodes):
+    """
+    The organisation index for graph_root; list_nodes is only called (one
+    scan of root's out-nodes) when it is missing or invalidated.
+    """
+    _maybe_reload_policy_file()
+    try:
+        entry = _graph_tables.get(graph_root)
+    except TypeError:
+        entry = None
+    if entry is None or entry["version"] != _rules_version:
+        index = _build_graph_index(list_nodes())
+        entry = {"version": _rules_version, "index": index}
+        try:
+            _graph_tables[graph_root] = entry
+        except TypeError:
+            pass  # root can't be weak-referenced; rebuild next time
+    return entry["index"]
+
+def graph_orgs_for(graph_root, report, list_nodes):
+    """Organisation nodes under graph_root for a report or category"""
+    return route(_graph_index(graph_root, list_nodes), report)
+
+def graph_route(graph_root, report, list_nodes, find_nearest=None, locations=None):
+    """
+    Organisation nodes for a report on the graph path, trimmed by proximity
+    like db_route (locations default to the report's extracted locations).
+    Graph organisations carry no database id, so find_nearest(locations,
+    org_types) ranks organisations of the candidate types and they are
+    matched back to nodes by name.
+    """
+    if locations is None:
+        locations = _parse_entities(_get(report, "entities")).get("locations") or []
+    candidates = graph_orgs_for(graph_root, report, list_nodes)
+    org_types = sorted({str(_get(org, "type")) for org in candidates})
+    return _prefer_nearest(
+        report, candidates, locations,
+        None if find_nearest is None else (lambda: find_nearest(locations, org_types)),
+        lambda org: str(_get(org, "name", "")).lower()
+    )
+
+def all_orgs(graph_root, list_nodes):
+    """Every organisation node under graph_root (broadcasts; no policy applied)"""
+    return list(_graph_index(graph_root, list_nodes).all)
+
+# ============ Database (db_api) tables ============
+
+def _fingerprint(organisations):
+    digest = hashlib.md5()
+    for org in sorted(organisations, key=lambda o: str(o.get("id"))):
+        digest.update(f"{org.get('id')}|{org.get('name')}|{org.get('type')}|{org.get('contact_email')}".encode())
+    return digest.hexdigest()
+
+def _refresh_db_policy(fetch_policy):
+    """Install the persisted policy if it changed; a failed fetch keeps the current rules"""
+    if fetch_policy is None or ROUTING_POLICY_FILE:
+        return
+    try:
+        rules = fetch_policy()
+    except Exception as e:
+        logging.warning(f"Routing policy fetch failed, keeping current rules: {e}")
+        return
+    if rules is None:
+        return
+    rules = parse_rules(rules)
+    fingerprint = hashlib.md5(json.dumps(rules, sort_keys=True).encode()).hexdigest()
+    if fingerprint != _db_table["policy_fingerprint"]:
+        set_policy_rules(rules)
+        _db_table["policy_fingerprint"] = fingerprint
+
+def db_orgs_for(report, fetch_organisations, fetch_policy=None):
+    """
+    Organisation dicts from the database for a report or category.
+
+    fetch_organisations() and fetch_policy() (the persisted rules, e.g.
+    db_api's GET /routing/policy) are called at most once per
+    DB_TABLE_TTL_SECONDS; the index and policy are only rebuilt if they
+    changed. The db_walkers process can't see the graph's Policy node, so
+    without fetch_policy only ROUTING_POLICY_FILE or the defaults apply.
+    """
+    _maybe_reload_policy_file()
+    now = time.time()
+    if _db_table["index"] is None or now - _db_table["checked_at"] >= DB_TABLE_TTL_SECONDS:
+        _refresh_db_policy(fetch_policy)
+        organisations = fetch_organisations()
+        fingerprint = _fingerprint(organisations)
+        with _lock:
+            if _db_table["fingerprint"] != fingerprint or _db_table["index"] is None:
+                _db_table["index"] = OrgIndex(organisations)
+                _db_table["fingerprint"] = fingerprint
+            _db_table["checked_at"] = now
+    return route(_db_table["index"], report)
+
+def db_route(report, locations, fetch_organisations, fetch_policy=None, find_nearest=None):
+    """
+    Organisations for a report on the DB path.
+
+    The policy picks the candidates. When a rule matched, its targets are
+    used as they are. When only the category default applied (every org of
+    a type), find_nearest(locations, organisation_ids) trims the candidates
+    to those with facilities closest to the report's locations; if none is
+    near, or the lookup fails, all candidates are kept.
+    """
+    candidates = db_orgs_for(report, fetch_organisations, fetch_policy)
+    return _prefer_nearest(
+        report, candidates, locations,
+        None if find_nearest is None else (lambda: find_nearest(locations, [str(_get(org, "id")) for org in candidates])),
+        lambda org: str(_get(org, "id"))
+    )
+
+def _prefer_nearest(report, candidates, locations, lookup, key):
+    """
+    The candidates lookup() ranks nearest (matched on key), closest first,
+    when only a category default picked them; all candidates when a rule
+    matched, nothing is near or the lookup fails.
+    """
+    if not locations or lookup is None or not candidates:
+        return candidates
+    if isinstance(report, str):
+        report = {"category": report}
+    _, _, matched = _policy.decide(report)
+    if matched:
+        return candidates
+    try:
+        nearest = lookup()
+    except Exception as e:
+        logging.warning(f"Nearest-organisation lookup failed, using policy targets: {e}")
+        return candidates
+    by_key = {key(org): org for org in candidates}
+    selected = []
+    for org in nearest:
+        match = by_key.pop(key(org), None)
+        if match is not None:
+            selected.append(match)
+    return selected or candidates
@@ -3,12 +3,15 @@ CRUD operations for Dira database
 Provides create, read, update, delete functions for all models
 """
 
-from typing import List, Optional, Dict, Any, Tuple
+from typing import Iterator, List, Optional, Dict, Any, Tuple
+from datetime import datetime
 from psycopg2.extras import execute_values
 import json
 
-from db import get_db_cursor
+from db import get_db_connection, get_db_cursor
 from models import Organisation, Report, Reporter, Facility, ReportRoute, RelatedReport
+import image_index
+from tracing import span
 
 # ============ Organisation CRUD ============
 
@@ -69,22 +72,125 @@ def delete_organisation(org_id: str) -> bool:
         cur.execute("DELETE FROM organisations WHERE id = %s", (org_id,))
         return cur.rowcount > 0
 
-# ============ Reporter CRUD ============
+# ============ Facility CRUD ============
 
-def create_reporter(reporter: Reporter) -> str:
-    """Create a new reporter and return its ID"""
+def create_facility(facility: Facility) -> str:
+    """Create a new facility and return its ID"""
     with get_db_cursor() as cur:
         cur.execute("""
-            INSERT INTO reporters (name, email, is_anonymous)
-            VALUES (%(name)s, %(email)s, %(is_anonymous)s)
+            INSERT INTO facilities (name, location, organisation_id, latitude, longitude)
+            VALUES (%(name)s, %(location)s, %(organisation_id)s, %(latitude)s, %(longitude)s)
             RETURNING id
         """, {
-            'name': reporter.name,
-            'email': reporter.email,
-            'is_anonymous': reporter.is_anonymous
+            'name': facility.name,
+            'location': facility.location,
+            'organisation_id': facility.organisation_id,
+            'latitude': facility.latitude,
+            'longitude': facility.longitude
         })
         return str(cur.fetchone()['id'])
 
+def get_facilities_for_organisation(org_id: str) -> List[Facility]:
+    """Get all facilities of an organisation"""
+    with get_db_cursor() as cur:
+        cur.execute("SELECT * FROM facilities WHERE organisation_id = %s ORDER BY name", (org_id,))
+        return [Facility.from_dict(dict(row)) for row in cur.fetchall()]
+
+def get_facilities_missing_coordinates() -> List[Dict[str, Any]]:
+    """Get facilities that have not been geocoded yet"""
+    with get_db_cursor() as cur:
+        cur.execute("""
+            SELECT id, name, location FROM facilities
+            WHERE latitude IS NULL OR longitude IS NULL
+        """)
+        return [{**dict(row), 'id': str(row['id'])} for row in cur.fetchall()]
+
+def update_facility_coordinates(facility_id: str, latitude: float, longitude: float) -> bool:
+    """Store geocoded coordinates for a facility"""
+    with get_db_cursor() as cur:
+        cur.execute("""
+            UPDATE facilities SET latitude = %s, longitude = %s WHERE id = %s
+        """, (latitude, longitude, facility_id))
+        return cur.rowcount > 0
+
+def get_geocoded_facilities() -> List[Dict[str, Any]]:
+    """Get geocoded facilities with their organisation, for the spatial index"""
+    with get_db_cursor() as cur:
+        cur.execute("""
+            SELECT 
+                f.id, f.name, f.location, f.latitude, f.longitude,
+                o.id AS organisation_id,
+                o.name AS organisation_name,
+                o.type AS organisation_type,
+                o.contact_email
+            FROM facilities f
+            JOIN organisations o ON o.id = f.organisation_id
+            WHERE f.latitude IS NOT NULL AND f.longitude IS NOT NULL
+        """)
+        results = []
+        for row in cur.fetchall():
+            result = dict(row)
+            result['id'] = str(result['id'])
+            result['organisation_id'] = str(result['organisation_id'])
+            results.append(result)
+        return results
+
+# ============ Routing Policy ============
+
+def get_routing_policy(name: str = "auto_routing") -> Optional[Dict[str, Any]]:
+    """Persisted routing policy rules, or None if none were saved"""
+    with get_db_cursor() as cur:
+        cur.execute("SELECT name, rules, updated_at FROM routing_policies WHERE name = %s", (name,))
+        row = cur.fetchone()
+        return dict(row) if row else None
+
+def set_routing_policy(rules: Dict[str, Any], name: str = "auto_routing") -> Dict[str, Any]:
+    """Insert or replace a routing policy"""
+    with get_db_cursor() as cur:
+        cur.execute("""
+            INSERT INTO routing_policies (name, rules, updated_at)
+            VALUES (%s, %s::jsonb, NOW())
+            ON CONFLICT (name) DO UPDATE SET rules = EXCLUDED.rules, updated_at = EXCLUDED.updated_at
+            RETURNING name, rules, updated_at
+        """, (name, json.dumps(rules)))
+        return dict(cur.fetchone())
+
+# ============ Reporter CRUD ============
+
+def normalize_email(email: str) -> str:
+    """Reporters are keyed on the trimmed, lower-cased email"""
+    return email.strip().lower()
+
+def _upsert_reporter(cur, email: str, name: Optional[str], is_anonymous: bool) -> str:
+    """Insert or fetch the reporter for an email in one statement (race-free)"""
+    cur.execute("""
+        INSERT INTO reporters (name, email, is_anonymous)
+        VALUES (%(name)s, %(email)s, %(is_anonymous)s)
+        ON CONFLICT ((lower(email))) DO UPDATE
+        SET name = COALESCE(EXCLUDED.name, reporters.name)
+        RETURNING id
+    """, {
+        'name': name,
+        'email': normalize_email(email),
+        'is_anonymous': is_anonymous
+    })
+    return str(cur.fetchone()['id'])
+
+def upsert_reporter(reporter: Reporter) -> str:
+    """
+    Return the reporter ID for an email, creating the reporter if needed
+    
+    Concurrent calls for the same email (in any letter case) resolve to the
+    same row via the unique lower(email) index; a non-empty name fills in a
+    missing one.
+    """
+    with get_db_cursor() as cur:
+        return _upsert_reporter(cur, reporter.email, reporter.name, reporter.is_anonymous)
+
+def create_reporter(reporter: Reporter) -> str:
+    """Create a new reporter and return its ID (the existing one if the email is known)"""
+    return upsert_reporter(reporter)
+
 def get_reporter(reporter_id: str) -> Optional[Reporter]:
     """Get reporter by ID"""
     with get_db_cursor() as cur:
@@ -95,7 +201,7 @@ def get_reporter(reporter_id: str) -> Optional[Reporter]:
 def get_reporter_by_email(email: str) -> Optional[Reporter]:
     """Get reporter by email"""
     with get_db_cursor() as cur:
-        cur.execute("SELECT * FROM reporters WHERE email = %s", (email,))
+        cur.execute("SELECT * FROM reporters WHERE lower(email) = %s", (normalize_email(email),))
         row = cur.fetchone()
         return Reporter.from_dict(dict(row)) if row else None
 
@@ -110,12 +216,12 @@ def create_report(report: Report) -> str:
         cur.execute("""
             INSERT INTO reports (
                 title, description, category, urgency, entities, confidence,
-                status, reporter_id, image_data, analysis_result, embedding
+                status, reporter_id, image_data, analysis_result, image_hash, embedding
             )
             VALUES (
                 %(title)s, %(description)s, %(category)s, %(urgency)s, %(entities)s::jsonb,
                 %(confidence)s, %(status)s, %(reporter_id)s, %(image_data)s,
-                %(analysis_result)s, %(embedding)s::vector
+                %(analysis_result)s, %(image_hash)s, %(embedding)s::vector
             )
             RETURNING id
         """, {
@@ -129,6 +235,7 @@ def create_report(report: Report) -> str:
             'reporter_id': report.reporter_id,
             'image_data': report.image_data,
             'analysis_result': report.analysis_result,
+            'image_hash': image_index.to_db(report.image_hash),
             'embedding': report.embedding
         })
         return str(cur.fetchone()['id'])
@@ -170,6 +277,78 @@ def get_reports_by_category(category: str) -> List[Report]:
         """, (category,))
         return [Report.from_dict(dict(row)) for row in cur.fetchall()]
 
+# Columns the Jac feed walkers return; submitted_at is formatted the way the
+# graph nodes stored it (str(datetime)) so response shapes don't change
+FEED_COLUMNS = """
+    id::text AS id, title, description, status, category, urgency,
+    to_char(submitted_at, 'YYYY-MM-DD HH24:MI:SS.US') AS submitted_at
+"""
+
+def get_feed_reports(limit: int = 25, offset: int = 0, include_entities: bool = False) -> List[Dict[str, Any]]:
+    """Newest non-duplicate reports for the public and organisation feeds"""
+    columns = FEED_COLUMNS + (", entities::text AS entities" if include_entities else "")
+    with get_db_cursor() as cur:
+        cur.execute(f"""
+            SELECT {columns} FROM reports
+            WHERE status <> 'duplicate'
+            ORDER BY submitted_at DESC
+            LIMIT %s OFFSET %s
+        """, (limit, offset))
+        return [dict(row) for row in cur.fetchall()]
+
+def get_report_summary(report_id: str) -> Optional[Dict[str, Any]]:
+    """Status fields of one report (get_report_status walker)"""
+    with get_db_cursor() as cur:
+        cur.execute(f"SELECT {FEED_COLUMNS} FROM reports WHERE id = %s", (report_id,))
+        row = cur.fetchone()
+        return dict(row) if row else None
+
+def get_report_analytics(since: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Aggregates behind the analytics dashboard, computed in SQL
+
+    Duplicates only count towards total and duplicates; every other
+    breakdown covers unique reports. monthly is ordered by first report.
+    """
+    where, params = ("WHERE submitted_at >= %s", [since]) if since else ("", [])
+    with get_db_cursor() as cur:
+        cur.execute(f"""
+            SELECT
+                COUNT(*) AS total,
+                COUNT(*) FILTER (WHERE status = 'duplicate') AS duplicates,
+                COUNT(*) FILTER (WHERE status = 'resolved') AS resolved
+            FROM reports {where}
+        """, params)
+        totals = dict(cur.fetchone())
+
+        unique_where = (where + " AND" if where else "WHERE") + " status <> 'duplicate'"
+        breakdowns = {}
+        for column in ("category", "urgency", "status"):
+            cur.execute(f"""
+                SELECT {column} AS key, COUNT(*) AS count
+                FROM reports {unique_where}
+                GROUP BY {column}
+            """, params)
+            breakdowns[column] = {row['key']: row['count'] for row in cur.fetchall()}
+
+        cur.execute(f"""
+            SELECT to_char(submitted_at, 'Mon') AS month,
+                   COUNT(*) AS reports,
+                   COUNT(*) FILTER (WHERE status = 'resolved') AS resolved
+            FROM reports {unique_where}
+            GROUP BY 1
+            ORDER BY MIN(submitted_at)
+        """, params)
+        monthly = [dict(row) for row in cur.fetchall()]
+
+    return {
+        **totals,
+        "by_category": breakdowns["category"],
+        "by_urgency": breakdowns["urgency"],
+        "by_status": breakdowns["status"],
+        "monthly": monthly,
+    }
+
 def update_report(report_id: str, **kwargs) -> bool:
     """Update report fields"""
     if not kwargs:
@@ -192,8 +371,238 @@ def delete_report(report_id: str) -> bool:
         cur.execute("DELETE FROM reports WHERE id = %s", (report_id,))
         return cur.rowcount > 0
 
+# ============ Report Export ============
+
+# Exportable columns -> SQL; names are whitelisted here because they are
+# interpolated into the query. image_data and embedding are opt-in payloads.
+EXPORT_COLUMNS = {
+    "id": "id::text",
+    "title": "title",
+    "description": "description",
+    "category": "category",
+    "urgency": "urgency",
+    "status": "status",
+    "confidence": "confidence",
+    "entities": "entities",
+    "submitted_at": "submitted_at",
+    "reporter_id": "reporter_id::text",
+    "canonical_report_id": "canonical_report_id::text",
+    "analysis_result": "analysis_result",
+    "image_hash": "image_hash",
+    "has_image": "image_data IS NOT NULL",
+    "image_data": "image_data",
+    "embedding": "embedding::real[]",
+}
+DEFAULT_EXPORT_COLUMNS = [
+    "id", "title", "description", "category", "urgency", "status",
+    "confidence", "submitted_at", "reporter_id", "canonical_report_id",
+]
+EXPORT_ITERSIZE = 2000
+
+def iter_reports_export(
+    columns: List[str],
+    status: Optional[List[str]] = None,
+    category: Optional[List[str]] = None,
+    urgency: Optional[List[str]] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    include_duplicates: bool = True,
+    limit: Optional[int] = None,
+    itersize: int = EXPORT_ITERSIZE
+) -> Iterator[tuple]:
+    """
+    Reports as tuples in `columns` order, oldest first, read through a
+    server-side (named) cursor so only `itersize` rows are held at a time.
+    The pooled connection stays checked out until the generator finishes or
+    is closed.
+    """
+    unknown = [c for c in columns if c not in EXPORT_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown export columns: {', '.join(unknown)}")
+
+    clauses, params = [], {}
+    for name, values in (("status", status), ("category", category), ("urgency", urgency)):
+        if values:
+            clauses.append(f"{name} = ANY(%({name})s)")
+            params[name] = list(values)
+    if since:
+        clauses.append("submitted_at >= %(since)s")
+        params["since"] = since
+    if until:
+        clauses.append("submitted_at < %(until)s")
+        params["until"] = until
+    if not include_duplicates:
+        clauses.append("status <> 'duplicate'")
+    where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+    if limit is not None:
+        params["limit"] = limit
+
+    select = ", ".join(EXPORT_COLUMNS[c] for c in columns)
+    return _iter_server_side("reports_export", f"""
+        SELECT {select} FROM reports
+        {where}
+        ORDER BY submitted_at
+        {"LIMIT %(limit)s" if limit is not None else ""}
+    """, params, itersize)
+
+def _iter_server_side(name: str, query: str, params: Dict[str, Any], itersize: int) -> Iterator[tuple]:
+    """Rows of a query read through a named cursor, `itersize` at a time"""
+    with get_db_connection() as conn:
+        # Plain tuples: no per-row dicts, the encoder zips in the column names
+        with conn.cursor(name=name) as cur:
+            cur.itersize = itersize
+            cur.execute(query, params)
+            for row in cur:
+                yield row
+
+# ============ Snapshot Export ============
+
+# Tables in the offline analytics snapshot (snapshot.py): the timestamp that
+# partitions them by month and their columns, in the order snapshot.py's
+# Arrow schemas expect. Payload columns (image_data) are left out.
+SNAPSHOT_TABLES = {
+    "reports": ("submitted_at", """
+        SELECT id::text, title, description, category, urgency, status, confidence,
+               entities::text, submitted_at, created_at, reporter_id::text,
+               canonical_report_id::text, analysis_result, image_hash,
+               image_data IS NOT NULL, embedding::real[]
+        FROM reports
+    """),
+    "report_routes": ("sent_at", """
+        SELECT rr.id::text, rr.report_id::text, rr.organisation_id::text,
+               o.name, o.type, rr.message, rr.status, rr.sent_at
+        FROM report_routes rr
+        LEFT JOIN organisations o ON o.id = rr.organisation_id
+    """),
+    "related_reports": ("created_at", """
+        SELECT id::text, report_id::text, related_report_id::text,
+               similarity_score, relationship_type, created_at
+        FROM related_reports
+    """),
+}
+
+def get_snapshot_months(table: str) -> Dict[str, int]:
+    """Row count per month ('YYYY-MM', or None for rows without a timestamp)"""
+    time_column, _ = SNAPSHOT_TABLES[table]
+    with get_db_cursor() as cur:
+        cur.execute(f"""
+            SELECT to_char({time_column}, 'YYYY-MM') AS month, COUNT(*) AS rows
+            FROM {table}
+            GROUP BY 1
+        """)
+        return {row['month']: row['rows'] for row in cur.fetchall()}
+
+def iter_snapshot_rows(table: str, since: Optional[str] = None, itersize: int = EXPORT_ITERSIZE) -> Iterator[tuple]:
+    """
+    Rows of a snapshot table ordered by its month column, so each month
+    arrives contiguously; rows without a timestamp come last. since is an
+    inclusive lower bound on the timestamp (those rows are then skipped).
+    """
+    time_column, query = SNAPSHOT_TABLES[table]
+    alias = "rr." if table == "report_routes" else ""
+    where = f"WHERE {alias}{time_column} >= %(since)s" if since else ""
+    return _iter_server_side(f"{table}_snapshot", f"""
+        {query}
+        {where}
+        ORDER BY {alias}{time_column} NULLS LAST
+    """, {"since": since}, itersize)
+
+# ============ Intake (single transaction) ============
+
+# Report columns returned to the intake walker (no embedding/image payloads)
+INTAKE_COLUMNS = """
+    id, title, description, category, urgency, entities, confidence, status,
+    reporter_id, canonical_report_id, analysis_result, submitted_at
+"""
+
+def create_intake_report(
+    report: Report,
+    reporter_email: Optional[str] = None,
+    reporter_name: Optional[str] = None,
+    duplicates: Optional[List[Dict[str, Any]]] = None,
+    reporter_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Persist a fully processed report in one transaction
+    
+    Upserts the reporter on its unique email, inserts the report with its
+    classification, entities and embedding, links any duplicates found
+    before insert and joins their cluster (status becomes 'duplicate').
+    
+    Args:
+        report: Report with classification/embedding filled in (reporter_id is ignored)
+        reporter_email: Reporter email; when empty, a name gets a new reporter
+            row (NULL email) and no name means no reporter row
+        reporter_name: Optional reporter name (empty = anonymous)
+        duplicates: [{'report_id': ..., 'score': ...}] from duplicate search
+        reporter_id: Known reporter ID (e.g. cached); skips the reporter upsert
+    
+    Returns:
+        The inserted report row
+    """
+    duplicates = duplicates or []
+    with get_db_cursor() as cur:
+        if not reporter_id and reporter_email:
+            reporter_id = _upsert_reporter(cur, reporter_email, reporter_name or None, not reporter_name)
+        elif not reporter_id and reporter_name:
+            # Named but emailless submitters can't be matched up; each gets its own row
+            cur.execute("""
+                INSERT INTO reporters (name, email, is_anonymous)
+                VALUES (%s, NULL, FALSE)
+                RETURNING id
+            """, (reporter_name,))
+            reporter_id = str(cur.fetchone()['id'])
+        
+        cur.execute("""
+            INSERT INTO reports (
+                title, description, category, urgency, entities, confidence,
+                status, reporter_id, image_data, analysis_result, image_hash, embedding
+            )
+            VALUES (
+                %(title)s, %(description)s, %(category)s, %(urgency)s, %(entities)s::jsonb,
+                %(confidence)s, %(status)s, %(reporter_id)s, %(image_data)s,
+                %(analysis_result)s, %(image_hash)s, %(embedding)s::vector
+            )
+            RETURNING id
+        """, {
+            'title': report.title,
+            'description': report.description,
+            'category': report.category,
+            'urgency': report.urgency,
+            'entities': json.dumps(report.entities) if report.entities else None,
+            'confidence': report.confidence,
+            'status': 'duplicate' if duplicates else report.status,
+            'reporter_id': reporter_id,
+            'image_data': report.image_data,
+            'analysis_result': report.analysis_result,
+            'image_hash': image_index.to_db(report.image_hash),
+            'embedding': report.embedding
+        })
+        report_id = str(cur.fetchone()['id'])
+        
+        if duplicates:
+            execute_values(cur, """
+                INSERT INTO related_reports (
+                    report_id, related_report_id, similarity_score, relationship_type
+                )
+                VALUES %s
+                ON CONFLICT (report_id, related_report_id) DO UPDATE
+                SET similarity_score = EXCLUDED.similarity_score
+            """, [(report_id, d['report_id'], d['score'], duplicate_relationship(d)) for d in duplicates])
+            _attach_to_cluster(cur, report_id, [d['report_id'] for d in duplicates])
+        
+        cur.execute(f"SELECT {INTAKE_COLUMNS} FROM reports WHERE id = %s", (report_id,))
+        return dict(cur.fetchone())
+
+def duplicate_relationship(match: Dict[str, Any]) -> str:
+    """related_reports.relationship_type for a /find_duplicates match"""
+    return 'image_duplicate' if match.get('match_type') == 'image' else 'duplicate'
+
 # ============ Vector Search Operations ============
 
+# Reciprocal rank fusion constant (standard value from the RRF paper)
+RRF_K = 60
+
 def store_report_embedding(report_id: str, embedding: List[float]) -> bool:
     """Store or update embedding for a report"""
     with get_db_cursor() as cur:
@@ -204,57 +613,156 @@ def store_report_embedding(report_id: str, embedding: List[float]) -> bool:
         """, (embedding, report_id))
         return cur.rowcount > 0
 
+def _scope_filters(
+    category: Optional[str],
+    window_days: Optional[int],
+    exclude_id: Optional[str],
+    alias: str = "reports"
+) -> str:
+    """SQL predicates shared by the lexical and vector candidate queries"""
+    clauses = []
+    if exclude_id:
+        clauses.append(f"{alias}.id != %(exclude_id)s")
+    if category:
+        clauses.append(f"{alias}.category = %(category)s")
+    if window_days:
+        clauses.append(f"{alias}.submitted_at >= NOW() - make_interval(days => %(window_days)s)")
+    return "".join(f" AND {c}" for c in clauses)
+
 def find_duplicate_reports(
     title: str,
     description: str,
-    embedding: List[float],
+    embedding: Optional[List[float]],
     threshold: float = 0.8,
     limit: int = 10,
-    exclude_id: Optional[str] = None
+    exclude_id: Optional[str] = None,
+    category: Optional[str] = None,
+    window_days: Optional[int] = None,
+    candidate_limit: int = 200
 ) -> List[Dict[str, Any]]:
     """
-    Find duplicate/similar reports using vector similarity
+    Find duplicate/similar reports with a hybrid lexical + vector search
+    
+    Candidates are narrowed before any vector is scored: the top
+    `candidate_limit` reports by full-text rank (search_tsv GIN index, terms
+    OR-ed), plus, when a category or time window is given, the reports in
+    that scope. Only those are ranked by vector distance, and the two lists
+    are fused by reciprocal rank to pick the candidates. Without a scope the
+    vector side only re-ranks the lexical candidates, so pass the classified
+    category and a window to also catch rephrasings with no shared terms.
+    
+    A report counts as a duplicate if its cosine similarity reaches the
+    threshold, or if its title and description are identical (which also
+    catches reposts whose embedding hasn't been stored yet). Results are
+    ordered exact matches first, then by similarity (fused rank breaks ties),
+    so the first result is the closest report as before the hybrid search.
     
     Args:
         title: Report title
         description: Report description
-        embedding: Vector embedding of the report
+        embedding: Vector embedding of the report (None = lexical only)
         threshold: Similarity threshold (0-1, higher = more similar)
         limit: Maximum number of results
         exclude_id: Exclude this report ID from results
+        category: Only consider reports in this category
+        window_days: Only consider reports submitted in the last N days
+        candidate_limit: Candidates taken from each of the two rankings
     
     Returns:
-        List of similar reports with similarity scores
+        List of similar reports with similarity and fused rank scores
     """
-    with get_db_cursor() as cur:
-        # Calculate cosine similarity (1 - distance)
-        # The <=> operator calculates cosine distance
-        query = """
+    params = {
+        'title': title,
+        'description': description,
+        'text': f"{title} {description}",
+        'embedding': embedding,
+        'threshold': threshold,
+        'limit': limit,
+        'exclude_id': exclude_id,
+        'category': category,
+        'window_days': window_days,
+        'candidates': candidate_limit,
+        'rrf_k': RRF_K
+    }
+    scope = _scope_filters(category, window_days, exclude_id)
+    narrow = _scope_filters(category, window_days, None)
+    
+    if embedding is not None:
+        # There is no ANN index: only lexical candidates and (if scoped) the
+        # category/window are scored, never the whole table
+        in_scope = f" OR (TRUE{narrow})" if narrow else ""
+        vector_cte = f"""
+            vector AS (
+                SELECT id, row_number() OVER (ORDER BY distance) AS vec_rank
+                FROM (
+                    SELECT id, embedding <=> %(embedding)s::vector AS distance FROM reports
+                    WHERE embedding IS NOT NULL{_scope_filters(None, None, exclude_id)}
+                    AND (reports.id IN (SELECT id FROM lexical){in_scope})
+                    ORDER BY distance
+                    LIMIT %(candidates)s
+                ) AS nearest
+            )"""
+        similarity = "1 - (r.embedding <=> %(embedding)s::vector)"
+    else:
+        vector_cte = """
+            vector AS (
+                SELECT NULL::uuid AS id, NULL::bigint AS vec_rank WHERE FALSE
+            )"""
+        similarity = "NULL::float"
+    
+    query = f"""
+        WITH query AS (
+            -- plainto_tsquery ANDs every term; OR them so rephrasings still match
+            SELECT NULLIF(replace(plainto_tsquery('english', %(text)s)::text, '&', '|'), '')::tsquery AS q
+        ),
+        lexical AS (
+            SELECT id, row_number() OVER (ORDER BY lex_score DESC) AS lex_rank
+            FROM (
+                SELECT reports.id, ts_rank_cd(reports.search_tsv, query.q) AS lex_score
+                FROM reports, query
+                WHERE query.q IS NOT NULL AND reports.search_tsv @@ query.q{scope}
+                ORDER BY lex_score DESC
+                LIMIT %(candidates)s
+            ) AS matched
+        ),
+        {vector_cte.strip()},
+        fused AS (
             SELECT 
-                id,
-                title,
-                description,
-                category,
-                status,
-                submitted_at,
-                1 - (embedding <=> %s::vector) as similarity_score
-            FROM reports
-            WHERE embedding IS NOT NULL
-        """
-        
-        params = [embedding]
-        
-        if exclude_id:
-            query += " AND id != %s"
-            params.append(exclude_id)
-        
-        # Filter by threshold
-        query += " AND (1 - (embedding <=> %s::vector)) >= %s"
-        params.extend([embedding, threshold])
-        
-        query += " ORDER BY embedding <=> %s::vector LIMIT %s"
-        params.extend([embedding, limit])
-        
+                COALESCE(l.id, v.id) AS id,
+                COALESCE(1.0 / (%(rrf_k)s + l.lex_rank), 0)
+                    + COALESCE(1.0 / (%(rrf_k)s + v.vec_rank), 0) AS rrf_score
+            FROM lexical l
+            FULL OUTER JOIN vector v ON l.id = v.id
+        ),
+        scored AS (
+            SELECT 
+                r.id,
+                r.title,
+                r.description,
+                r.category,
+                r.status,
+                r.submitted_at,
+                {similarity} AS similarity_score,
+                (lower(r.title) = lower(%(title)s)
+                    AND lower(r.description) = lower(%(description)s)) AS exact_match,
+                fused.rrf_score
+            FROM fused
+            JOIN reports r ON r.id = fused.id
+        )
+        SELECT 
+            id, title, description, category, status, submitted_at,
+            CASE WHEN exact_match THEN 1.0 ELSE similarity_score END AS similarity_score,
+            CASE WHEN exact_match THEN 'exact' ELSE 'semantic' END AS match_type,
+            rrf_score
+        FROM scored
+        WHERE exact_match OR similarity_score >= %(threshold)s
+        ORDER BY exact_match DESC, similarity_score DESC NULLS LAST, rrf_score DESC
+        LIMIT %(limit)s
+    """
+    
+    with span("pgvector.find_duplicates", **{"db.system": "postgresql", "vector": embedding is not None,
+                                               "candidates": candidate_limit}) as query_span, \
+            get_db_cursor() as cur:
         cur.execute(query, params)
         
         results = []
@@ -264,6 +772,7 @@ def find_duplicate_reports(
             result['id'] = str(result['id'])
             results.append(result)
         
+        query_span.set_attribute("db.rows", len(results))
         return results
 
 def search_reports_by_similarity(
@@ -293,6 +802,247 @@ def search_reports_by_similarity(
         cur.execute(query, params)
         return [dict(row) for row in cur.fetchall()]
 
+def get_labelled_embeddings(
+    label_field: str,
+    labels: List[str],
+    limit: int = 5000
+) -> List[Dict[str, Any]]:
+    """
+    Get recent LLM-given labels with their text embeddings, for training the
+    local classifier tier. Labels stored on reports are not used: many of
+    them came from the local tier itself or the keyword fallback.
+    
+    Args:
+        label_field: 'category' or 'urgency'
+        labels: Accepted label values
+        limit: Maximum number of rows (newest first)
+    
+    Returns:
+        List of {'label': str, 'embedding': str|list} rows
+    """
+    if label_field not in ('category', 'urgency'):
+        raise ValueError(f"Unsupported label field: {label_field}")
+    
+    with get_db_cursor() as cur:
+        cur.execute("""
+            SELECT label, embedding
+            FROM classifier_labels
+            WHERE field = %s
+            AND label = ANY(%s)
+            ORDER BY created_at DESC
+            LIMIT %s
+        """, (label_field, labels, limit))
+        return [dict(row) for row in cur.fetchall()]
+
+def store_classifier_label(label_field: str, label: str, embedding: List[float]):
+    """Record a label the LLM gave a report text (training data for the local tier)"""
+    if label_field not in ('category', 'urgency'):
+        raise ValueError(f"Unsupported label field: {label_field}")
+    with get_db_cursor() as cur:
+        cur.execute("""
+            INSERT INTO classifier_labels (field, label, embedding)
+            VALUES (%s, %s, %s::vector)
+        """, (label_field, label, embedding))
+
+def get_all_report_embeddings() -> List[Dict[str, Any]]:
+    """Get id, submitted_at and embedding of every embedded report, oldest first"""
+    with get_db_cursor() as cur:
+        cur.execute("""
+            SELECT id, submitted_at, embedding
+            FROM reports
+            WHERE embedding IS NOT NULL
+            ORDER BY submitted_at ASC, id ASC
+        """)
+        return [dict(row) for row in cur.fetchall()]
+
+def bulk_apply_duplicate_clusters(
+    unique_ids: List[str],
+    duplicates: List[Tuple[str, str, float]]
+) -> Dict[str, int]:
+    """
+    Write the result of a dedup pass in one transaction
+    
+    Only the embedded reports the pass scored are rewritten. Reports held in
+    a cluster by an image-hash match keep their cluster, since the pass
+    cannot see image matches. Reports outside the pass (no embedding, or
+    kept by an image match) that pointed at a report the pass made a
+    duplicate follow it to its new original.
+    
+    Args:
+        unique_ids: Canonical/singleton report IDs; any that are currently
+            'duplicate' are reset to 'unique' (workflow statuses are kept)
+        duplicates: (report_id, canonical_report_id, similarity_score) rows;
+            each report is marked 'duplicate', gets canonical_report_id set
+            and is linked to its canonical in related_reports
+    
+    Returns:
+        Counts of updated and linked rows
+    """
+    with get_db_cursor() as cur:
+        # No intake may merge clusters while they are being rewritten
+        cur.execute("SELECT pg_advisory_xact_lock(%s)", (CLUSTER_REWRITE_LOCK,))
+        
+        cur.execute("""
+            SELECT DISTINCT report_id FROM related_reports
+            JOIN reports ON reports.id = related_reports.report_id
+            WHERE related_reports.relationship_type = 'image_duplicate'
+            AND reports.status = 'duplicate'
+            AND report_id = ANY(%s::uuid[])
+        """, (list(unique_ids) + [d[0] for d in duplicates],))
+        image_held = {str(row['report_id']) for row in cur.fetchall()}
+        unique_ids = [i for i in unique_ids if i not in image_held]
+        duplicates = [d for d in duplicates if d[0] not in image_held]
+        rewritten = unique_ids + [d[0] for d in duplicates]
+        
+        # Text duplicate links of the rewritten reports are replaced below
+        cur.execute("""
+            DELETE FROM related_reports
+            WHERE relationship_type = 'duplicate' AND report_id = ANY(%s::uuid[])
+        """, (rewritten,))
+        unlinked = cur.rowcount
+        
+        cur.execute("""
+            UPDATE reports SET status = 'unique'
+            WHERE id = ANY(%s::uuid[]) AND status = 'duplicate'
+        """, (unique_ids,))
+        reset = cur.rowcount
+        
+        cur.execute("""
+            UPDATE reports SET canonical_report_id = NULL
+            WHERE id = ANY(%s::uuid[]) AND canonical_report_id IS NOT NULL
+        """, (unique_ids,))
+        
+        marked = 0
+        if duplicates:
+            execute_values(cur, """
+                UPDATE reports
+                SET status = 'duplicate', canonical_report_id = d.canonical_id::uuid
+                FROM (VALUES %s) AS d(id, canonical_id)
+                WHERE reports.id = d.id::uuid
+            """, [(d[0], d[1]) for d in duplicates], page_size=1000)
+            marked = len(duplicates)
+            
+            execute_values(cur, """
+                INSERT INTO related_reports (
+                    report_id, related_report_id, similarity_score, relationship_type
+                )
+                VALUES %s
+                ON CONFLICT (report_id, related_report_id) DO UPDATE
+                SET similarity_score = EXCLUDED.similarity_score,
+                    relationship_type = EXCLUDED.relationship_type
+            """, [(d[0], d[1], d[2], 'duplicate') for d in duplicates], page_size=1000)
+        
+        # Keep canonical_report_id flat: anything pointing at a report that is
+        # now itself a duplicate follows it to its original (a few rounds at
+        # most, e.g. a member held by an image match whose original moved)
+        repointed = 0
+        for _ in range(5):
+            cur.execute("""
+                UPDATE reports SET canonical_report_id = parent.canonical_report_id
+                FROM reports AS parent
+                WHERE reports.canonical_report_id = parent.id
+                AND parent.canonical_report_id IS NOT NULL
+                AND parent.canonical_report_id <> reports.id
+            """)
+            if cur.rowcount == 0:
+                break
+            repointed += cur.rowcount
+        
+        return {
+            "reset_to_unique": reset,
+            "marked_duplicate": marked,
+            "links_removed": unlinked,
+            "repointed": repointed,
+            "kept_image_duplicates": len(image_held)
+        }
+
+# ============ Image Hash Search ============
+
+# Four 16-bit bands of the 64-bit hash are indexed separately (see schema.sql);
+# hashes within IMAGE_BAND_RADIUS bits always share a band, so candidates come
+# from four index lookups and exact distances are checked here
+IMAGE_BAND_RADIUS = 3
+
+def find_image_duplicates(
+    image_hash: str,
+    max_distance: int = IMAGE_BAND_RADIUS,
+    exclude_id: Optional[str] = None,
+    limit: int = 10,
+    embedding: Optional[List[float]] = None,
+    category: Optional[str] = None,
+    window_days: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Reports whose image is within max_distance bits of image_hash
+    
+    Recall is exact up to IMAGE_BAND_RADIUS; larger distances only find
+    pairs that also happen to share a band. category and window_days scope
+    the search like find_duplicate_reports.
+    
+    Returns:
+        List of {'id', 'title', 'description', 'category', 'distance',
+        'similarity_score', 'text_similarity'}, closest first
+        (similarity_score = 1 - distance / 64; text_similarity is the
+        embedding cosine similarity, None without embeddings)
+    """
+    h = image_index.to_db(image_hash)
+    if h is None:
+        return []
+    params = {
+        'b0': (h >> 48) & 65535,
+        'b1': (h >> 32) & 65535,
+        'b2': (h >> 16) & 65535,
+        'b3': h & 65535,
+        'embedding': embedding,
+        'exclude_id': exclude_id,
+        'category': category,
+        'window_days': window_days
+    }
+    similarity = "1 - (embedding <=> %(embedding)s::vector)" if embedding is not None else "NULL::float"
+    with span("postgres.find_image_duplicates", **{"db.system": "postgresql"}), get_db_cursor() as cur:
+        cur.execute(f"""
+            SELECT id, title, description, category, image_hash,
+                   CASE WHEN embedding IS NULL THEN NULL ELSE {similarity} END AS text_similarity
+            FROM reports
+            WHERE image_hash IS NOT NULL
+            AND (
+                ((image_hash >> 48) & 65535) = %(b0)s
+                OR ((image_hash >> 32) & 65535) = %(b1)s
+                OR ((image_hash >> 16) & 65535) = %(b2)s
+                OR (image_hash & 65535) = %(b3)s
+            ){_scope_filters(category, window_days, exclude_id)}
+        """, params)
+        rows = cur.fetchall()
+    
+    query = image_index.parse_hash(image_hash)
+    results = []
+    for row in rows:
+        distance = image_index.hamming(query, image_index.parse_hash(row['image_hash']))
+        if distance <= max_distance:
+            results.append({
+                'id': str(row['id']),
+                'title': row['title'],
+                'description': row['description'],
+                'category': row['category'],
+                'distance': distance,
+                'similarity_score': 1.0 - distance / image_index.HASH_BITS,
+                'text_similarity': row['text_similarity']
+            })
+    results.sort(key=lambda r: r['distance'])
+    return results[:limit]
+
+def get_image_analyses(limit: int = 5000) -> List[Tuple[str, str]]:
+    """(image_hash, analysis_result) of the most recent analysed images"""
+    with get_db_cursor() as cur:
+        cur.execute("""
+            SELECT image_hash, analysis_result
+            FROM reports
+            WHERE image_hash IS NOT NULL AND analysis_result IS NOT NULL AND analysis_result != ''
+            ORDER BY submitted_at DESC
+            LIMIT %s
+        """, (limit,))
+        return [(image_index.to_hex(row['image_hash']), row['analysis_result']) for row in cur.fetchall()]
+
 # ============ Report Route CRUD ============
 
 def create_report_route(route: ReportRoute) -> str:
@@ -310,6 +1060,35 @@ def create_report_route(route: ReportRoute) -> str:
         })
         return str(cur.fetchone()['id'])
 
+def create_report_routes(
+    report_id: str,
+    routes: List[Dict[str, Any]],
+    report_status: Optional[str] = None
+) -> int:
+    """
+    Record every organisation a report was sent to, and optionally set the
+    report's status, in one transaction
+    
+    Args:
+        routes: [{'organisation_id': ..., 'message': ..., 'status': 'sent'}]
+        report_status: New report status (e.g. 'routed')
+    
+    Returns:
+        Number of routes recorded
+    """
+    with get_db_cursor() as cur:
+        if routes:
+            execute_values(cur, """
+                INSERT INTO report_routes (report_id, organisation_id, message, status)
+                VALUES %s
+            """, [
+                (report_id, r['organisation_id'], r.get('message'), r.get('status', 'sent'))
+                for r in routes
+            ])
+        if report_status:
+            cur.execute("UPDATE reports SET status = %s WHERE id = %s", (report_status, report_id))
+        return len(routes)
+
 def get_routes_for_report(report_id: str) -> List[ReportRoute]:
     """Get all routes for a report"""
     with get_db_cursor() as cur:
@@ -363,13 +1142,156 @@ def get_related_reports(report_id: str) -> List[RelatedReport]:
         return [RelatedReport.from_dict(dict(row)) for row in cur.fetchall()]
 
 def get_duplicate_reports(report_id: str, threshold: float = 0.9) -> List[RelatedReport]:
-    """Get duplicate reports (high similarity)"""
+    """
+    Get the other members of a report's duplicate cluster
+    
+    Membership comes from canonical_report_id (one indexed lookup, no
+    recursive pairwise walk); similarity_score is the direct pairwise score
+    when one was recorded, else None, and only known scores are filtered by
+    threshold.
+    """
     with get_db_cursor() as cur:
         cur.execute("""
-            SELECT * FROM related_reports 
-            WHERE report_id = %s 
-            AND similarity_score >= %s
-            AND relationship_type = 'duplicate'
-            ORDER BY similarity_score DESC
-        """, (report_id, threshold))
+            WITH cluster AS (
+                SELECT COALESCE(canonical_report_id, id) AS root_id
+                FROM reports WHERE id = %(report_id)s
+            )
+            SELECT 
+                %(report_id)s AS report_id,
+                m.id AS related_report_id,
+                COALESCE(rr.similarity_score, rr_rev.similarity_score) AS similarity_score,
+                'duplicate' AS relationship_type
+            FROM cluster
+            JOIN reports m ON (m.id = cluster.root_id OR m.canonical_report_id = cluster.root_id)
+            LEFT JOIN related_reports rr
+                ON rr.report_id = %(report_id)s AND rr.related_report_id = m.id
+            LEFT JOIN related_reports rr_rev
+                ON rr_rev.report_id = m.id AND rr_rev.related_report_id = %(report_id)s
+            WHERE m.id != %(report_id)s
+            AND COALESCE(rr.similarity_score, rr_rev.similarity_score, 1.0) >= %(threshold)s
+            ORDER BY similarity_score DESC NULLS LAST
+        """, {'report_id': report_id, 'threshold': threshold})
         return [RelatedReport.from_dict(dict(row)) for row in cur.fetchall()]
+
+# ============ Duplicate Cluster Operations ============
+
+def attach_to_cluster(report_id: str, duplicate_ids: List[str]) -> str:
+    """
+    Union a report with the clusters of its duplicates and return the root
+    
+    canonical_report_id is kept flat (every member points straight at the
+    root), so merging two clusters re-points the younger cluster's members
+    at the older root in a single indexed UPDATE.
+    """
+    with get_db_cursor() as cur:
+        return _attach_to_cluster(cur, report_id, duplicate_ids)
+
+# Advisory lock keys. Attaches lock each cluster root (namespace, hashtext(id))
+# and hold CLUSTER_REWRITE_LOCK shared; a bulk dedup pass takes it exclusively
+CLUSTER_LOCK_NAMESPACE = 0x4449  # 'DI'
+CLUSTER_REWRITE_LOCK = 0x4449_0000_0001
+
+def _cluster_roots(cur, report_ids: List[str]) -> List[str]:
+    cur.execute("""
+        SELECT DISTINCT COALESCE(canonical_report_id, id) AS root_id
+        FROM reports WHERE id = ANY(%s::uuid[])
+    """, (report_ids,))
+    return sorted(str(row['root_id']) for row in cur.fetchall())
+
+def _attach_to_cluster(cur, report_id: str, duplicate_ids: List[str]) -> str:
+    """attach_to_cluster on an open cursor (so callers can share the transaction)"""
+    report_ids = [report_id] + list(duplicate_ids)
+    cur.execute("SELECT pg_advisory_xact_lock_shared(%s)", (CLUSTER_REWRITE_LOCK,))
+    
+    # Lock every root involved, in sorted order, until the set of roots is
+    # stable: a concurrent merge may have re-pointed a root while we waited.
+    # Roots found in a later round can be locked out of order; PostgreSQL
+    # aborts one side of the (rare) resulting deadlock.
+    locked: set = set()
+    root_ids = _cluster_roots(cur, report_ids)
+    while not set(root_ids) <= locked:
+        for root_id in root_ids:
+            if root_id not in locked:
+                cur.execute(
+                    "SELECT pg_advisory_xact_lock(%s, hashtext(%s))",
+                    (CLUSTER_LOCK_NAMESPACE, root_id)
+                )
+                locked.add(root_id)
+        root_ids = _cluster_roots(cur, report_ids)
+    if not root_ids:
+        return report_id
+    
+    # The earliest submitted root stays canonical
+    cur.execute("""
+        SELECT id FROM reports WHERE id = ANY(%s::uuid[])
+        ORDER BY submitted_at ASC, id ASC LIMIT 1
+    """, (root_ids,))
+    canonical_id = str(cur.fetchone()['id'])
+    
+    merged_roots = [r for r in root_ids if r != canonical_id]
+    if merged_roots:
+        cur.execute("""
+            UPDATE reports SET canonical_report_id = %s
+            WHERE id = ANY(%s::uuid[]) OR canonical_report_id = ANY(%s::uuid[])
+        """, (canonical_id, merged_roots, merged_roots))
+    
+    if report_id != canonical_id:
+        cur.execute("""
+            UPDATE reports SET canonical_report_id = %s WHERE id = %s
+        """, (canonical_id, report_id))
+    
+    return canonical_id
+
+def get_report_cluster(report_id: str) -> Optional[Dict[str, Any]]:
+    """Get a report's cluster root, member IDs and size"""
+    with get_db_cursor() as cur:
+        cur.execute("""
+            WITH cluster AS (
+                SELECT COALESCE(canonical_report_id, id) AS root_id
+                FROM reports WHERE id = %s
+            )
+            SELECT cluster.root_id, m.id, m.status, m.submitted_at
+            FROM cluster
+            JOIN reports m ON (m.id = cluster.root_id OR m.canonical_report_id = cluster.root_id)
+            ORDER BY m.submitted_at ASC
+        """, (report_id,))
+        rows = cur.fetchall()
+        if not rows:
+            return None
+        return {
+            'canonical_report_id': str(rows[0]['root_id']),
+            'members': [
+                {'id': str(r['id']), 'status': r['status'], 'submitted_at': r['submitted_at']}
+                for r in rows
+            ],
+            'count': len(rows)
+        }
+
+def get_cluster_summaries(limit: int = 50, min_size: int = 2) -> List[Dict[str, Any]]:
+    """Get the largest duplicate clusters with their canonical report"""
+    with get_db_cursor() as cur:
+        cur.execute("""
+            SELECT 
+                c.canonical_report_id,
+                c.duplicate_count + 1 AS count,
+                r.title,
+                r.category,
+                r.status,
+                r.submitted_at
+            FROM (
+                SELECT canonical_report_id, COUNT(*) AS duplicate_count
+                FROM reports
+                WHERE canonical_report_id IS NOT NULL
+                GROUP BY canonical_report_id
+            ) c
+            JOIN reports r ON r.id = c.canonical_report_id
+            WHERE c.duplicate_count + 1 >= %s
+            ORDER BY count DESC
+            LIMIT %s
+        """, (min_size, limit))
+        results = []
+        for row in cur.fetchall():
+            result = dict(row)
+            result['canonical_report_id'] = str(result['canonical_report_id'])
+            results.append(result)
+        return results
@@ -4,6 +4,7 @@ Provides connection pooling and context managers
 """
 
 import os
+import threading
 from contextlib import contextmanager
 from typing import Generator
 import psycopg2
@@ -13,30 +14,41 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Seconds /health/ready waits for a first connection while the pool is not
+# yet created (psycopg2 otherwise waits for the OS TCP timeout)
+DB_PING_TIMEOUT = int(os.getenv("DB_PING_TIMEOUT", "3"))
+
+def database_url() -> str:
+    """DATABASE_URL in the form psycopg2 accepts"""
+    db_url = os.getenv('DATABASE_URL')
+    
+    if not db_url:
+        raise ValueError("DATABASE_URL environment variable not set")
+    
+    # Heroku uses postgres:// but psycopg2 needs postgresql://
+    if db_url.startswith('postgres://'):
+        db_url = db_url.replace('postgres://', 'postgresql://', 1)
+    return db_url
+
 class Database:
     """Database connection manager with connection pooling"""
     
     _pool = None
+    _lock = threading.Lock()
     
     @classmethod
     def initialize(cls, min_conn=1, max_conn=10):
         """Initialize connection pool"""
-        db_url = os.getenv('DATABASE_URL')
+        db_url = database_url()
         
-        if not db_url:
-            raise ValueError("DATABASE_URL environment variable not set")
-        
-        # Heroku uses postgres:// but psycopg2 needs postgresql://
-        if db_url.startswith('postgres://'):
-            db_url = db_url.replace('postgres://', 'postgresql://', 1)
-        
-        if cls._pool is None:
-            cls._pool = psycopg2.pool.ThreadedConnectionPool(
-                min_conn,
-                max_conn,
-                db_url
-            )
-            print(f"Database connection pool initialized ({min_conn}-{max_conn} connections)")
+        with cls._lock:
+            if cls._pool is None:
+                cls._pool = psycopg2.pool.ThreadedConnectionPool(
+                    min_conn,
+                    max_conn,
+                    db_url
+                )
+                print(f"Database connection pool initialized ({min_conn}-{max_conn} connections)")
     
     @classmethod
     def get_connection(cls):
@@ -51,6 +63,33 @@ class Database:
         if cls._pool:
             cls._pool.putconn(conn)
     
+    @classmethod
+    def is_initialized(cls) -> bool:
+        """Whether the connection pool has been created"""
+        return cls._pool is not None
+    
+    @classmethod
+    def pool_stats(cls) -> dict:
+        """Connections checked out, idle in the pool, and the pool maximum"""
+        p = cls._pool
+        if p is None:
+            return {"in_use": 0, "idle": 0, "max": 0}
+        return {"in_use": len(p._used), "idle": len(p._pool), "max": p.maxconn}
+    
+    @classmethod
+    def ping(cls) -> bool:
+        """Check that a pooled connection can reach the database"""
+        try:
+            if cls._pool is None:
+                # Probe with a short timeout before creating the pool, so an
+                # unreachable server fails the check instead of hanging it
+                psycopg2.connect(database_url(), connect_timeout=DB_PING_TIMEOUT).close()
+            with get_db_cursor(dict_cursor=False) as cur:
+                cur.execute("SELECT 1")
+                return cur.fetchone() is not None
+        except Exception:
+            return False
+    
     @classmethod
     def close_all(cls):
         """Close all connections in the pool"""
@@ -107,5 +146,5 @@ def get_db_cursor(dict_cursor=True) -> Generator:
         cur.close()
         Database.return_connection(conn)
 
-# Initialize on import
-Database.initialize()
+# The pool is created lazily by Database.get_connection() on first use, so
+# importing crud/nlp_service no longer blocks or fails while Postgres is down.
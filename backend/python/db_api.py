@@ -4,23 +4,60 @@ Provides HTTP endpoints for database operations that JAC can call
 Runs on port 8004
 """
 
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from uuid import UUID
+from collections import OrderedDict
+import itertools
+import threading
+import time
 import sys
 import os
 
 # Add python directory to path
 sys.path.append(os.path.dirname(__file__))
 
-from models import Organisation, Reporter, Report, ReportRoute, RelatedReport
+import psycopg2
+from psycopg2.errors import ForeignKeyViolation
+from db import Database, database_url
+from models import Organisation, Facility, Reporter, Report, ReportRoute, RelatedReport
 import crud
+import dedup
+import events
+import export
+import geo
+from tracing import TraceMiddleware
+from metrics import Counter, Gauge, instrument_app, register_db_pool_metrics
+
+# Browser origins allowed to read db_api directly (the frontend's live event
+# stream and exports); comma-separated
+CORS_ORIGINS = [o.strip() for o in os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",") if o.strip()]
+# Heroku runs db_api on 8002; locally db_walkers.jac expects 8004 (start_dev.sh)
+DB_API_PORT = int(os.getenv("DB_API_PORT", "8002"))
 
 app = FastAPI(title="Dira Database API", version="1.0.0")
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=CORS_ORIGINS,
+    allow_methods=["GET"],
+    allow_headers=["Last-Event-ID"],
+    expose_headers=["Content-Disposition"]
+)
+app.add_middleware(TraceMiddleware, service_name="db_api")
+# Event streams and exports stay open far longer than a request; sse_subscribers
+# below tracks the open streams instead
+instrument_app(app, "db_api", streaming_paths=("/events/reports", "/export/reports"))
+register_db_pool_metrics(Database)
 
 # ============ Request/Response Models ============
 
+# Stored images are normalised by nlp_service /analyze_image (~100-300 KB as
+# a data URL); anything far larger is a raw upload that bypassed it
+IMAGE_DATA_MAX_CHARS = int(os.getenv("IMAGE_DATA_MAX_CHARS", str(2 * 1024 * 1024)))
+
 class CreateReporterRequest(BaseModel):
     name: Optional[str] = None
     email: str
@@ -35,8 +72,9 @@ class CreateReportRequest(BaseModel):
     confidence: Optional[float] = None
     status: str = "submitted"
     reporter_id: Optional[str] = None
-    image_data: Optional[str] = None
+    image_data: Optional[str] = Field(None, max_length=IMAGE_DATA_MAX_CHARS)
     analysis_result: Optional[str] = None
+    image_hash: Optional[str] = None  # dHash hex from nlp_service /analyze_image
     embedding: Optional[List[float]] = None
 
 class UpdateReportRequest(BaseModel):
@@ -47,18 +85,111 @@ class UpdateReportRequest(BaseModel):
     status: Optional[str] = None
     embedding: Optional[List[float]] = None
 
+class DuplicateMatch(BaseModel):
+    report_id: str
+    score: float
+    match_type: Optional[str] = None  # "image" for image-hash matches (kept by /dedup/run)
+
+class IntakeRequest(BaseModel):
+    title: str
+    description: str
+    email: Optional[str] = None
+    name: Optional[str] = None
+    category: Optional[str] = None
+    urgency: Optional[str] = None
+    entities: Optional[Dict[str, Any]] = None
+    confidence: Optional[float] = None
+    status: str = "unique"
+    image_data: Optional[str] = Field(None, max_length=IMAGE_DATA_MAX_CHARS)
+    analysis_result: Optional[str] = None
+    image_hash: Optional[str] = None  # dHash hex from nlp_service /analyze_image
+    embedding: Optional[List[float]] = None
+    duplicates: List[DuplicateMatch] = []
+
 class CreateRouteRequest(BaseModel):
     report_id: str
     organisation_id: str
     message: Optional[str] = None
     status: str = "sent"
 
+class RouteEntry(BaseModel):
+    organisation_id: str
+    message: Optional[str] = None
+    status: str = "sent"
+
+class BulkRoutesRequest(BaseModel):
+    report_id: str
+    routes: List[RouteEntry]
+    report_status: Optional[str] = None
+
+class CreateFacilityRequest(BaseModel):
+    name: str
+    location: str
+    organisation_id: str
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+class NearestOrganisationsRequest(BaseModel):
+    locations: List[str]
+    org_types: Optional[List[str]] = None
+    radius_km: float = 25.0
+    limit: int = 3
+    organisation_ids: Optional[List[str]] = None
+
+class RoutingPolicyRequest(BaseModel):
+    rules: Dict[str, Any]
+
+class AttachClusterRequest(BaseModel):
+    report_id: str
+    duplicate_ids: List[str]
+
 class LinkRelatedReportsRequest(BaseModel):
     report_id: str
     related_report_id: str
     similarity_score: float
     relationship_type: str = "duplicate"
 
+# ============ Reporter Cache ============
+
+# email -> reporter_id for frequent reporters (field staff, seed loaders);
+# reporters are never deleted through the API, so entries only age out
+REPORTER_CACHE_SIZE = int(os.getenv("REPORTER_CACHE_SIZE", "10000"))
+REPORTER_CACHE_TTL_SECONDS = float(os.getenv("REPORTER_CACHE_TTL_SECONDS", "3600"))
+
+class TTLCache:
+    """Bounded LRU mapping whose entries expire after ttl seconds"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+reporter_cache = TTLCache(REPORTER_CACHE_SIZE, REPORTER_CACHE_TTL_SECONDS)
+
 # ============ Reporter Endpoints ============
 
 @app.post("/reporters", response_model=Dict[str, str])
@@ -70,7 +201,11 @@ def create_reporter_endpoint(request: CreateReporterRequest):
             email=request.email,
             is_anonymous=request.is_anonymous
         )
-        reporter_id = crud.create_reporter(reporter)
+        key = crud.normalize_email(request.email)
+        reporter_id = reporter_cache.get(key)
+        if not reporter_id:
+            reporter_id = crud.upsert_reporter(reporter)
+            reporter_cache.set(key, reporter_id)
         return {"reporter_id": reporter_id, "status": "created"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -85,9 +220,14 @@ def get_reporter_endpoint(reporter_id: UUID):
 
 @app.get("/reporters/email/{email}")
 def get_reporter_by_email_endpoint(email: str):
-    """Get or create reporter by email"""
+    """Look up a reporter by email (case-insensitive)"""
+    key = crud.normalize_email(email)
+    reporter_id = reporter_cache.get(key)
+    if reporter_id:
+        return {"reporter_id": reporter_id, "exists": True}
     reporter = crud.get_reporter_by_email(email)
     if reporter:
+        reporter_cache.set(key, reporter.id)
         return {"reporter_id": reporter.id, "exists": True}
     return {"reporter_id": None, "exists": False}
 
@@ -108,6 +248,7 @@ def create_report_endpoint(request: CreateReportRequest):
             reporter_id=request.reporter_id,
             image_data=request.image_data,
             analysis_result=request.analysis_result,
+            image_hash=request.image_hash,
             embedding=request.embedding
         )
         report_id = crud.create_report(report)
@@ -118,6 +259,55 @@ def create_report_endpoint(request: CreateReportRequest):
         print(f"Error creating report: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/intake")
+def intake_endpoint(request: IntakeRequest):
+    """
+    Persist a processed report in one transaction: reporter upsert, report
+    insert (classification, entities, embedding) and duplicate links.
+    Returns the inserted report row.
+    """
+    try:
+        report = Report(
+            title=request.title,
+            description=request.description,
+            category=request.category,
+            urgency=request.urgency,
+            entities=request.entities,
+            confidence=request.confidence,
+            status=request.status,
+            image_data=request.image_data,
+            analysis_result=request.analysis_result,
+            image_hash=request.image_hash,
+            embedding=request.embedding
+        )
+        duplicates = [d.dict() for d in request.duplicates]
+        key = crud.normalize_email(request.email) if request.email else None
+        cached_id = reporter_cache.get(key) if key else None
+        try:
+            row = crud.create_intake_report(
+                report,
+                reporter_email=request.email,
+                reporter_name=request.name,
+                duplicates=duplicates,
+                reporter_id=cached_id
+            )
+        except ForeignKeyViolation:
+            if not cached_id:
+                raise
+            # Reporter removed behind our back; forget it and upsert
+            reporter_cache.pop(key)
+            row = crud.create_intake_report(
+                report,
+                reporter_email=request.email,
+                reporter_name=request.name,
+                duplicates=duplicates
+            )
+        if key and row.get('reporter_id'):
+            reporter_cache.set(key, str(row['reporter_id']))
+        return row
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/reports/{report_id}")
 def get_report_endpoint(report_id: UUID):
     """Get report by ID"""
@@ -128,7 +318,7 @@ def get_report_endpoint(report_id: UUID):
 
 @app.get("/reports")
 def get_all_reports_endpoint(limit: int = 100, offset: int = 0):
-    """Get all reports with pagination"""
+    """Get all reports with pagination (bulk pulls: GET /export/reports)"""
     reports = crud.get_all_reports(limit, offset)
     return [r.__dict__ for r in reports]
 
@@ -169,6 +359,157 @@ def delete_report_endpoint(report_id: str):
     else:
         raise HTTPException(status_code=404, detail="Report not found")
 
+# ============ Read Models (Jac walkers) ============
+
+@app.get("/feed/reports")
+def get_feed_reports_endpoint(limit: int = 25, offset: int = 0, include_entities: bool = False):
+    """Newest non-duplicate reports in the shape the feed walkers return"""
+    return crud.get_feed_reports(limit, offset, include_entities)
+
+@app.get("/feed/reports/{report_id}")
+def get_report_summary_endpoint(report_id: UUID):
+    """Status fields of one report"""
+    summary = crud.get_report_summary(str(report_id))
+    if not summary:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return summary
+
+@app.get("/analytics")
+def get_analytics_endpoint(since: Optional[str] = None):
+    """Report counts by category, urgency, status and month"""
+    return crud.get_report_analytics(since)
+
+# ============ Export Endpoints ============
+
+# Each export holds a pooled connection (max 10) until its last row is sent,
+# so slow clients are capped before they can starve the other endpoints
+EXPORT_MAX_CONCURRENT = int(os.getenv("EXPORT_MAX_CONCURRENT", "3"))
+_export_slots = threading.BoundedSemaphore(EXPORT_MAX_CONCURRENT)
+
+def _csv_param(value: Optional[str]) -> Optional[List[str]]:
+    return [v.strip() for v in value.split(",") if v.strip()] if value else None
+
+@app.get("/export/reports")
+def export_reports_endpoint(
+    format: str = "ndjson",
+    columns: Optional[str] = None,
+    status: Optional[str] = None,
+    category: Optional[str] = None,
+    urgency: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    include_duplicates: bool = True,
+    limit: Optional[int] = None
+):
+    """
+    Stream reports as NDJSON or CSV, oldest first, in constant memory
+
+    columns, status, category and urgency take comma-separated lists; since
+    and until bound submitted_at (dates or ISO 8601 datetimes). At most
+    EXPORT_MAX_CONCURRENT exports run at once; others get a 503. Example:
+    /export/reports?format=csv&columns=id,category,urgency,submitted_at&status=routed,resolved
+    """
+    if format not in export.FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(export.FORMATS)}")
+    selected = _csv_param(columns) or crud.DEFAULT_EXPORT_COLUMNS
+    unknown = [c for c in selected if c not in crud.EXPORT_COLUMNS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown columns: {', '.join(unknown)}; "
+                                                    f"available: {', '.join(crud.EXPORT_COLUMNS)}")
+    if limit is not None and limit < 0:
+        raise HTTPException(status_code=400, detail="limit must be non-negative")
+    bounds = {}
+    for name, value in (("since", since), ("until", until)):
+        if value:
+            try:
+                bounds[name] = export.parse_bound(value)
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"{name} must be a date (YYYY-MM-DD) or an ISO 8601 datetime")
+
+    if not _export_slots.acquire(blocking=False):
+        raise HTTPException(status_code=503, detail="Too many exports in progress; retry shortly",
+                            headers={"Retry-After": "30"})
+    rows = crud.iter_reports_export(
+        selected, _csv_param(status), _csv_param(category), _csv_param(urgency),
+        bounds.get("since"), bounds.get("until"), include_duplicates, limit
+    )
+    # Run the query before the 200 is sent so a database outage still
+    # produces an error status instead of a truncated body
+    try:
+        first = next(rows, None)
+    except Exception as e:
+        rows.close()
+        _export_slots.release()
+        print(f"Error exporting reports: {e}")
+        raise HTTPException(status_code=500, detail="Export query failed")
+    body = export.encode(format, selected, itertools.chain([first] if first is not None else [], rows))
+    return StreamingResponse(
+        _ExportStream(body, rows),
+        media_type=export.FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="reports.{format}"'}
+    )
+
+class _ExportStream:
+    """
+    Export body that returns its connection and export slot once the last
+    chunk is sent, or when the response drops it (client went away, even
+    before the first chunk)
+    """
+
+    def __init__(self, body, rows):
+        self.body = body
+        self.rows = rows
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self.body)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.rows.close()
+            _export_slots.release()
+
+    __del__ = close
+
+# ============ Live Events ============
+
+report_events_total = Counter("report_events_total", "Report/route change notifications received", ["type"])
+report_events = events.EventHub(
+    connect=lambda: psycopg2.connect(database_url()),
+    on_event=lambda event_type: report_events_total.labels(event_type).inc()
+)
+Gauge("sse_subscribers", "Open /events/reports streams").set_function(report_events.subscriber_count)
+
+@app.get("/events/reports")
+async def report_events_endpoint(request: Request, report_id: Optional[str] = None, types: Optional[str] = None):
+    """
+    Server-sent events for report and route changes, pushed from PostgreSQL
+    LISTEN/NOTIFY instead of re-running the feed walkers
+
+    Events: report.created, report.updated (status/category/urgency),
+    route.created, route.updated, and resync when deltas were lost and the
+    client should refetch its list. report_id (comma-separated) follows
+    specific reports; types filters by event type or prefix ("report",
+    "route"). EventSource reconnects resume from Last-Event-ID.
+    """
+    subscriber = report_events.subscribe(
+        _csv_param(report_id), _csv_param(types), request.headers.get("last-event-id")
+    )
+    return StreamingResponse(
+        events.sse_stream(report_events, subscriber),
+        media_type="text/event-stream",
+        # No proxy buffering (nginx/Heroku router) so events arrive as they happen
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # ============ Organisation Endpoints ============
 
 @app.get("/organisations")
@@ -191,6 +532,75 @@ def get_organisation_endpoint(org_id: str):
         raise HTTPException(status_code=404, detail="Organisation not found")
     return org.__dict__
 
+# ============ Facility Endpoints ============
+
+@app.post("/facilities")
+def create_facility_endpoint(request: CreateFacilityRequest):
+    """Create a facility, geocoding its location if no coordinates are given"""
+    try:
+        latitude, longitude = request.latitude, request.longitude
+        if latitude is None or longitude is None:
+            coords = geo.get_gazetteer().lookup(request.location) or geo.get_gazetteer().lookup(request.name)
+            if coords:
+                latitude, longitude = coords
+        facility = Facility(
+            name=request.name,
+            location=request.location,
+            organisation_id=request.organisation_id,
+            latitude=latitude,
+            longitude=longitude
+        )
+        facility_id = crud.create_facility(facility)
+        geo.invalidate_facility_index()
+        return {"facility_id": facility_id, "geocoded": latitude is not None, "status": "created"}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/facilities/organisation/{org_id}")
+def get_facilities_for_organisation_endpoint(org_id: str):
+    """Get all facilities of an organisation"""
+    facilities = crud.get_facilities_for_organisation(org_id)
+    return [f.__dict__ for f in facilities]
+
+@app.post("/facilities/geocode")
+def geocode_facilities_endpoint():
+    """Geocode facilities without coordinates from the offline gazetteer"""
+    try:
+        return geo.geocode_missing_facilities()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# ============ Routing Endpoints ============
+
+@app.post("/routing/nearest")
+def nearest_organisations_endpoint(request: NearestOrganisationsRequest):
+    """Organisations with facilities nearest to the report's locations"""
+    try:
+        orgs = geo.nearest_organisations(
+            request.locations,
+            request.org_types,
+            request.radius_km,
+            request.limit,
+            request.organisation_ids
+        )
+        return {"organisations": orgs}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/routing/policy")
+def get_routing_policy_endpoint(name: str = "auto_routing"):
+    """Persisted routing policy rules ({} when none has been saved)"""
+    policy = crud.get_routing_policy(name)
+    return policy or {"name": name, "rules": {}, "updated_at": None}
+
+@app.put("/routing/policy")
+def set_routing_policy_endpoint(request: RoutingPolicyRequest, name: str = "auto_routing"):
+    """Save routing policy rules; IntakeAgentDB picks them up within routing_table's TTL"""
+    try:
+        return crud.set_routing_policy(request.rules, name)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 # ============ Report Route Endpoints ============
 
 @app.post("/report_routes")
@@ -208,6 +618,19 @@ def create_route_endpoint(request: CreateRouteRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/report_routes/bulk")
+def create_routes_bulk_endpoint(request: BulkRoutesRequest):
+    """Record all routes for a report (and optionally its new status) at once"""
+    try:
+        count = crud.create_report_routes(
+            request.report_id,
+            [r.dict() for r in request.routes],
+            request.report_status
+        )
+        return {"created": count, "report_id": request.report_id}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/report_routes/report/{report_id}")
 def get_routes_for_report_endpoint(report_id: str):
     """Get all routes for a report"""
@@ -249,6 +672,40 @@ def get_duplicate_reports_endpoint(report_id: str, threshold: float = 0.9):
     duplicates = crud.get_duplicate_reports(report_id, threshold)
     return [d.__dict__ for d in duplicates]
 
+# ============ Duplicate Cluster Endpoints ============
+
+@app.post("/clusters/attach")
+def attach_to_cluster_endpoint(request: AttachClusterRequest):
+    """Merge a new report into its duplicates' cluster"""
+    try:
+        canonical_id = crud.attach_to_cluster(request.report_id, request.duplicate_ids)
+        return {"report_id": request.report_id, "canonical_report_id": canonical_id}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/clusters")
+def get_cluster_summaries_endpoint(limit: int = 50, min_size: int = 2):
+    """Largest duplicate clusters with member counts"""
+    return crud.get_cluster_summaries(limit, min_size)
+
+@app.get("/clusters/{report_id}")
+def get_report_cluster_endpoint(report_id: str):
+    """Cluster root and members for a report"""
+    cluster = crud.get_report_cluster(report_id)
+    if not cluster:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return cluster
+
+# ============ Dedup Endpoints ============
+
+@app.post("/dedup/run")
+def run_dedup_endpoint(threshold: float = dedup.DEFAULT_THRESHOLD):
+    """Re-cluster all reports by embedding similarity and mark duplicates in bulk"""
+    try:
+        return dedup.run_dedup(threshold)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 # ============ Delete Endpoints (for testing) ============
 
 @app.delete("/reports/{report_id}")
@@ -267,6 +724,18 @@ def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "service": "database_api"}
 
+@app.get("/health/live")
+def liveness_check():
+    """Liveness: the process is up and serving HTTP"""
+    return {"status": "alive", "service": "database_api"}
+
+@app.get("/health/ready")
+def readiness_check():
+    """Readiness: PostgreSQL is reachable through the pool"""
+    db_ok = Database.ping()
+    body = {"status": "ready" if db_ok else "unavailable", "service": "database_api", "database": db_ok}
+    return JSONResponse(status_code=200 if db_ok else 503, content=body)
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8002)
+    uvicorn.run(app, host="0.0.0.0", port=DB_API_PORT)
@@ -0,0 +1,102 @@
+"""
+Bulk duplicate clustering for Dira
+Loads every report embedding once and scores them with blocked matrix
+products. Clusters are stars around the earliest report: a report joins the
+earliest original it is directly similar to, never a chain of neighbours,
+and its similarity to that original is what gets stored.
+
+Usage:
+    python dedup.py [threshold]
+"""
+
+import sys
+import json
+import time
+import logging
+from typing import Dict, List, Any, Tuple
+
+import numpy as np
+
+import crud
+
+DEFAULT_THRESHOLD = 0.85
+# Rows per block; a block costs block_size x n x 4 bytes of scratch memory
+BLOCK_SIZE = 512
+
+def _as_matrix(embeddings: List[Any]) -> np.ndarray:
+    rows = [json.loads(e) if isinstance(e, str) else e for e in embeddings]
+    matrix = np.asarray(rows, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.clip(norms, 1e-12, None)
+
+def cluster_embeddings(
+    matrix: np.ndarray,
+    threshold: float = DEFAULT_THRESHOLD,
+    block_size: int = BLOCK_SIZE
+) -> Tuple[List[int], Dict[int, float]]:
+    """
+    Star-cluster L2-normalised rows (ordered oldest first) by cosine similarity
+
+    Rows are visited oldest first; a row not yet claimed becomes an original
+    and claims every later unclaimed row within threshold of it.
+
+    Returns:
+        (roots, root_score) where roots[i] is the index of i's original
+        (i itself for originals), and root_score[i] is the similarity
+        between i and that original
+    """
+    n = len(matrix)
+    roots = [-1] * n
+    root_score: Dict[int, float] = {}
+
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        # Only compare each block against itself and later rows
+        sims = matrix[start:stop] @ matrix[start:].T
+        for r in range(stop - start):
+            i = start + r
+            if roots[i] != -1:
+                continue
+            roots[i] = i
+            for c in np.nonzero(sims[r, r + 1:] >= threshold)[0].tolist():
+                j = i + 1 + c
+                if roots[j] == -1:
+                    roots[j] = i
+                    root_score[j] = float(sims[r, r + 1 + c])
+
+    return roots, root_score
+
+def run_dedup(threshold: float = DEFAULT_THRESHOLD) -> Dict[str, Any]:
+    """Re-deduplicate every embedded report and write results in bulk"""
+    started = time.time()
+    rows = crud.get_all_report_embeddings()
+    if not rows:
+        return {"status": "complete", "processed": 0, "clusters": 0, "duplicate_ids": []}
+
+    ids = [str(r['id']) for r in rows]
+    matrix = _as_matrix([r['embedding'] for r in rows])
+    roots, root_score = cluster_embeddings(matrix, threshold)
+
+    unique_ids = [ids[i] for i in range(len(ids)) if roots[i] == i]
+    duplicates = [
+        (ids[i], ids[roots[i]], root_score[i])
+        for i in range(len(ids)) if roots[i] != i
+    ]
+    counts = crud.bulk_apply_duplicate_clusters(unique_ids, duplicates)
+
+    elapsed = time.time() - started
+    logging.info(f"Dedup pass: {len(ids)} reports, {len(unique_ids)} clusters in {elapsed:.2f}s")
+    return {
+        "status": "complete",
+        "processed": len(ids),
+        "clusters": len(unique_ids),
+        "duplicate_ids": [d[0] for d in duplicates],
+        "elapsed_seconds": round(elapsed, 3),
+        **counts
+    }
+
+if __name__ == "__main__":
+    threshold = float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_THRESHOLD
+    result = run_dedup(threshold)
+    result.pop("duplicate_ids")
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,254 @@
+"""
+Live report events for Dira
+Triggers in schema.sql pg_notify each new report, each report status,
+category or urgency change and each route on the report_events channel.
+One listener thread per process LISTENs on a dedicated connection and fans
+the deltas out to subscribers (db_api's /events/reports SSE stream), so any
+number of dashboards share one database connection instead of re-running
+the feed walkers.
+
+Events carry ids of the form <boot>-<seq>. A reconnecting EventSource sends
+the last id it saw and gets the events it missed from a replay buffer, or a
+`resync` event (refetch the feed) when they are no longer available, after a
+LISTEN reconnect, or when it fell too far behind.
+"""
+
+import os
+import json
+import uuid
+import select
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+CHANNEL = "report_events"
+# Recent events kept for Last-Event-ID replay
+EVENTS_REPLAY_BUFFER = int(os.getenv("EVENTS_REPLAY_BUFFER", "1000"))
+# Events queued for one subscriber before it is sent a resync instead
+EVENTS_SUBSCRIBER_QUEUE = int(os.getenv("EVENTS_SUBSCRIBER_QUEUE", "500"))
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+# EventSource reconnect delay sent to clients
+RETRY_MS = 3000
+
+RESYNC = "resync"
+
+# (seq, id, type, data)
+Event = Tuple[int, str, str, Dict[str, Any]]
+
+def format_sse(data: Any, event: Optional[str] = None, event_id: Optional[str] = None,
+               retry_ms: Optional[int] = None) -> str:
+    """One text/event-stream message"""
+    lines = []
+    if event_id:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    if retry_ms:
+        lines.append(f"retry: {retry_ms}")
+    text = data if isinstance(data, str) else json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    lines.extend(f"data: {line}" for line in text.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+class Subscriber:
+    """One client's filtered queue; fed from the listener thread, read on its event loop"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, report_ids: Optional[List[str]] = None,
+                 types: Optional[List[str]] = None, max_queue: int = EVENTS_SUBSCRIBER_QUEUE):
+        self.loop = loop
+        self.report_ids = set(report_ids) if report_ids else None
+        self.types = set(types) if types else None
+        self.max_queue = max_queue
+        self.queue: "asyncio.Queue" = asyncio.Queue()
+        self.overflowed = False
+
+    def wants(self, event: Event) -> bool:
+        _, _, event_type, data = event
+        # "report" matches report.created and report.updated
+        if self.types and event_type not in self.types and event_type.split(".")[0] not in self.types:
+            return False
+        if self.report_ids:
+            report_id = data.get("report_id") if event_type.startswith("route.") else data.get("id")
+            return report_id in self.report_ids
+        return True
+
+    def push(self, item):
+        self.loop.call_soon_threadsafe(self._put, item)
+
+    def _put(self, item):
+        if item is RESYNC:
+            if not self.overflowed:
+                self.overflowed = True
+                self.queue.put_nowait(RESYNC)
+        elif self.overflowed:
+            # Dropped until the client has seen the resync
+            return
+        elif self.queue.qsize() >= self.max_queue:
+            self.overflowed = True
+            self.queue.put_nowait(RESYNC)
+        else:
+            self.queue.put_nowait(item)
+
+    async def get(self, timeout: float):
+        """The next event, RESYNC, or None after timeout seconds"""
+        try:
+            item = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if item is RESYNC:
+            self.overflowed = False
+        return item
+
+class EventHub:
+    """Fans notifications from one LISTEN connection out to subscribers"""
+
+    def __init__(self, connect: Optional[Callable[[], Any]] = None, channel: str = CHANNEL,
+                 replay: int = EVENTS_REPLAY_BUFFER, on_event: Optional[Callable[[str], None]] = None):
+        self.boot = uuid.uuid4().hex[:8]
+        self.channel = channel
+        self.connected = False
+        self._connect = connect
+        self._on_event = on_event
+        self._seq = 0
+        self._recent: Deque[Event] = deque(maxlen=replay)
+        self._subscribers: Set[Subscriber] = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # ---- subscribers ----
+
+    def subscribe(self, report_ids: Optional[List[str]] = None, types: Optional[List[str]] = None,
+                  last_event_id: Optional[str] = None) -> Subscriber:
+        """Register a subscriber on the running event loop, replaying what it missed"""
+        subscriber = Subscriber(asyncio.get_running_loop(), report_ids, types)
+        self.start()
+        with self._lock:
+            self._subscribers.add(subscriber)
+            if last_event_id:
+                missed = self._since(last_event_id)
+                if missed is None:
+                    subscriber.push(RESYNC)
+                else:
+                    for event in missed:
+                        if subscriber.wants(event):
+                            subscriber.push(event)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def _since(self, last_event_id: str) -> Optional[List[Event]]:
+        """Events after last_event_id, or None if some are no longer buffered"""
+        boot, _, seq = last_event_id.partition("-")
+        if boot != self.boot or not seq.isdigit() or int(seq) > self._seq:
+            return None
+        seq = int(seq)
+        if seq < self._seq and (not self._recent or self._recent[0][0] > seq + 1):
+            return None
+        return [event for event in self._recent if event[0] > seq]
+
+    # ---- publishing ----
+
+    def publish(self, payload: str):
+        """Deliver one notification payload (JSON with a "type") to matching subscribers"""
+        try:
+            data = json.loads(payload)
+            event_type = data.pop("type", None) if isinstance(data, dict) else None
+        except ValueError:
+            event_type = None
+        if not isinstance(event_type, str):
+            logging.warning(f"Ignoring malformed {self.channel} payload: {payload[:200]}")
+            return
+        with self._lock:
+            self._seq += 1
+            event = (self._seq, f"{self.boot}-{self._seq}", event_type, data)
+            self._recent.append(event)
+            for subscriber in self._subscribers:
+                if subscriber.wants(event):
+                    subscriber.push(event)
+        if self._on_event:
+            self._on_event(event_type)
+
+    def resync_all(self):
+        """Tell every subscriber to refetch (events may have been missed)"""
+        with self._lock:
+            # Replay across the gap is impossible, so start a new id epoch
+            self.boot = uuid.uuid4().hex[:8]
+            self._recent.clear()
+            for subscriber in self._subscribers:
+                subscriber.push(RESYNC)
+
+    # ---- listener ----
+
+    def start(self):
+        """Start the LISTEN thread (once, on first subscription)"""
+        if self._connect is None or self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._listen, name="report-events", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _listen(self):
+        backoff = 1.0
+        listened_before = False
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = self._connect()
+                conn.autocommit = True
+                cur = conn.cursor()
+                cur.execute(f"LISTEN {self.channel}")
+                self.connected = True
+                backoff = 1.0
+                if listened_before:
+                    self.resync_all()
+                listened_before = True
+                logging.info(f"Listening on {self.channel}")
+
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], EVENTS_HEARTBEAT_SECONDS) == ([], [], []):
+                        # Idle: make sure the connection is still alive
+                        cur.execute("SELECT 1")
+                    conn.poll()
+                    while conn.notifies:
+                        self.publish(conn.notifies.pop(0).payload)
+            except Exception as e:
+                if self.connected or not listened_before:
+                    logging.error(f"{self.channel} listener failed: {e}")
+                self.connected = False
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                self.connected = False
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+async def sse_stream(hub: EventHub, subscriber: Subscriber, heartbeat: float = EVENTS_HEARTBEAT_SECONDS):
+    """text/event-stream body for one subscriber; unsubscribes when the client goes away"""
+    try:
+        yield format_sse({"listening": hub.connected}, event="ready", retry_ms=RETRY_MS)
+        while True:
+            item = await subscriber.get(heartbeat)
+            if item is None:
+                # Comment line keeps proxies from closing an idle stream
+                yield ": keepalive\n\n"
+            elif item is RESYNC:
+                yield format_sse({}, event=RESYNC)
+            else:
+                _, event_id, event_type, data = item
+                yield format_sse(data, event=event_type, event_id=event_id)
+    finally:
+        hub.unsubscribe(subscriber)
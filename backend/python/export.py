@@ -0,0 +1,86 @@
+"""
+Report export encoding for Dira
+Turns rows streamed from crud.iter_reports_export into NDJSON or CSV text
+chunks. Rows are encoded a batch at a time and nothing is kept between
+batches, so an export of any size runs in constant memory.
+"""
+
+import io
+import csv
+import json
+from datetime import date, datetime
+from typing import Any, Iterable, Iterator, List, Sequence
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+# Rows per yielded chunk: large enough to amortise the per-chunk overhead,
+# small enough that a chunk stays well under a megabyte
+CHUNK_ROWS = 500
+
+def _json_default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+def _csv_value(value: Any):
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    return value
+
+def _chunks(rows: Iterable[Sequence[Any]], chunk_rows: int) -> Iterator[List[Sequence[Any]]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_rows:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def ndjson_chunks(columns: List[str], rows: Iterable[Sequence[Any]], chunk_rows: int = CHUNK_ROWS) -> Iterator[str]:
+    """One JSON object per line, keyed by column name"""
+    for chunk in _chunks(rows, chunk_rows):
+        yield "".join(
+            json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=_json_default) + "\n"
+            for row in chunk
+        )
+
+def csv_chunks(columns: List[str], rows: Iterable[Sequence[Any]], chunk_rows: int = CHUNK_ROWS) -> Iterator[str]:
+    """A header line, then RFC 4180 rows; JSON columns are embedded as JSON text"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\r\n")
+    writer.writerow(columns)
+    for chunk in _chunks(rows, chunk_rows):
+        writer.writerows([_csv_value(v) for v in row] for row in chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # Header only: no rows matched
+        yield buffer.getvalue()
+
+def parse_bound(value: str) -> datetime:
+    """
+    A since/until filter value: a date (2025-01-01) or an ISO 8601 datetime
+    (2025-01-01T08:30:00, optionally with Z or an offset). Raises ValueError.
+    """
+    value = value.strip()
+    if value.endswith(("Z", "z")):
+        value = value[:-1] + "+00:00"
+    if len(value) == 10:
+        return datetime.combine(date.fromisoformat(value), datetime.min.time())
+    return datetime.fromisoformat(value)
+
+def encode(format: str, columns: List[str], rows: Iterable[Sequence[Any]], chunk_rows: int = CHUNK_ROWS) -> Iterator[str]:
+    if format == "ndjson":
+        return ndjson_chunks(columns, rows, chunk_rows)
+    if format == "csv":
+        return csv_chunks(columns, rows, chunk_rows)
+    raise ValueError(f"Unknown export format: {format}")
@@ -0,0 +1,204 @@
+"""
+Offline geocoding and spatial lookup for Dira
+Resolves place names against a bundled Kenyan gazetteer and finds the
+nearest facilities with an in-process grid index, so routing can notify the
+few responsible organisations near a report instead of every one of a type.
+"""
+
+import os
+import csv
+import math
+import threading
+from typing import Dict, List, Optional, Tuple, Any, Callable
+
+GAZETTEER_PATH = os.getenv(
+    "GAZETTEER_PATH",
+    os.path.join(os.path.dirname(__file__), '..', 'data', 'kenya_gazetteer.csv')
+)
+
+EARTH_RADIUS_KM = 6371.0
+# Grid cell size in degrees (~11 km at the equator)
+CELL_DEG = 0.1
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance in kilometres"""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+def _normalise(name: str) -> str:
+    return " ".join(name.lower().replace("'", "").split())
+
+class Gazetteer:
+    """Place name -> (latitude, longitude) lookup loaded from a CSV file"""
+
+    def __init__(self, path: str = GAZETTEER_PATH):
+        self.places: Dict[str, Tuple[float, float]] = {}
+        with open(path, newline='') as f:
+            for row in csv.DictReader(f):
+                coords = (float(row['latitude']), float(row['longitude']))
+                self.places[_normalise(row['name'])] = coords
+                for alias in (row.get('aliases') or '').split('|'):
+                    if alias.strip():
+                        self.places[_normalise(alias)] = coords
+
+    def lookup(self, text: str) -> Optional[Tuple[float, float]]:
+        """
+        Geocode free text such as 'Kabete', 'Embakasi, Nairobi' or
+        'Kabete Water Treatment Works' (longest known place name wins)
+        """
+        if not text:
+            return None
+        name = _normalise(text)
+        if name in self.places:
+            return self.places[name]
+        # Comma-separated parts, most specific first
+        for part in name.split(','):
+            part = part.strip()
+            if part in self.places:
+                return self.places[part]
+        # Longest run of words that is a known place
+        words = name.replace(',', ' ').split()
+        for size in range(len(words), 0, -1):
+            for start in range(len(words) - size + 1):
+                candidate = " ".join(words[start:start + size])
+                if candidate in self.places:
+                    return self.places[candidate]
+        return None
+
+class GridIndex:
+    """Uniform lat/lon grid for nearest-neighbour queries over facilities"""
+
+    def __init__(self, cell_deg: float = CELL_DEG):
+        self.cell_deg = cell_deg
+        self.cells: Dict[Tuple[int, int], List[Tuple[float, float, Any]]] = {}
+        self.size = 0
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg))
+
+    def insert(self, lat: float, lon: float, item: Any):
+        self.cells.setdefault(self._cell(lat, lon), []).append((lat, lon, item))
+        self.size += 1
+
+    def nearest(self, lat: float, lon: float, max_km: float, limit: Optional[int] = 10,
+                where: Optional[Callable[[Any], bool]] = None) -> List[Tuple[float, Any]]:
+        """(distance_km, item) pairs within max_km, closest first; only items where(item) holds"""
+        if not self.size:
+            return []
+        cx, cy = self._cell(lat, lon)
+        # Rings of cells needed to cover max_km (a degree of latitude is ~111 km;
+        # longitude cells shrink away from the equator, which widens the ring)
+        lat_rings = math.ceil(max_km / (111.0 * self.cell_deg))
+        lon_scale = max(math.cos(math.radians(lat)), 0.01)
+        lon_rings = math.ceil(max_km / (111.0 * self.cell_deg * lon_scale))
+
+        found = []
+        for dx in range(-lat_rings, lat_rings + 1):
+            for dy in range(-lon_rings, lon_rings + 1):
+                for item_lat, item_lon, item in self.cells.get((cx + dx, cy + dy), ()):
+                    if where is not None and not where(item):
+                        continue
+                    distance = haversine_km(lat, lon, item_lat, item_lon)
+                    if distance <= max_km:
+                        found.append((distance, item))
+        found.sort(key=lambda pair: pair[0])
+        return found if limit is None else found[:limit]
+
+_gazetteer = None
+_facility_index = None
+_index_lock = threading.Lock()
+
+def get_gazetteer() -> Gazetteer:
+    global _gazetteer
+    if _gazetteer is None:
+        _gazetteer = Gazetteer()
+    return _gazetteer
+
+def get_facility_index() -> GridIndex:
+    """Grid of geocoded facilities, built from the database on first use"""
+    global _facility_index
+    if _facility_index is None:
+        with _index_lock:
+            if _facility_index is None:
+                import crud
+                index = GridIndex()
+                for facility in crud.get_geocoded_facilities():
+                    index.insert(facility['latitude'], facility['longitude'], facility)
+                _facility_index = index
+    return _facility_index
+
+def invalidate_facility_index():
+    """Drop the cached index after facilities or organisations change"""
+    global _facility_index
+    with _index_lock:
+        _facility_index = None
+
+def geocode_missing_facilities() -> Dict[str, int]:
+    """Fill latitude/longitude for facilities from their free-text location"""
+    import crud
+    gazetteer = get_gazetteer()
+    geocoded, unresolved = 0, 0
+    for facility in crud.get_facilities_missing_coordinates():
+        coords = gazetteer.lookup(facility['location'] or '') or gazetteer.lookup(facility['name'])
+        if coords:
+            crud.update_facility_coordinates(facility['id'], coords[0], coords[1])
+            geocoded += 1
+        else:
+            unresolved += 1
+    invalidate_facility_index()
+    return {"geocoded": geocoded, "unresolved": unresolved}
+
+def nearest_organisations(
+    locations: List[str],
+    org_types: Optional[List[str]] = None,
+    radius_km: float = 25.0,
+    limit: int = 3,
+    organisation_ids: Optional[List[str]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Organisations owning the facilities closest to any of the given places
+
+    Args:
+        locations: Place names from entity extraction (GPE)
+        org_types: Only organisations of these types (None/empty = any)
+        organisation_ids: Only these organisations (None/empty = any), e.g.
+            the routing policy's targets when ranking them by distance
+        radius_km: Ignore facilities further away than this
+        limit: Maximum number of organisations
+
+    Returns:
+        Organisation dicts with the distance of their nearest facility,
+        closest first; empty if no location could be geocoded
+    """
+    gazetteer = get_gazetteer()
+    points = [p for p in (gazetteer.lookup(loc) for loc in locations) if p]
+    if not points:
+        return []
+
+    index = get_facility_index()
+    allowed = set(organisation_ids) if organisation_ids else None
+
+    def eligible(facility):
+        if org_types and facility['organisation_type'] not in org_types:
+            return False
+        return allowed is None or facility['organisation_id'] in allowed
+
+    best: Dict[str, Dict[str, Any]] = {}
+    for lat, lon in points:
+        # Filter before the cut-off, so other organisations' facilities in a
+        # dense area can't crowd out the eligible ones
+        for distance, facility in index.nearest(lat, lon, radius_km, limit=None, where=eligible):
+            org_id = facility['organisation_id']
+            if org_id not in best or distance < best[org_id]['distance_km']:
+                best[org_id] = {
+                    'id': org_id,
+                    'name': facility['organisation_name'],
+                    'type': facility['organisation_type'],
+                    'contact_email': facility['contact_email'],
+                    'facility': facility['name'],
+                    'distance_km': round(distance, 2)
+                }
+    return sorted(best.values(), key=lambda o: o['distance_km'])[:limit]
@@ -0,0 +1,156 @@
+"""
+Perceptual-hash lookup for Dira images
+A BK-tree over 64-bit dHashes finds previously analysed images within a small
+Hamming distance, so near-identical photos of the same incident reuse one
+Gemini vision analysis. Also converts hashes between their hex form and the
+signed BIGINT stored in reports.image_hash.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+HASH_BITS = 64
+# Near-identical photos (recompressed, resized, slightly cropped) differ in a
+# few bits of a 64-bit dHash; unrelated photos differ in ~32
+DEFAULT_MAX_DISTANCE = 5
+
+# A matching photo alone doesn't make a duplicate: uniform, dark or
+# screenshot images collide across unrelated incidents. The texts must also
+# be this similar, or the reports share a category.
+IMAGE_DUPLICATE_MIN_TEXT_SIMILARITY = 0.6
+
+def corroborated(match: Dict[str, Any], category: Optional[str] = None,
+                 min_text_similarity: float = IMAGE_DUPLICATE_MIN_TEXT_SIMILARITY) -> bool:
+    """Whether an image-hash match (crud.find_image_duplicates row) counts as a duplicate"""
+    text_similarity = match.get("text_similarity")
+    if text_similarity is not None and text_similarity >= min_text_similarity:
+        return True
+    return bool(category) and match.get("category") == category
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+def parse_hash(value: Any) -> Optional[int]:
+    """Hash as an unsigned int from hex text, an int or a signed BIGINT"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        return int(value, 16)
+    return int(value) & ((1 << HASH_BITS) - 1)
+
+def to_db(value: Any) -> Optional[int]:
+    """Unsigned 64-bit hash -> signed BIGINT for PostgreSQL"""
+    h = parse_hash(value)
+    if h is None:
+        return None
+    return h - (1 << HASH_BITS) if h >= 1 << (HASH_BITS - 1) else h
+
+def to_hex(value: Any) -> Optional[str]:
+    h = parse_hash(value)
+    return None if h is None else f"{h:016x}"
+
+class BKTree:
+    """
+    Burkhard-Keller tree under Hamming distance. Each child edge is labelled
+    with its distance to the parent, so a radius-r search only descends into
+    children whose label is within r of the query's distance to the node
+    (triangle inequality).
+    """
+
+    def __init__(self):
+        self.root = None  # [hash, values, {distance: child}]
+        self.size = 0
+
+    def add(self, h: int, value: Any):
+        if self.root is None:
+            self.root = [h, [value], {}]
+            self.size = 1
+            return
+        node = self.root
+        while True:
+            d = hamming(h, node[0])
+            if d == 0:
+                node[1].append(value)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [h, [value], {}]
+                self.size += 1
+                return
+            node = child
+
+    def search(self, h: int, max_distance: int) -> List[Tuple[int, Any]]:
+        """(distance, value) pairs within max_distance, closest first"""
+        if self.root is None:
+            return []
+        found = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            d = hamming(h, node[0])
+            if d <= max_distance:
+                found.extend((d, v) for v in node[1])
+            for edge, child in node[2].items():
+                if d - max_distance <= edge <= d + max_distance:
+                    stack.append(child)
+        found.sort(key=lambda pair: pair[0])
+        return found
+
+class ImageAnalysisCache:
+    """
+    Vision analyses keyed by perceptual hash with near-duplicate lookup
+
+    BK-trees don't support deletion, so when the cache exceeds max_entries
+    the tree is rebuilt from the most recently used half.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_distance: int = DEFAULT_MAX_DISTANCE):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self._entries: "OrderedDict[int, str]" = OrderedDict()
+        self._tree = BKTree()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, image_hash: Any) -> Optional[Dict[str, Any]]:
+        """{'analysis', 'distance', 'image_hash'} of the nearest cached image, or None"""
+        h = parse_hash(image_hash)
+        with self._lock:
+            for distance, key in self._tree.search(h, self.max_distance):
+                analysis = self._entries.get(key)
+                if analysis is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return {"analysis": analysis, "distance": distance, "image_hash": to_hex(key)}
+            self.misses += 1
+            return None
+
+    def put(self, image_hash: Any, analysis: str):
+        h = parse_hash(image_hash)
+        with self._lock:
+            if h not in self._entries:
+                self._tree.add(h, h)
+            self._entries[h] = analysis
+            self._entries.move_to_end(h)
+            if len(self._entries) > self.max_entries:
+                self._rebuild(self.max_entries // 2)
+
+    def _rebuild(self, keep: int):
+        while len(self._entries) > keep:
+            self._entries.popitem(last=False)
+        self._tree = BKTree()
+        for h in self._entries:
+            self._tree.add(h, h)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "max_distance": self.max_distance
+        }
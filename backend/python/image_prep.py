@@ -0,0 +1,109 @@
+"""
+Image normalisation for Dira
+Decodes uploaded report photos, strips EXIF (including GPS), downsizes them to
+a resolution that is enough for vision analysis and recompresses them, so
+Gemini, Postgres and the walkers handle ~100 KB images instead of raw phone
+photos. Also computes a perceptual hash (dHash) used to reuse analyses.
+"""
+
+import os
+import io
+import base64
+import binascii
+from dataclasses import dataclass
+
+# Reject uploads larger than this after base64 decoding
+MAX_UPLOAD_BYTES = int(float(os.getenv("IMAGE_MAX_UPLOAD_MB", "10")) * 1024 * 1024)
+# Longest side after downscaling; plenty for damage/hazard recognition
+VISION_MAX_SIDE = int(os.getenv("IMAGE_MAX_SIDE", "1024"))
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "80"))
+# Refuse decompression bombs (a small file that expands to a huge bitmap)
+MAX_PIXELS = 50_000_000
+
+class ImageTooLarge(ValueError):
+    """Upload exceeds MAX_UPLOAD_BYTES"""
+
+class InvalidImage(ValueError):
+    """Data is not a decodable image"""
+
+@dataclass
+class PreparedImage:
+    data: bytes
+    mime_type: str
+    width: int
+    height: int
+    phash: str  # 64-bit dHash as 16 hex digits
+    original_size: int
+
+    def to_data_url(self) -> str:
+        return f"data:{self.mime_type};base64," + base64.b64encode(self.data).decode("ascii")
+
+def decode_data_url(image_data: str) -> bytes:
+    """Bytes of a base64 string or data URL ("data:image/png;base64,...")"""
+    if "," in image_data:
+        image_data = image_data.split(",", 1)[1]
+    # Check the size before decoding (base64 is 4 chars per 3 bytes)
+    if len(image_data) * 3 // 4 > MAX_UPLOAD_BYTES:
+        raise ImageTooLarge(f"Image exceeds {MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+    try:
+        return base64.b64decode(image_data, validate=False)
+    except (binascii.Error, ValueError) as e:
+        raise InvalidImage(f"Invalid base64 image data: {e}")
+
+def _output_format() -> tuple:
+    from PIL import features
+    if features.check("webp"):
+        return "WEBP", "image/webp"
+    return "JPEG", "image/jpeg"
+
+def dhash(image, hash_size: int = 8) -> int:
+    """
+    Difference hash: shrink to (hash_size+1) x hash_size greyscale and set a
+    bit wherever a pixel is brighter than its right neighbour. Robust to
+    rescaling and recompression; near-identical photos differ in a few bits.
+    """
+    from PIL import Image
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+def prepare_image(raw: bytes) -> PreparedImage:
+    """Strip metadata, downscale and recompress an uploaded image"""
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    if len(raw) > MAX_UPLOAD_BYTES:
+        raise ImageTooLarge(f"Image exceeds {MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+
+    Image.MAX_IMAGE_PIXELS = MAX_PIXELS
+    try:
+        image = Image.open(io.BytesIO(raw))
+        # Decode at a reduced scale where the codec supports it (JPEG)
+        image.draft("RGB", (VISION_MAX_SIDE, VISION_MAX_SIDE))
+        # Apply the EXIF orientation to the pixels before the metadata is dropped
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("RGB")
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise InvalidImage(f"Unreadable image: {e}")
+
+    image.thumbnail((VISION_MAX_SIDE, VISION_MAX_SIDE), Image.LANCZOS)
+
+    # Drop EXIF (GPS, device serials), XMP and ICC metadata
+    image.info = {}
+    fmt, mime_type = _output_format()
+    options = {"method": 4} if fmt == "WEBP" else {"optimize": True, "progressive": True}
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, quality=IMAGE_QUALITY, **options)
+
+    return PreparedImage(
+        data=buffer.getvalue(),
+        mime_type=mime_type,
+        width=image.width,
+        height=image.height,
+        phash=f"{dhash(image):016x}",
+        original_size=len(raw)
+    )
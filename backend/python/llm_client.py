@@ -0,0 +1,277 @@
+"""
+LLM clients for Dira
+nlp_service talks to its language model through one small interface, so the
+provider, model and endpoint are configuration rather than code:
+
+    LLM_PROVIDER=gemini   Google Gemini through google-genai (default)
+    LLM_PROVIDER=openai   any OpenAI-compatible /chat/completions API
+    LLM_PROVIDER=replay   answers recorded in LLM_CASSETTE, fully offline
+    LLM_PROVIDER=none     no model; endpoints use their keyword fallbacks
+
+With LLM_RECORD=true the live provider is wrapped and every exchange is
+appended to LLM_CASSETTE (JSON lines), so a benchmark can later replay the
+same answers with the recorded latencies.
+"""
+
+import os
+import json
+import time
+import base64
+import hashlib
+import logging
+import random
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Union
+
+DEFAULT_MODELS = {"gemini": "gemini-2.5-flash", "openai": "gpt-4o-mini"}
+DEFAULT_CASSETTE = os.path.join(os.path.dirname(__file__), "llm_cassette.jsonl")
+
+class LLMError(RuntimeError):
+    """The model call failed"""
+
+class LLMUnavailable(LLMError):
+    """No answer available (e.g. a prompt missing from the replay cassette)"""
+
+@dataclass
+class ImagePart:
+    data: bytes
+    mime_type: str
+
+Contents = Union[str, List[Union[str, ImagePart]]]
+
+def _as_parts(contents: Contents) -> List[Union[str, ImagePart]]:
+    return [contents] if isinstance(contents, (str, ImagePart)) else list(contents)
+
+def content_key(contents: Contents) -> str:
+    """Stable key for a prompt: text verbatim, images by content hash"""
+    normalised = []
+    for part in _as_parts(contents):
+        if isinstance(part, ImagePart):
+            normalised.append({"image": hashlib.sha256(part.data).hexdigest(), "mime_type": part.mime_type})
+        else:
+            normalised.append({"text": part})
+    return hashlib.sha256(json.dumps(normalised, sort_keys=True).encode("utf-8")).hexdigest()
+
+def _prompt_preview(contents: Contents) -> str:
+    text = " ".join(p for p in _as_parts(contents) if isinstance(p, str))
+    return " ".join(text.split())[:200]
+
+class LLMClient(ABC):
+    """generate(contents) -> response text"""
+
+    provider = "none"
+    model = ""
+
+    @abstractmethod
+    def generate(self, contents: Contents, operation: str = "") -> str:
+        """Send the prompt (text and image parts) and return the model's text"""
+
+    def warm_up(self):
+        """Do slow setup (SDK import, cassette load) before the first request"""
+
+# ============ Providers ============
+
+class GeminiClient(LLMClient):
+    provider = "gemini"
+
+    def __init__(self, api_key: str, model: str = DEFAULT_MODELS["gemini"], base_url: str = ""):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url
+        self._client = None
+        self._lock = threading.Lock()
+
+    def warm_up(self):
+        # google-genai is imported here so nlp_service binds its port quickly
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from google import genai
+                    from google.genai import types
+                    http_options = types.HttpOptions(base_url=self.base_url) if self.base_url else None
+                    self._client = genai.Client(api_key=self.api_key, http_options=http_options)
+        return self._client
+
+    def generate(self, contents: Contents, operation: str = "") -> str:
+        from google.genai import types
+        client = self.warm_up()
+        parts = [types.Part.from_bytes(data=p.data, mime_type=p.mime_type) if isinstance(p, ImagePart) else p
+                 for p in _as_parts(contents)]
+        response = client.models.generate_content(
+            model=self.model,
+            contents=parts[0] if len(parts) == 1 and isinstance(parts[0], str) else parts
+        )
+        return response.text
+
+class OpenAICompatibleClient(LLMClient):
+    """Chat Completions API (OpenAI, Azure OpenAI, vLLM, Ollama, ...)"""
+
+    provider = "openai"
+
+    def __init__(self, api_key: str, model: str = DEFAULT_MODELS["openai"],
+                 base_url: str = "https://api.openai.com/v1", timeout: float = 60.0):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def generate(self, contents: Contents, operation: str = "") -> str:
+        import requests
+        content = []
+        for part in _as_parts(contents):
+            if isinstance(part, ImagePart):
+                url = f"data:{part.mime_type};base64," + base64.b64encode(part.data).decode("ascii")
+                content.append({"type": "image_url", "image_url": {"url": url}})
+            else:
+                content.append({"type": "text", "text": part})
+        response = requests.post(
+            f"{self.base_url}/chat/completions",
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            json={"model": self.model, "messages": [{"role": "user", "content": content}]},
+            timeout=self.timeout
+        )
+        if response.status_code != 200:
+            raise LLMError(f"{self.base_url} returned {response.status_code}: {response.text[:200]}")
+        return response.json()["choices"][0]["message"]["content"]
+
+# ============ Record / Replay ============
+
+class Cassette:
+    """Recorded exchanges, one JSON object per line, indexed by content_key"""
+
+    def __init__(self, path: str = DEFAULT_CASSETTE):
+        self.path = path
+        self._entries: Optional[Dict[str, List[Dict[str, Any]]]] = None
+        self._lock = threading.Lock()
+
+    def load(self) -> Dict[str, List[Dict[str, Any]]]:
+        if self._entries is None:
+            with self._lock:
+                if self._entries is None:
+                    entries: Dict[str, List[Dict[str, Any]]] = {}
+                    if os.path.exists(self.path):
+                        with open(self.path) as f:
+                            for line in f:
+                                if line.strip():
+                                    record = json.loads(line)
+                                    entries.setdefault(record["key"], []).append(record)
+                    self._entries = entries
+        return self._entries
+
+    def get(self, key: str) -> List[Dict[str, Any]]:
+        return self.load().get(key, [])
+
+    def latencies(self) -> List[float]:
+        return [r["latency_ms"] for records in self.load().values() for r in records]
+
+    def append(self, record: Dict[str, Any]):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line)
+            if self._entries is not None:
+                self._entries.setdefault(record["key"], []).append(record)
+
+class RecordingClient(LLMClient):
+    """Passes calls to a live client and appends each answer and its latency to a cassette"""
+
+    def __init__(self, inner: LLMClient, cassette: Cassette):
+        self.inner = inner
+        self.cassette = cassette
+        self.provider = inner.provider
+        self.model = inner.model
+
+    def warm_up(self):
+        self.inner.warm_up()
+
+    def generate(self, contents: Contents, operation: str = "") -> str:
+        start = time.perf_counter()
+        text = self.inner.generate(contents, operation)
+        self.cassette.append({
+            "key": content_key(contents),
+            "operation": operation,
+            "provider": self.inner.provider,
+            "model": self.inner.model,
+            "prompt": _prompt_preview(contents),
+            "text": text,
+            "latency_ms": round((time.perf_counter() - start) * 1000, 1)
+        })
+        return text
+
+class ReplayClient(LLMClient):
+    """
+    Answers from a cassette. With latency="recorded" each answer is delayed
+    by its recorded latency times latency_scale, so offline runs keep the
+    provider's latency distribution; "none" answers immediately.
+    """
+
+    provider = "replay"
+
+    def __init__(self, cassette: Cassette, latency: str = "recorded", latency_scale: float = 1.0):
+        self.cassette = cassette
+        self.latency = latency
+        self.latency_scale = latency_scale
+        self._turns: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def warm_up(self):
+        entries = self.cassette.load()
+        models = {r.get("model") for records in entries.values() for r in records}
+        self.model = ",".join(sorted(m for m in models if m))
+        logging.info(f"LLM replay cassette {self.cassette.path}: {len(entries)} prompts")
+
+    def generate(self, contents: Contents, operation: str = "") -> str:
+        key = content_key(contents)
+        records = self.cassette.get(key)
+        with self._lock:
+            if not records:
+                self.misses += 1
+                raise LLMUnavailable(f"Prompt not in cassette ({operation or 'unknown'}): {_prompt_preview(contents)[:80]}")
+            self.hits += 1
+            # Cycle through repeated recordings of the same prompt
+            turn = self._turns.get(key, 0)
+            self._turns[key] = turn + 1
+        record = records[turn % len(records)]
+        if self.latency == "recorded":
+            time.sleep(record.get("latency_ms", 0.0) * self.latency_scale / 1000)
+        return record["text"]
+
+def sample_latency_ms(cassette: Cassette, rng: random.Random, fallback_ms: float) -> float:
+    """A latency drawn from the cassette's recorded distribution"""
+    latencies = cassette.latencies()
+    return rng.choice(latencies) if latencies else fallback_ms
+
+# ============ Configuration ============
+
+def from_env() -> Optional[LLMClient]:
+    """The client configured by LLM_* variables, or None when no model is available"""
+    provider = os.getenv("LLM_PROVIDER", "gemini").lower()
+    model = os.getenv("LLM_MODEL") or DEFAULT_MODELS.get(provider, "")
+    cassette = Cassette(os.getenv("LLM_CASSETTE") or DEFAULT_CASSETTE)
+
+    if provider == "none":
+        return None
+    if provider == "replay":
+        latency = os.getenv("LLM_REPLAY_LATENCY", "recorded").lower()
+        return ReplayClient(cassette, "none" if latency == "none" else "recorded",
+                            float(os.getenv("LLM_REPLAY_LATENCY_SCALE", "1.0")))
+    if provider == "gemini":
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            return None
+        client = GeminiClient(api_key, model, os.getenv("GEMINI_BASE_URL", ""))
+    elif provider == "openai":
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            return None
+        client = OpenAICompatibleClient(api_key, model, os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1"))
+    else:
+        raise ValueError(f"Unknown LLM_PROVIDER: {provider}")
+
+    if os.getenv("LLM_RECORD", "false").lower() in ("1", "true", "yes"):
+        client = RecordingClient(client, cassette)
+    return client
@@ -0,0 +1,142 @@
+"""
+Local classification tier for Dira
+Nearest-centroid classifiers over the MiniLM report embeddings, trained from
+the labels the LLM gave earlier reports (classifier_labels in PostgreSQL).
+Used before Gemini so most reports classify in milliseconds without a
+network call.
+"""
+
+import json
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from crud import get_labelled_embeddings
+
+CATEGORIES = ["infrastructure", "safety", "utility", "health", "general"]
+URGENCIES = ["low", "medium", "high"]
+
+# A label needs this many examples before it gets a centroid
+MIN_SAMPLES_PER_LABEL = 5
+# Softmax temperature over cosine similarities (smaller = sharper confidence)
+TEMPERATURE = 0.05
+
+class CentroidClassifier:
+    """Cosine nearest-centroid classifier with softmax confidence"""
+
+    def __init__(self):
+        self.labels: List[str] = []
+        self.centroids: Optional[np.ndarray] = None
+        self.trained_on = 0
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None and len(self.labels) >= 2
+
+    def fit(self, embeddings: np.ndarray, labels: List[str]) -> 'CentroidClassifier':
+        """Compute one L2-normalised centroid per label"""
+        labels_arr = np.asarray(labels)
+        kept_labels, centroids = [], []
+        for label in sorted(set(labels)):
+            rows = embeddings[labels_arr == label]
+            if len(rows) < MIN_SAMPLES_PER_LABEL:
+                continue
+            centroid = rows.mean(axis=0)
+            centroids.append(centroid / np.linalg.norm(centroid))
+            kept_labels.append(label)
+
+        self.labels = kept_labels
+        self.centroids = np.vstack(centroids).astype(np.float32) if centroids else None
+        self.trained_on = len(labels)
+        return self
+
+    def predict(self, embedding) -> Optional[Tuple[str, float]]:
+        """Return (label, confidence) or None if the classifier isn't trained"""
+        if not self.is_trained:
+            return None
+        vec = np.asarray(embedding, dtype=np.float32)
+        vec = vec / np.linalg.norm(vec)
+        sims = self.centroids @ vec
+        weights = np.exp((sims - sims.max()) / TEMPERATURE)
+        probs = weights / weights.sum()
+        best = int(probs.argmax())
+        return self.labels[best], float(probs[best])
+
+def _parse_embedding(value) -> List[float]:
+    # pgvector comes back as '[0.1,0.2,...]' unless the adapter is registered
+    return json.loads(value) if isinstance(value, str) else list(value)
+
+class LocalTier:
+    """Category and urgency classifiers plus agreement stats against the LLM"""
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self.label_sets = {"category": CATEGORIES, "urgency": URGENCIES}
+        self.models: Dict[str, CentroidClassifier] = {
+            "category": CentroidClassifier(),
+            "urgency": CentroidClassifier(),
+        }
+        self.stats = {
+            field: {"local": 0, "escalated": 0, "compared": 0, "agreed": 0}
+            for field in self.models
+        }
+        self._lock = threading.Lock()
+
+    def train(self, limit: int = 5000) -> Dict[str, int]:
+        """(Re)train both classifiers from the LLM labels stored in PostgreSQL"""
+        counts = {}
+        for field, labels in self.label_sets.items():
+            rows = get_labelled_embeddings(field, labels, limit)
+            if rows:
+                embeddings = np.array([_parse_embedding(r['embedding']) for r in rows], dtype=np.float32)
+                model = CentroidClassifier().fit(embeddings, [r['label'] for r in rows])
+            else:
+                model = CentroidClassifier()
+            with self._lock:
+                self.models[field] = model
+            counts[field] = len(rows)
+        logging.info(f"Local classifier trained: {counts}")
+        return counts
+
+    def is_complete(self, field: str) -> bool:
+        """
+        Whether every label of the field has a centroid. Until then the
+        softmax over the trained centroids would confidently assign reports
+        of a missing label to its nearest neighbour, and that label would
+        never reach the LLM to be learned.
+        """
+        model = self.models[field]
+        return model.is_trained and set(self.label_sets[field]) <= set(model.labels)
+
+    def predict(self, field: str, embedding) -> Optional[Tuple[str, float]]:
+        """Prediction if every label is trained and it clears the confidence threshold, otherwise None"""
+        prediction = self.models[field].predict(embedding) if self.is_complete(field) else None
+        with self._lock:
+            if prediction and prediction[1] >= self.threshold:
+                self.stats[field]["local"] += 1
+                return prediction
+            self.stats[field]["escalated"] += 1
+        return None
+
+    def record_agreement(self, field: str, embedding, llm_label: str):
+        """Compare the local guess with the LLM answer for an escalated report"""
+        prediction = self.models[field].predict(embedding)
+        if not prediction:
+            return
+        with self._lock:
+            self.stats[field]["compared"] += 1
+            if prediction[0] == llm_label:
+                self.stats[field]["agreed"] += 1
+
+    def summary(self) -> Dict[str, dict]:
+        out = {}
+        for field, model in self.models.items():
+            stats = dict(self.stats[field])
+            stats["agreement"] = stats["agreed"] / stats["compared"] if stats["compared"] else None
+            stats["labels"] = model.labels
+            stats["missing_labels"] = [l for l in self.label_sets[field] if l not in model.labels]
+            stats["trained_on"] = model.trained_on
+            out[field] = stats
+        return {"threshold": self.threshold, "models": out}
@@ -3,7 +3,7 @@ Data models for Dira
 Corresponds to database tables with type hints
 """
 
-from dataclasses import dataclass, field, asdict
+from dataclasses import dataclass, field, asdict, fields
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 import json
@@ -44,6 +44,8 @@ class Facility:
     location: str
     organisation_id: str
     id: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
     created_at: Optional[datetime] = None
     
     @classmethod
@@ -58,7 +60,7 @@ class Facility:
 @dataclass
 class Reporter:
     """Reporter/User model"""
-    email: str
+    email: Optional[str]  # NULL for named submitters who gave no email
     is_anonymous: bool = False
     id: Optional[str] = None
     name: Optional[str] = None
@@ -86,7 +88,9 @@ class Report:
     reporter_id: Optional[str] = None
     image_data: Optional[str] = None
     analysis_result: Optional[str] = None
+    image_hash: Optional[str] = None  # 64-bit dHash as 16 hex digits (signed BIGINT in the table)
     embedding: Optional[List[float]] = None
+    canonical_report_id: Optional[str] = None  # duplicate cluster root, None if canonical
     created_at: Optional[datetime] = None
     
     def to_dict(self) -> Dict[str, Any]:
@@ -105,6 +109,11 @@ class Report:
             data['id'] = str(data['id'])
         if isinstance(data.get('reporter_id'), uuid.UUID):
             data['reporter_id'] = str(data['reporter_id'])
+        if isinstance(data.get('canonical_report_id'), uuid.UUID):
+            data['canonical_report_id'] = str(data['canonical_report_id'])
+        
+        if isinstance(data.get('image_hash'), int):
+            data['image_hash'] = f"{data['image_hash'] & 0xFFFFFFFFFFFFFFFF:016x}"
         
         # Parse JSON fields
         if isinstance(data.get('entities'), str):
@@ -114,7 +123,9 @@ class Report:
         if isinstance(data.get('embedding'), str):
             data['embedding'] = json.loads(data['embedding'])
         
-        return cls(**data)
+        # Ignore derived columns such as search_tsv
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in known})
 
 @dataclass
 class ReportRoute:
@@ -144,7 +155,7 @@ class RelatedReport:
     related_report_id: str
     similarity_score: float
     id: Optional[str] = None
-    relationship_type: str = "duplicate"  # duplicate, similar
+    relationship_type: str = "duplicate"  # duplicate, image_duplicate, similar
     created_at: Optional[datetime] = None
     
     @classmethod
@@ -1,28 +1,43 @@
 # NLP Service for entity extraction, classification, confidence scoring
 
 from fastapi import FastAPI
-import spacy
-from transformers import pipeline
-from sentence_transformers import SentenceTransformer
+from fastapi.responses import JSONResponse
 import json
 import os
 import sys
-import base64
 import io
-from PIL import Image
+import threading
+import random
+import gc
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from dotenv import load_dotenv
-from google import genai
-from google.genai import types
+
+# Heavy ML / LLM libraries (spacy, sentence_transformers, google.genai) are
+# imported inside their loaders below (google.genai in llm_client) so the
+# service binds its port quickly and the models are warmed up in the background.
 
 # Add project root to Python path
 sys.path.append(os.path.dirname(__file__))
 
-# Import database layer
+# Import database layer (the connection pool is created lazily on first query)
 from crud import (
     store_report_embedding, 
     find_duplicate_reports,
-    search_reports_by_similarity
+    search_reports_by_similarity,
+    find_image_duplicates,
+    get_image_analyses,
+    store_classifier_label
 )
+from local_classifier import LocalTier, CATEGORIES, URGENCIES
+from image_prep import decode_data_url, prepare_image, ImageTooLarge, InvalidImage
+from image_index import ImageAnalysisCache, corroborated as image_match_corroborated
+from tracing import TraceMiddleware, span
+from metrics import Counter, Histogram, instrument_app, register_db_pool_metrics
+from llm_client import ImagePart
+import llm_client
+from db import Database
 
 # Load environment variables
 load_dotenv()
@@ -33,84 +48,468 @@ logging.basicConfig(filename='nlp_service.log', level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
 app = FastAPI()
+app.add_middleware(TraceMiddleware, service_name="nlp_service")
+instrument_app(app, "nlp_service")
 
 # Configuration from environment
 CACHE_DIR = os.getenv("HUGGINGFACE_CACHE_DIR", "./models_cache")
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-
-if GEMINI_API_KEY:
-    gemini_client = genai.Client(api_key=GEMINI_API_KEY)
-    
-    GEMINI_MODEL_NAME = 'gemini-2.5-flash' 
-
-else:
-    # print("Warning: GEMINI_API_KEY not found. Falling back to local models where possible, or failing.")
-    pass
+# LLM provider and model (LLM_PROVIDER, LLM_MODEL, GEMINI_BASE_URL, ...);
+# None when no API key or cassette is configured, see llm_client.py
+llm = llm_client.from_env()
+# Embedding backend: "torch" (SentenceTransformer) or "onnx" (int8 ONNX Runtime)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+NLP_WARMUP = os.getenv("NLP_WARMUP", "true").lower() in ("1", "true", "yes")
+# Local classifier tier: the LLM is only consulted below this confidence
+LOCAL_CLASSIFIER_THRESHOLD = float(os.getenv("LOCAL_CLASSIFIER_THRESHOLD", "0.75"))
+# Fraction of confident local predictions still sent to the LLM, to measure
+# agreement and keep producing training labels for the next retrain
+LOCAL_CLASSIFIER_AUDIT_RATE = float(os.getenv("LOCAL_CLASSIFIER_AUDIT_RATE", "0.1"))
+# Seconds between retrains of the local tier from new LLM labels (0 = only at warm-up or on request)
+LOCAL_CLASSIFIER_RETRAIN_SECONDS = float(os.getenv("LOCAL_CLASSIFIER_RETRAIN_SECONDS", "3600"))
+# Number of forked model workers for CPU-bound encode()/nlp() calls (0 = in-process)
+NLP_WORKERS = int(os.getenv("NLP_WORKERS", "0"))
+
+# HF tokenizers' own thread pool deadlocks after fork; workers parallelise instead
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+# Pipeline components we never read from; excluding them makes NER ~3x faster
+SPACY_EXCLUDE = ["tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer", "senter"]
+# nlp.pipe batching for /extract_entities_batch
+NER_BATCH_SIZE = int(os.getenv("NER_BATCH_SIZE", "64"))
+NER_N_PROCESS = int(os.getenv("NER_N_PROCESS", "1"))
+
+# Entity label -> response key
+ENTITY_LABELS = {"ORG": "organisations", "GPE": "locations", "PERSON": "persons"}
+
+# ============ Metrics ============
+
+llm_request_duration = Histogram(
+    "llm_request_duration_seconds", "LLM generate latency", ["provider", "operation"]
+)
+llm_errors = Counter("llm_errors_total", "Failed LLM calls", ["provider", "operation"])
+# Which tier answered classify/assess_urgency: local, llm or keyword
+classification_tier = Counter(
+    "nlp_classification_tier_total", "Classifications served per tier", ["task", "tier"]
+)
+# Responses built from keywords or templates because no model answered
+fallbacks = Counter("nlp_fallback_total", "Responses served by the non-model fallback", ["operation"])
+encode_batch_size = Histogram(
+    "embedding_encode_batch_size", "Texts per encode() call", buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+encode_duration = Histogram("embedding_encode_duration_seconds", "encode() latency per batch")
+register_db_pool_metrics(Database)
+
+# One lock per model so a request needing spaCy doesn't wait on MiniLM loading
+_nlp_lock = threading.Lock()
+_embed_lock = threading.Lock()
+
+def llm_generate(operation: str, contents) -> str:
+    """Response text from the configured LLM, timed as a pipeline span"""
+    with span("llm.generate_content", **{"gen_ai.system": llm.provider, "gen_ai.request.model": llm.model,
+                                          "gen_ai.operation": operation}), \
+            llm_request_duration.labels(llm.provider, operation).time():
+        try:
+            return llm.generate(contents, operation)
+        except Exception as e:
+            llm_errors.labels(llm.provider, operation).inc()
+            logging.warning(f"LLM {operation} failed ({llm.provider}): {e}")
+            raise
 
 # Load models with cache directory
 nlp_model = None
 def get_nlp():
     global nlp_model
     if nlp_model is None:
-        logging.info("Loading Spacy model...")
-        nlp_model = spacy.load("en_core_web_sm")
+        with _nlp_lock:
+            if nlp_model is None:
+                import spacy
+                logging.info("Loading Spacy model...")
+                # Only NER is used; en_core_web_sm's ner has its own tok2vec
+                nlp_model = spacy.load("en_core_web_sm", exclude=SPACY_EXCLUDE)
     return nlp_model
 
 # classifier = pipeline("text-classification", model="microsoft/DialoGPT-medium", cache_dir=CACHE_DIR) # Replaced by Gemini
 # message_drafter = pipeline("text-generation", model="gpt2", cache_dir=CACHE_DIR) # Replaced by Gemini
 
+def _load_sentence_transformer():
+    from sentence_transformers import SentenceTransformer
+    logging.info("Loading SentenceTransformer model...")
+    return SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2", cache_folder=CACHE_DIR)
+
 embed_model = None
-def get_embedding_model():
-    global embed_model
+embed_backend = None
+# Set once the ONNX backend failed, so it isn't retried (e.g. in every worker)
+_onnx_unavailable = False
+
+def get_embedding_model(num_threads=None):
+    global embed_model, embed_backend, _onnx_unavailable
     if embed_model is None:
-        logging.info("Loading SentenceTransformer model...")
-        embed_model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2", cache_folder=CACHE_DIR)
+        with _embed_lock:
+            if embed_model is None:
+                if EMBEDDING_BACKEND == "onnx" and not _onnx_unavailable:
+                    try:
+                        from onnx_embedder import load_onnx_embedder
+                        logging.info("Loading int8 ONNX embedding model...")
+                        embed_model = load_onnx_embedder(CACHE_DIR, _load_sentence_transformer, num_threads)
+                        embed_backend = "onnx"
+                    except Exception as e:
+                        _onnx_unavailable = True
+                        logging.error(f"ONNX embedding backend unavailable, using torch: {e}")
+                if embed_model is None:
+                    embed_model = _load_sentence_transformer()
+                    embed_backend = "torch"
     return embed_model
 
+# ============ Worker Pool ============
+#
+# spaCy and MiniLM hold the GIL for the whole call, so one uvicorn process
+# serialises every request. With NLP_WORKERS > 0 the models are loaded once in
+# this process and a fork-based process pool is created afterwards: children
+# inherit the weights copy-on-write, so N workers share one copy of the model
+# pages instead of costing N x RAM.
+#
+# Forking is only safe before torch/spaCy have started their thread pools
+# here and before uvicorn serves requests, so the pool is created and every
+# worker started from the startup hook (start_worker_pool). Once a model has
+# run in this process the pool is refused and calls run inline.
+
+worker_pool = None
+_pool_lock = threading.Lock()
+_parent_pid = os.getpid()
+# Set when a model ran in the parent process (its intra-op threads are live)
+_models_ran_here = False
+_pool_refused = False
+
+def _mark_inline_run():
+    global _models_ran_here
+    if os.getpid() == _parent_pid:
+        _models_ran_here = True
+
+def _worker_started() -> int:
+    return os.getpid()
+
+def _init_worker():
+    """Keep each forked worker to one intra-op thread to avoid oversubscription"""
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+    if embed_model is None:
+        # ONNX Runtime sessions aren't fork-safe, so the parent only prepares
+        # the model files and each worker opens its own session
+        get_embedding_model(num_threads=1)
+
+def _prepare_embedding_model():
+    """Load what the workers should inherit before the pool forks"""
+    global _onnx_unavailable
+    if EMBEDDING_BACKEND == "onnx" and not _onnx_unavailable:
+        try:
+            from onnx_embedder import prepare_onnx_model
+            prepare_onnx_model(CACHE_DIR)
+            return
+        except Exception as e:
+            _onnx_unavailable = True
+            logging.error(f"ONNX embedding backend unavailable, using torch: {e}")
+    # torch weights are shared copy-on-write with the children
+    get_embedding_model()
+
+def get_worker_pool():
+    global worker_pool, _pool_refused
+    if NLP_WORKERS <= 0 or _pool_refused:
+        return None
+    if worker_pool is None:
+        with _pool_lock:
+            if worker_pool is None and not _pool_refused:
+                if _models_ran_here:
+                    # torch/spaCy thread pools are live; a fork could deadlock
+                    _pool_refused = True
+                    logging.error(
+                        f"NLP_WORKERS={NLP_WORKERS} ignored: models already ran in this process, "
+                        "so forking is unsafe. Running model calls inline."
+                    )
+                    return None
+                # Fork only after the models are resident so children share them
+                get_nlp()
+                _prepare_embedding_model()
+                # Move long-lived objects out of the GC's reach so collections in
+                # the children don't touch (and un-share) the inherited pages
+                gc.freeze()
+                pool = ProcessPoolExecutor(
+                    max_workers=NLP_WORKERS,
+                    mp_context=multiprocessing.get_context("fork"),
+                    initializer=_init_worker,
+                )
+                # ProcessPoolExecutor forks lazily on submit; start (and
+                # initialise) every worker now rather than during a request
+                pids = {f.result() for f in [pool.submit(_worker_started) for _ in range(NLP_WORKERS)]}
+                worker_pool = pool
+                logging.info(f"Started model worker pool with {NLP_WORKERS} processes ({len(pids)} answered)")
+    return worker_pool
+
+def start_worker_pool():
+    """Create the pool before serving traffic; models then only run in the workers"""
+    if threading.active_count() > 1:
+        logging.warning(
+            f"Forking model workers with {threading.active_count()} threads running: "
+            f"{[t.name for t in threading.enumerate()]}"
+        )
+    global _pool_refused
+    try:
+        get_worker_pool()
+    except Exception as e:
+        # Don't retry later from a request thread
+        _pool_refused = True
+        warmup_state["error"] = str(e)
+        logging.error(f"Model worker pool failed to start, running model calls inline: {e}")
+
+def run_in_worker(fn, *args):
+    """Run a CPU-bound model call in the worker pool, or inline when disabled"""
+    pool = get_worker_pool()
+    if pool is None:
+        _mark_inline_run()
+        return fn(*args)
+    return pool.submit(fn, *args).result()
+
+def _encode(texts: list) -> list:
+    return get_embedding_model().encode(texts).tolist()
+
+def _doc_entities(doc) -> dict:
+    """Group a doc's entities by response key in a single pass"""
+    entities = {key: [] for key in ENTITY_LABELS.values()}
+    for ent in doc.ents:
+        key = ENTITY_LABELS.get(ent.label_)
+        if key:
+            entities[key].append(ent.text)
+    return entities
+
+def _extract_entities(text: str) -> dict:
+    return _doc_entities(get_nlp()(text))
+
+def _extract_entities_batch(texts: list, n_process: int = 1) -> list:
+    docs = get_nlp().pipe(texts, batch_size=NER_BATCH_SIZE, n_process=n_process)
+    return [_doc_entities(doc) for doc in docs]
+
+def extract_entities_batch_texts(texts: list) -> list:
+    """Batch NER, fanned out over the worker pool when it is enabled"""
+    with span("spacy.ner", batch_size=len(texts)):
+        pool = get_worker_pool()
+        if pool is None:
+            _mark_inline_run()
+            return _extract_entities_batch(texts, NER_N_PROCESS)
+        chunk = max(1, -(-len(texts) // NLP_WORKERS))
+        futures = [pool.submit(_extract_entities_batch, texts[i:i + chunk]) for i in range(0, len(texts), chunk)]
+        return [entities for future in futures for entities in future.result()]
+
+def encode_texts(texts: list) -> list:
+    """Embed a list of texts, returning plain lists of floats"""
+    encode_batch_size.observe(len(texts))
+    with span("embedding.encode", batch_size=len(texts)) as s, encode_duration.time():
+        embeddings = run_in_worker(_encode, texts)
+        # The backend actually loaded (torch after an ONNX fallback); known
+        # in workers only once warm-up has reported it
+        backend = embed_backend or worker_embed_backend
+        if backend:
+            s.set_attribute("backend", backend)
+        return embeddings
+
+# The intake flow embeds the same title + description for /classify,
+# /assess_urgency, /store_embedding and /find_duplicates; encode it once
+@lru_cache(maxsize=1024)
+def encode_text(text: str) -> list:
+    return encode_texts([text])[0]
+
+@app.on_event("shutdown")
+def stop_worker_pool():
+    if worker_pool is not None:
+        worker_pool.shutdown(wait=False, cancel_futures=True)
+
+# ============ Warm-up ============
+
+warmup_state = {"started": False, "done": False, "error": None}
+
+# Embedding backend reported by a warmed-up worker (the parent has no ONNX session)
+worker_embed_backend = None
+
+def loaded_models() -> dict:
+    """Which models are resident in this process (or its workers)"""
+    return {
+        "spacy": nlp_model is not None,
+        "embedding": embed_model is not None or worker_embed_backend is not None,
+        "embedding_backend": embed_backend or worker_embed_backend,
+        "llm": llm.provider if llm else None,
+        "workers": NLP_WORKERS if worker_pool is not None else 0,
+    }
+
+def _warm_up_worker() -> str:
+    _extract_entities("warm up")
+    _encode(["warm up"])
+    return embed_backend
+
+def warm_up_models():
+    """Load spaCy and MiniLM (and run one encode) so the first request is fast"""
+    global worker_embed_backend
+    warmup_state["started"] = True
+    try:
+        if get_worker_pool() is not None:
+            # Models only run in the workers, never in the parent before it forks
+            worker_embed_backend = run_in_worker(_warm_up_worker)
+        else:
+            _mark_inline_run()
+            get_nlp()("warm up")
+            get_embedding_model().encode("warm up")
+        if llm:
+            llm.warm_up()
+        logging.info("Model warm-up complete")
+        train_local_classifier()
+        seed_image_cache()
+    except Exception as e:
+        warmup_state["error"] = str(e)
+        logging.error(f"Model warm-up failed: {e}")
+    finally:
+        warmup_state["done"] = True
+
+@app.on_event("startup")
+def start_warm_up():
+    # The worker pool forks here, before uvicorn accepts connections (this
+    # delays binding the port while the models load)
+    if NLP_WORKERS > 0:
+        start_worker_pool()
+    # Runs in a daemon thread so uvicorn binds the port immediately
+    if NLP_WARMUP:
+        threading.Thread(target=warm_up_models, name="nlp-warmup", daemon=True).start()
+    if LOCAL_CLASSIFIER_RETRAIN_SECONDS > 0:
+        threading.Thread(target=retrain_local_classifier_periodically, name="local-classifier-retrain",
+                         daemon=True).start()
+
 from pydantic import BaseModel
+from typing import List, Optional
+
+# ============ Local Classifier Tier ============
+
+local_tier = LocalTier(threshold=LOCAL_CLASSIFIER_THRESHOLD)
+
+def train_local_classifier():
+    try:
+        return local_tier.train()
+    except Exception as e:
+        logging.error(f"Local classifier training failed: {e}")
+        return {"error": str(e)}
+
+def retrain_local_classifier_periodically(stop: Optional[threading.Event] = None):
+    """Retrain every LOCAL_CLASSIFIER_RETRAIN_SECONDS so new LLM labels are picked up"""
+    stop = stop or threading.Event()
+    while not stop.wait(LOCAL_CLASSIFIER_RETRAIN_SECONDS):
+        train_local_classifier()
+
+def record_llm_label(field: str, embedding, label: str):
+    """
+    Keep an LLM answer as training data for the local tier and score the
+    local guess against it. Only LLM labels are stored: training on the
+    local tier's own or the keyword fallback's labels would reinforce them.
+    """
+    if embedding is None:
+        return
+    local_tier.record_agreement(field, embedding, label)
+    if label not in (CATEGORIES if field == "category" else URGENCIES):
+        return
+    try:
+        store_classifier_label(field, label, embedding)
+    except Exception as e:
+        logging.error(f"Storing {field} label failed: {e}")
+
+def local_prediction(field: str, text: str):
+    """(label, confidence, embedding) from the local tier, label None if not confident"""
+    try:
+        embedding = encode_text(text)
+    except Exception as e:
+        logging.error(f"Local tier encode failed: {e}")
+        return None, None, None
+    prediction = local_tier.predict(field, embedding)
+    if prediction is None:
+        return None, None, embedding
+    return prediction[0], prediction[1], embedding
+
+def should_audit() -> bool:
+    return llm is not None and random.random() < LOCAL_CLASSIFIER_AUDIT_RATE
+
+@app.post("/local_classifier/train")
+def train_local_classifier_endpoint():
+    """Retrain the local category/urgency classifiers from the stored LLM labels"""
+    return {"trained": train_local_classifier(), **local_tier.summary()}
+
+@app.get("/local_classifier/stats")
+def local_classifier_stats():
+    """Local hit rate and agreement with the LLM"""
+    return local_tier.summary()
 
 class TextRequest(BaseModel):
     text: str
 
 @app.post("/extract_entities")
 def extract_entities(request: TextRequest):
-    doc = get_nlp()(request.text)
-    entities = {
-        "organisations": [ent.text for ent in doc.ents if ent.label_ == "ORG"],
-        "locations": [ent.text for ent in doc.ents if ent.label_ == "GPE"],
-        "persons": [ent.text for ent in doc.ents if ent.label_ == "PERSON"]
-    }
-    return entities
+    with span("spacy.ner", batch_size=1, text_chars=len(request.text)):
+        return run_in_worker(_extract_entities, request.text)
+
+class BatchTextRequest(BaseModel):
+    texts: List[str]
+
+@app.post("/extract_entities_batch")
+def extract_entities_batch(request: BatchTextRequest):
+    """Entity extraction for many texts at once (bulk loads, intake bursts)"""
+    if not request.texts:
+        return {"entities": []}
+    return {"entities": extract_entities_batch_texts(request.texts)}
 
 class ClassifyRequest(BaseModel):
     text: str
 
+def llm_classify(text: str):
+    prompt = f"""Classify the following public report into one of these categories: infrastructure, safety, utility, health, general.
+    Also provide a confidence score between 0.0 and 1.0.
+    Return JSON with keys 'category' and 'confidence'.
+    
+    Report: {text}"""
+    
+    response = llm_generate("classify", prompt)
+    # Simple parsing - in production I will use structured output or robust JSON parsing
+    import re
+    match = re.search(r'\{.*\}', response, re.DOTALL)
+    if match:
+        return json.loads(match.group(0))
+    return None
+
 @app.post("/classify")
 def classify(request: ClassifyRequest):
     text = request.text
-    if GEMINI_API_KEY:
+
+    # Fast tier: nearest-centroid over the MiniLM embedding
+    category, confidence, embedding = local_prediction("category", text)
+    if category:
+        if should_audit():
+            try:
+                data = llm_classify(text)
+                if data:
+                    record_llm_label("category", embedding, data.get("category"))
+            except Exception:
+                pass
+        classification_tier.labels("category", "local").inc()
+        return {"category": category, "confidence": confidence}
+
+    if llm:
         try:
-            prompt = f"""Classify the following public report into one of these categories: infrastructure, safety, utility, health, general.
-            Also provide a confidence score between 0.0 and 1.0.
-            Return JSON with keys 'category' and 'confidence'.
-            
-            Report: {text}"""
-            
-            response = gemini_client.models.generate_content(
-                model=GEMINI_MODEL_NAME,
-                contents=prompt
-            )
-            # Simple parsing - in production I will use structured output or robust JSON parsing
-            import re
-            match = re.search(r'\{.*\}', response.text, re.DOTALL)
-            if match:
-                data = json.loads(match.group(0))
+            data = llm_classify(text)
+            if data:
+                record_llm_label("category", embedding, data.get("category"))
+                classification_tier.labels("category", "llm").inc()
                 return data
         except Exception as e:
             # print(f"Gemini classification failed: {e}")
             pass
 
     # Fallback to keyword-based classification
+    classification_tier.labels("category", "keyword").inc()
+    fallbacks.labels("classify").inc()
     text_lower = text.lower()
     if any(word in text_lower for word in ["road", "street", "pothole", "traffic", "infrastructure"]):
         category = "infrastructure"
@@ -129,27 +528,44 @@ def classify(request: ClassifyRequest):
 class UrgencyRequest(BaseModel):
     text: str
 
+def llm_urgency(text: str):
+    prompt = f"""Assess the urgency of this public report as 'low', 'medium', or 'high'.
+    Return only the urgency level string.
+    
+    Report: {text}"""
+    urgency = llm_generate("assess_urgency", prompt).strip().lower()
+    return urgency if urgency in ["low", "medium", "high"] else None
+
 @app.post("/assess_urgency")
 def assess_urgency(request: UrgencyRequest):
     text = request.text
-    if GEMINI_API_KEY:
+
+    urgency, _, embedding = local_prediction("urgency", text)
+    if urgency:
+        if should_audit():
+            try:
+                audited = llm_urgency(text)
+                if audited:
+                    record_llm_label("urgency", embedding, audited)
+            except Exception:
+                pass
+        classification_tier.labels("urgency", "local").inc()
+        return urgency
+
+    if llm:
         try:
-            prompt = f"""Assess the urgency of this public report as 'low', 'medium', or 'high'.
-            Return only the urgency level string.
-            
-            Report: {text}"""
-            response = gemini_client.models.generate_content(
-                model=GEMINI_MODEL_NAME,
-                contents=prompt
-            )
-            urgency = response.text.strip().lower()
-            if urgency in ["low", "medium", "high"]:
+            urgency = llm_urgency(text)
+            if urgency:
+                record_llm_label("urgency", embedding, urgency)
+                classification_tier.labels("urgency", "llm").inc()
                 return urgency
         except Exception as e:
             # print(f"Gemini urgency assessment failed: {e}")
             pass
 
     # Simple keyword-based urgency
+    classification_tier.labels("urgency", "keyword").inc()
+    fallbacks.labels("assess_urgency").inc()
     urgent_keywords = ["emergency", "urgent", "critical", "danger"]
     if any(word in text.lower() for word in urgent_keywords):
         return "high"
@@ -163,7 +579,7 @@ class EmbeddingRequest(BaseModel):
 
 @app.post("/generate_embedding")
 def generate_embedding(request: EmbeddingRequest):
-    embedding = get_embedding_model().encode(request.text).tolist()
+    embedding = encode_text(request.text)
     return {"embedding": embedding}
 
 class StoreEmbeddingRequest(BaseModel):
@@ -176,7 +592,7 @@ def store_embedding(request: StoreEmbeddingRequest):
     """Store report embedding in PostgreSQL"""
     try:
         text = request.title + " " + request.description
-        embedding = get_embedding_model().encode(text).tolist()
+        embedding = encode_text(text)
         
         # Store in PostgreSQL using pgvector
         success = store_report_embedding(request.report_id, embedding)
@@ -194,6 +610,9 @@ class FindDuplicatesRequest(BaseModel):
     title: str
     description: str
     threshold: float = 0.8
+    category: Optional[str] = None  # only compare within this category
+    window_days: Optional[int] = None  # only compare recent reports
+    image_hash: Optional[str] = None  # from /analyze_image; near-identical photos may also count
 
 @app.post("/find_duplicates")
 def find_duplicates_endpoint(request: FindDuplicatesRequest):
@@ -202,7 +621,7 @@ def find_duplicates_endpoint(request: FindDuplicatesRequest):
     
     try:
         text = request.title + " " + request.description
-        embedding = get_embedding_model().encode(text).tolist()
+        embedding = encode_text(text)
         
         # Use PostgreSQL/pgvector for duplicate detection
         duplicates = find_duplicate_reports(
@@ -210,7 +629,9 @@ def find_duplicates_endpoint(request: FindDuplicatesRequest):
             description=request.description,
             embedding=embedding,
             threshold=request.threshold,
-            exclude_id=request.report_id
+            exclude_id=request.report_id,
+            category=request.category,
+            window_days=request.window_days
         )
         
         # Format results to match old Weaviate format
@@ -220,16 +641,46 @@ def find_duplicates_endpoint(request: FindDuplicatesRequest):
                 "report_id": dup['id'],
                 "title": dup['title'],
                 "description": dup['description'],
-                "score": dup['similarity_score']
+                "score": dup['similarity_score'],
+                "match_type": dup['match_type']
             })
             logging.info(f"Found duplicate: {dup['id']} with score {dup['similarity_score']:.3f}")
         
+        # Near-identical photos within the same scope are duplicates when the
+        # text or category corroborates them; otherwise only related, so they
+        # don't stop the report being routed
+        related = []
+        if request.image_hash:
+            seen = {d["report_id"] for d in formatted_duplicates}
+            for dup in find_image_duplicates(
+                request.image_hash,
+                exclude_id=request.report_id or None,
+                embedding=embedding,
+                category=request.category,
+                window_days=request.window_days
+            ):
+                if dup['id'] in seen:
+                    continue
+                match = {
+                    "report_id": dup['id'],
+                    "title": dup['title'],
+                    "description": dup['description'],
+                    "score": dup['similarity_score'],
+                    "match_type": "image"
+                }
+                if image_match_corroborated(dup, request.category):
+                    formatted_duplicates.append(match)
+                    logging.info(f"Found image duplicate: {dup['id']} at distance {dup['distance']}")
+                else:
+                    related.append(match)
+                    logging.info(f"Image match {dup['id']} at distance {dup['distance']} not corroborated by text")
+        
         logging.info(f"Found {len(formatted_duplicates)} duplicates")
-        return {"duplicates": formatted_duplicates}
+        return {"duplicates": formatted_duplicates, "related": related}
         
     except Exception as e:
         logging.error(f"Error finding duplicates: {e}")
-        return {"duplicates": [], "error": str(e)}
+        return {"duplicates": [], "related": [], "error": str(e)}
 
 class DraftMessageRequest(BaseModel):
     title: str
@@ -242,63 +693,110 @@ def draft_message(request: DraftMessageRequest):
     prompt = f"Draft a professional notification message to a {request.org_type} organization about this public report. Title: {request.title}. Description: {request.description}. Urgency level: {request.urgency}. Keep it concise and professional."
     
     message = ""
-    if GEMINI_API_KEY:
+    if llm:
         try:
-            response = gemini_client.models.generate_content(
-                model=GEMINI_MODEL_NAME,
-                contents=prompt
-            )
-            message = response.text.strip()
+            message = llm_generate("draft_message", prompt).strip()
         except Exception as e:
             # print(f"Gemini drafting failed: {e}")
             pass
 
     # Fallback if generation fails or no key
     if not message or len(message) < 20:
+        fallbacks.labels("draft_message").inc()
         message = f"Urgent Report: {request.title}\n\n{request.description}\n\nUrgency: {request.urgency}\n\nPlease investigate immediately."
     
     return {"message": message}
 
 class AnalyzeImageRequest(BaseModel):
     image_data: str # base64 encoded
-    mime_type: str = "image/jpeg"
+    mime_type: str = "image/jpeg"  # ignored; the normalised image is WebP/JPEG
+
+# ============ Image Analysis Cache ============
+
+# Analyses keyed by perceptual hash; photos of the same burst pipe or fallen
+# pole within IMAGE_CACHE_MAX_DISTANCE bits reuse one LLM vision call
+IMAGE_CACHE_SIZE = int(os.getenv("IMAGE_CACHE_SIZE", "10000"))
+IMAGE_CACHE_MAX_DISTANCE = int(os.getenv("IMAGE_CACHE_MAX_DISTANCE", "5"))
+image_cache = ImageAnalysisCache(max_entries=IMAGE_CACHE_SIZE, max_distance=IMAGE_CACHE_MAX_DISTANCE)
+
+# Placeholder analyses that must not be reused
+_UNCACHEABLE_ANALYSES = ("Image analysis failed.", "Image analysis not available (No API Key).")
+
+def seed_image_cache():
+    """Load recent analysed images from PostgreSQL so the cache survives restarts"""
+    try:
+        seeded = 0
+        for image_hash, analysis in reversed(get_image_analyses(IMAGE_CACHE_SIZE)):
+            if analysis not in _UNCACHEABLE_ANALYSES:
+                image_cache.put(image_hash, analysis)
+                seeded += 1
+        logging.info(f"Image analysis cache seeded with {seeded} entries")
+    except Exception as e:
+        logging.error(f"Image analysis cache seeding failed: {e}")
+
+@app.get("/image_cache/stats")
+def image_cache_stats():
+    """Entries and hit rate of the perceptual-hash analysis cache"""
+    return image_cache.stats()
 
 @app.post("/analyze_image")
 def analyze_image(request: AnalyzeImageRequest):
+    """
+    Normalise an uploaded image (strip EXIF, downscale, recompress) and
+    analyse it with the LLM (vision). The normalised image is returned as a data
+    URL so callers store it instead of the original upload.
+    """
     if not request.image_data:
         return {"analysis": "No image provided."}
-        
-    if GEMINI_API_KEY:
+
+    try:
+        with span("image.prepare", upload_chars=len(request.image_data)):
+            prepared = prepare_image(decode_data_url(request.image_data))
+    except ImageTooLarge as e:
+        return JSONResponse(status_code=413, content={"analysis": "Image too large.", "error": str(e)})
+    except InvalidImage as e:
+        return JSONResponse(status_code=400, content={"analysis": "Invalid image.", "error": str(e)})
+    logging.info(
+        f"Image normalised: {prepared.original_size} -> {len(prepared.data)} bytes "
+        f"({prepared.width}x{prepared.height} {prepared.mime_type})"
+    )
+
+    result = {
+        "image_data": prepared.to_data_url(),
+        "image_hash": prepared.phash,
+        "cached": False
+    }
+
+    cached = image_cache.get(prepared.phash)
+    if cached is not None:
+        logging.info(f"Image analysis cache hit at distance {cached['distance']}")
+        result.update(analysis=cached["analysis"], cached=True)
+        return result
+
+    if llm:
         try:
-            # Decode base64
-            image_data = request.image_data
-            if "," in image_data:
-                image_data = image_data.split(",")[1]
-            
-            image_bytes = base64.b64decode(image_data)
-            
             prompt = "Analyze this image for a public report. Identify if there is any infrastructure damage, safety issue, or utility problem. If found, state 'Confirmed: [Issue Type], [Severity]'. Then provide a brief description."
             
-            response = gemini_client.models.generate_content(
-                model=GEMINI_MODEL_NAME,
-                contents=[
-                    prompt,
-                    types.Part.from_bytes(data=image_bytes, mime_type=request.mime_type)
-                ]
-            )
-            return {"analysis": response.text.strip()}
+            result["analysis"] = llm_generate("analyze_image", [
+                prompt,
+                ImagePart(data=prepared.data, mime_type=prepared.mime_type)
+            ]).strip()
+            image_cache.put(prepared.phash, result["analysis"])
         except Exception as e:
-            logging.error(f"Gemini image analysis failed: {e}")
-            return {"analysis": "Image analysis failed."}
+            logging.error(f"LLM image analysis failed: {e}")
+            fallbacks.labels("analyze_image").inc()
+            result["analysis"] = "Image analysis failed."
+        return result
             
-    return {"analysis": "Image analysis not available (No API Key)."}
+    result["analysis"] = "Image analysis not available (No API Key)."
+    return result
 
 class InsightsRequest(BaseModel):
     metrics: dict
 
 @app.post("/generate_insights")
 def generate_insights(request: InsightsRequest):
-    if GEMINI_API_KEY:
+    if llm:
         try:
             metrics_str = json.dumps(request.metrics, indent=2)
             prompt = f"""
@@ -311,13 +809,10 @@ def generate_insights(request: InsightsRequest):
             {metrics_str}
             """
             
-            response = gemini_client.models.generate_content(
-                model=GEMINI_MODEL_NAME,
-                contents=prompt
-            )
-            return {"insights": response.text.strip()}
+            return {"insights": llm_generate("generate_insights", prompt).strip()}
         except Exception as e:
-            logging.error(f"Gemini insights generation failed: {e}")
+            logging.error(f"LLM insights generation failed: {e}")
+            fallbacks.labels("generate_insights").inc()
             return {"insights": "Could not generate insights at this time."}
     
     return {"insights": "AI Insights not available (No API Key)."}
@@ -325,7 +820,25 @@ def generate_insights(request: InsightsRequest):
 @app.get("/health")
 def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "service": "nlp_service"}
+    return {"status": "healthy", "service": "nlp_service", "models": loaded_models()}
+
+@app.get("/health/live")
+def liveness_check():
+    """Liveness: the process is up and serving HTTP"""
+    return {"status": "alive", "service": "nlp_service"}
+
+@app.get("/health/ready")
+def readiness_check():
+    """Readiness: spaCy and the embedding model are loaded"""
+    models = loaded_models()
+    ready = models["spacy"] and models["embedding"]
+    body = {
+        "status": "ready" if ready else "loading",
+        "service": "nlp_service",
+        "models": models,
+        "warmup": warmup_state,
+    }
+    return JSONResponse(status_code=200 if ready else 503, content=body)
 
 if __name__ == "__main__":
     import uvicorn
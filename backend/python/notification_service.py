@@ -6,7 +6,10 @@ import smtplib
 from email.mime.text import MIMEText
 import requests
 import os
+import time
 from dotenv import load_dotenv
+from tracing import TraceMiddleware, span
+from metrics import Histogram, instrument_app
 
 # Load environment variables
 load_dotenv()
@@ -17,12 +20,18 @@ logging.basicConfig(filename='notification_service.log', level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
 app = FastAPI()
+app.add_middleware(TraceMiddleware, service_name="notification_service")
+instrument_app(app, "notification_service")
+
+smtp_send_duration = Histogram("smtp_send_duration_seconds", "SMTP connect-to-quit latency", ["result"])
 
 # Configuration from environment
 SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
 SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
 SMTP_USERNAME = os.getenv("SMTP_USERNAME", "")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
+# Local relays and the benchmark SMTP sink don't offer TLS
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() in ("1", "true", "yes")
 
 class EmailRequest(BaseModel):
     to: str
@@ -35,22 +44,27 @@ def send_email(email_req: EmailRequest):
     subject = email_req.subject
     body = email_req.body
     logging.info(f"Received email request to: {to}")
+    start = time.perf_counter()
     try:
         msg = MIMEText(body)
         msg['Subject'] = subject
         msg['From'] = SMTP_USERNAME
         msg['To'] = to
 
-        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-        server.starttls()
-        server.login(SMTP_USERNAME, SMTP_PASSWORD)
-        server.sendmail(SMTP_USERNAME, to, msg.as_string())
-        server.quit()
+        with span("smtp.send", **{"smtp.server": SMTP_SERVER, "smtp.port": SMTP_PORT}):
+            server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
+            if SMTP_STARTTLS:
+                server.starttls()
+            server.login(SMTP_USERNAME, SMTP_PASSWORD)
+            server.sendmail(SMTP_USERNAME, to, msg.as_string())
+            server.quit()
 
+        smtp_send_duration.labels("sent").observe(time.perf_counter() - start)
         logging.info(f"Email sent successfully to {to}")
         return {"status": "sent", "method": "email"}
     except Exception as e:
         # For demo, if SMTP fails, just log
+        smtp_send_duration.labels("failed").observe(time.perf_counter() - start)
         logging.error(f"Email send failed: {e}")
         print(f"Email send failed: {e}")
         print(f"Would send email to {to}: {subject} - {body}")
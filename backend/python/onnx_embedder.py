@@ -0,0 +1,263 @@
+"""
+ONNX Runtime embedding backend for Dira
+Exports all-MiniLM-L6-v2 to ONNX, applies int8 dynamic quantization and
+serves encode() with the same output as SentenceTransformer (mean pooling +
+L2 normalisation), without PyTorch in the request path.
+
+Requires the extras in requirements-onnx.txt. To export ahead of time:
+    python onnx_embedder.py [CACHE_DIR]
+"""
+
+import os
+import sys
+import json
+import logging
+import subprocess
+from typing import List, Optional, Union
+
+import numpy as np
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+MAX_SEQ_LENGTH = 256
+
+# Quantized model is only used if it agrees this closely with the torch output
+MIN_COSINE_AGREEMENT = 0.99
+# ...and makes the same duplicate decisions as torch at the walkers'
+# /find_duplicates threshold
+DUPLICATE_THRESHOLD = 0.85
+
+AGREEMENT_SAMPLES = [
+    "Water main break on Elm Street causing flooding",
+    "Large pothole on Mombasa Road near the junction",
+    "Power outage in Kibera since last night",
+    "Street lights not working along Ngong Road, unsafe at night",
+    "Garbage has not been collected in Eastlands for two weeks",
+    "Burst sewer pipe near the hospital entrance",
+    "Armed robbery reported at the bus stage",
+    "Transformer exploded and the whole estate has no electricity",
+]
+
+# Report pairs on both sides of DUPLICATE_THRESHOLD: reposts and paraphrases
+# of one incident, and different incidents that share words or a place
+DUPLICATE_PAIRS = [
+    ("Water main break on Elm Street causing flooding",
+     "Water main burst on Elm Street, the road is flooded"),
+    ("Power outage in Kibera since last night",
+     "No electricity in Kibera since yesterday night"),
+    ("Large pothole on Mombasa Road near the junction",
+     "Big pothole on Mombasa Road close to the junction"),
+    ("Garbage has not been collected in Eastlands for two weeks",
+     "Rubbish not collected in Eastlands for the last two weeks"),
+    ("Street lights not working along Ngong Road, unsafe at night",
+     "Ngong Road street lights are off and it is unsafe at night"),
+    ("Power outage in Kibera since last night",
+     "Water shortage in Kibera since last night"),
+    ("Large pothole on Mombasa Road near the junction",
+     "Traffic lights broken at the Mombasa Road junction"),
+    ("Burst sewer pipe near the hospital entrance",
+     "Long queues at the hospital entrance"),
+    ("Armed robbery reported at the bus stage",
+     "Bus stage roof collapsed after the rain"),
+    ("Transformer exploded and the whole estate has no electricity",
+     "Garbage has not been collected in Eastlands for two weeks"),
+]
+
+class OnnxEmbedder:
+    """Drop-in replacement for SentenceTransformer.encode() backed by ONNX Runtime"""
+
+    def __init__(self, model_path: str, tokenizer_path: str, num_threads: Optional[int] = None):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.tokenizer = AutoTokenizer.from_pretrained(tokenizer_path)
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32) -> np.ndarray:
+        """Embed one sentence (1-d result) or a list of sentences (2-d result)"""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            tokens = self.tokenizer(
+                batch,
+                padding=True,
+                truncation=True,
+                max_length=MAX_SEQ_LENGTH,
+                return_tensors="np"
+            )
+            feeds = {k: v.astype(np.int64) for k, v in tokens.items() if k in self.input_names}
+            token_embeddings = self.session.run(None, feeds)[0]
+
+            # Mean pooling over non-padding tokens, then L2 normalise
+            mask = tokens["attention_mask"][..., None].astype(np.float32)
+            summed = (token_embeddings * mask).sum(axis=1)
+            pooled = summed / np.clip(mask.sum(axis=1), 1e-9, None)
+            norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+            batches.append(pooled / np.clip(norms, 1e-12, None))
+
+        embeddings = np.vstack(batches) if batches else np.zeros((0, 384), dtype=np.float32)
+        return embeddings[0] if single else embeddings
+
+def cosine_agreement(reference: np.ndarray, candidate: np.ndarray) -> float:
+    """Minimum row-wise cosine similarity between two embedding matrices"""
+    ref = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    cand = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    return float((ref * cand).sum(axis=1).min())
+
+def pair_similarities(model, pairs=DUPLICATE_PAIRS) -> np.ndarray:
+    """Cosine similarity of each (a, b) pair under model"""
+    a = model.encode([p[0] for p in pairs])
+    b = model.encode([p[1] for p in pairs])
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return (a * b).sum(axis=1)
+
+def decision_agreement(reference: np.ndarray, candidate: np.ndarray,
+                       threshold: float = DUPLICATE_THRESHOLD) -> dict:
+    """How the candidate's duplicate decisions compare with the reference's"""
+    ref_dup = reference >= threshold
+    cand_dup = candidate >= threshold
+    return {
+        "threshold": threshold,
+        "pairs_above": int(ref_dup.sum()),
+        "pairs_below": int((~ref_dup).sum()),
+        "mismatches": int((ref_dup != cand_dup).sum()),
+        "max_abs_delta": float(np.abs(reference - candidate).max()),
+    }
+
+def export_quantized_model(torch_model, export_dir: str) -> dict:
+    """
+    Export a loaded SentenceTransformer to ONNX, quantize it to int8 and
+    check it against the torch output.
+
+    Returns:
+        The agreement record written next to the model
+    """
+    import torch
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    os.makedirs(export_dir, exist_ok=True)
+    fp32_path = os.path.join(export_dir, "model.onnx")
+    int8_path = os.path.join(export_dir, "model.int8.onnx")
+
+    transformer = torch_model[0].auto_model
+    tokenizer = torch_model.tokenizer
+    tokenizer.save_pretrained(export_dir)
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    input_names = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    transformer.eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14
+        )
+
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    os.remove(fp32_path)
+
+    quantized = OnnxEmbedder(int8_path, export_dir)
+    reference = torch_model.encode(AGREEMENT_SAMPLES)
+    candidate = quantized.encode(AGREEMENT_SAMPLES)
+    decisions = decision_agreement(pair_similarities(torch_model), pair_similarities(quantized))
+    agreement = {
+        "model": MODEL_NAME,
+        "min_cosine": cosine_agreement(reference, candidate),
+        "threshold": MIN_COSINE_AGREEMENT,
+        "duplicate_decisions": decisions,
+    }
+    agreement["accepted"] = agreement["min_cosine"] >= MIN_COSINE_AGREEMENT and decisions["mismatches"] == 0
+
+    with open(os.path.join(export_dir, "agreement.json"), "w") as f:
+        json.dump(agreement, f, indent=2)
+
+    logging.info(
+        f"Exported int8 ONNX embedder (min cosine vs torch: {agreement['min_cosine']:.4f}, "
+        f"{decisions['mismatches']} duplicate decisions differ at {DUPLICATE_THRESHOLD})"
+    )
+    return agreement
+
+def export_dir_for(cache_dir: str) -> str:
+    return os.path.join(cache_dir, "onnx", MODEL_NAME.split("/")[-1])
+
+def _cached_agreement(export_dir: str) -> Optional[dict]:
+    """The stored agreement record, None if missing or from before the decision check"""
+    int8_path = os.path.join(export_dir, "model.int8.onnx")
+    agreement_path = os.path.join(export_dir, "agreement.json")
+    if not (os.path.exists(int8_path) and os.path.exists(agreement_path)):
+        return None
+    with open(agreement_path) as f:
+        agreement = json.load(f)
+    return agreement if "duplicate_decisions" in agreement else None
+
+def _check_accepted(agreement: dict):
+    if not agreement.get("accepted"):
+        raise RuntimeError(
+            f"Quantized embedder rejected: min cosine {agreement.get('min_cosine')} "
+            f"(need {MIN_COSINE_AGREEMENT}), duplicate decisions {agreement.get('duplicate_decisions')}"
+        )
+
+def prepare_onnx_model(cache_dir: str) -> str:
+    """
+    Make sure an accepted quantized model is in cache_dir without loading
+    torch or opening an ONNX Runtime session in this process (the export
+    runs in a child interpreter), so it is safe to call before forking.
+
+    Returns:
+        The export directory
+
+    Raises:
+        RuntimeError: If the export failed or the quantized model disagrees with torch
+    """
+    export_dir = export_dir_for(cache_dir)
+    agreement = _cached_agreement(export_dir)
+    if agreement is None:
+        subprocess.run([sys.executable, os.path.abspath(__file__), cache_dir], check=True)
+        agreement = _cached_agreement(export_dir)
+        if agreement is None:
+            raise RuntimeError(f"ONNX export produced no agreement record in {export_dir}")
+    _check_accepted(agreement)
+    return export_dir
+
+def load_onnx_embedder(cache_dir: str, load_torch_model, num_threads: Optional[int] = None) -> OnnxEmbedder:
+    """
+    Load the quantized embedder from cache_dir, exporting it first if needed.
+
+    Args:
+        cache_dir: Model cache directory (HUGGINGFACE_CACHE_DIR)
+        load_torch_model: Callable returning the SentenceTransformer, only used
+            for the one-off export and agreement check
+        num_threads: ONNX Runtime intra-op threads (None = one per core)
+
+    Raises:
+        RuntimeError: If the quantized model disagrees with torch
+    """
+    export_dir = export_dir_for(cache_dir)
+    agreement = _cached_agreement(export_dir)
+    if agreement is None:
+        agreement = export_quantized_model(load_torch_model(), export_dir)
+    _check_accepted(agreement)
+    return OnnxEmbedder(os.path.join(export_dir, "model.int8.onnx"), export_dir, num_threads)
+
+if __name__ == "__main__":
+    from sentence_transformers import SentenceTransformer
+
+    logging.basicConfig(level=logging.INFO)
+    cache = sys.argv[1] if len(sys.argv) > 1 else os.getenv("HUGGINGFACE_CACHE_DIR", "./models_cache")
+    result = export_quantized_model(SentenceTransformer(MODEL_NAME, cache_folder=cache), export_dir_for(cache))
+    print(json.dumps(result, indent=2))
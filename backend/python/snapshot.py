@@ -0,0 +1,281 @@
+"""
+Columnar snapshots of Dira data for offline analytics
+Writes reports, report_routes and related_reports as Parquet (or Arrow IPC)
+files partitioned by month:
+
+    <SNAPSHOT_DIR>/reports/month=2025-03/part-0.parquet
+    <SNAPSHOT_DIR>/report_routes/month=2025-03/part-0.parquet
+    <SNAPSHOT_DIR>/_snapshot.json        format and row counts per partition
+
+Analysts scan these with DuckDB, Polars, pandas or pyarrow instead of
+querying the production database or replaying the get_analytics walker.
+Embeddings are fixed_size_list<float32>[384], so a month of vectors reads
+straight into an (n, 384) float32 array. Arrow IPC files are uncompressed
+and can be memory mapped without copying; Parquet files are zstd-compressed
+and several times smaller.
+
+Meant to run on a schedule (e.g. nightly cron). Each run rewrites the last
+SNAPSHOT_REFRESH_MONTHS months, where status changes and new routes land,
+plus any older month that has no partition yet.
+
+Usage:
+    python snapshot.py [--out DIR] [--format parquet|arrow] [--full | --since YYYY-MM]
+"""
+
+import os
+import json
+import time
+import shutil
+import logging
+import argparse
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional, Sequence
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import crud
+
+EMBEDDING_DIM = 384
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR") or os.path.join(os.path.dirname(__file__), "..", "snapshots")
+SNAPSHOT_FORMAT = os.getenv("SNAPSHOT_FORMAT", "parquet")
+SNAPSHOT_REFRESH_MONTHS = int(os.getenv("SNAPSHOT_REFRESH_MONTHS", "2"))
+# Rows per record batch / Parquet row group; bounds the job's memory
+BATCH_ROWS = 5000
+# Partition for rows without a timestamp
+UNKNOWN_MONTH = "unknown"
+MANIFEST = "_snapshot.json"
+FORMATS = ("parquet", "arrow")
+
+# Field order matches crud.SNAPSHOT_TABLES; the second item partitions by month
+SCHEMAS = {
+    "reports": (pa.schema([
+        ("id", pa.string()),
+        ("title", pa.string()),
+        ("description", pa.string()),
+        ("category", pa.string()),
+        ("urgency", pa.string()),
+        ("status", pa.string()),
+        ("confidence", pa.float64()),
+        ("entities", pa.string()),  # JSON text
+        ("submitted_at", pa.timestamp("us")),
+        ("created_at", pa.timestamp("us")),
+        ("reporter_id", pa.string()),
+        ("canonical_report_id", pa.string()),
+        ("analysis_result", pa.string()),
+        ("image_hash", pa.int64()),
+        ("has_image", pa.bool_()),
+        ("embedding", pa.list_(pa.float32(), EMBEDDING_DIM)),
+    ]), "submitted_at"),
+    "report_routes": (pa.schema([
+        ("id", pa.string()),
+        ("report_id", pa.string()),
+        ("organisation_id", pa.string()),
+        ("organisation_name", pa.string()),
+        ("organisation_type", pa.string()),
+        ("message", pa.string()),
+        ("status", pa.string()),
+        ("sent_at", pa.timestamp("us")),
+    ]), "sent_at"),
+    "related_reports": (pa.schema([
+        ("id", pa.string()),
+        ("report_id", pa.string()),
+        ("related_report_id", pa.string()),
+        ("similarity_score", pa.float64()),
+        ("relationship_type", pa.string()),
+        ("created_at", pa.timestamp("us")),
+    ]), "created_at"),
+}
+
+def partition_dir(out_dir: str, table: str, month: str) -> str:
+    return os.path.join(out_dir, table, f"month={month}")
+
+def _to_batch(schema: pa.Schema, rows: Sequence[Sequence[Any]]) -> pa.RecordBatch:
+    columns = list(zip(*rows))
+    return pa.RecordBatch.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+        schema=schema
+    )
+
+class _PartitionWriter:
+    """
+    One month's file, written under a hidden temporary name; close() swaps
+    it in, so readers see either the old or the new partition
+    """
+
+    def __init__(self, out_dir: str, table: str, month: str, schema: pa.Schema, fmt: str):
+        self.directory = partition_dir(out_dir, table, month)
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(self.directory, f"part-0.{fmt}")
+        self._tmp = os.path.join(self.directory, f".part-0.{fmt}.tmp")
+        if fmt == "parquet":
+            self._writer = pq.ParquetWriter(self._tmp, schema, compression="zstd")
+            self._write = lambda batch: self._writer.write_table(pa.Table.from_batches([batch]))
+        else:
+            self._writer = pa.ipc.new_file(self._tmp, schema)
+            self._write = self._writer.write_batch
+        self.rows = 0
+
+    def write(self, batch: pa.RecordBatch):
+        self._write(batch)
+        self.rows += batch.num_rows
+
+    def close(self):
+        self._writer.close()
+        # Drop files of the previous run (possibly in the other format)
+        for name in os.listdir(self.directory):
+            if name != os.path.basename(self._tmp):
+                os.remove(os.path.join(self.directory, name))
+        os.replace(self._tmp, self.path)
+
+    def abort(self):
+        self._writer.close()
+        os.remove(self._tmp)
+        if not os.listdir(self.directory):
+            os.rmdir(self.directory)
+
+def write_partitions(
+    table: str,
+    rows: Iterable[Sequence[Any]],
+    out_dir: str,
+    fmt: str = "parquet",
+    batch_rows: int = BATCH_ROWS
+) -> Dict[str, int]:
+    """
+    Write rows (ordered by the table's month column) to one file per month
+    and return the row count per month. Only one month's writer and one
+    batch of rows are held at a time.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown snapshot format: {fmt}")
+    schema, time_field = SCHEMAS[table]
+    time_index = schema.get_field_index(time_field)
+
+    written: Dict[str, int] = {}
+    writer: Optional[_PartitionWriter] = None
+    month, batch = None, []
+
+    def flush():
+        if batch:
+            writer.write(_to_batch(schema, batch))
+            batch.clear()
+
+    try:
+        for row in rows:
+            value = row[time_index]
+            row_month = value.strftime("%Y-%m") if value is not None else UNKNOWN_MONTH
+            if row_month != month:
+                if writer:
+                    flush()
+                    writer.close()
+                    written[month], writer = writer.rows, None
+                if row_month in written:
+                    raise ValueError(f"{table} rows are not ordered by {time_field} ({row_month} seen twice)")
+                month = row_month
+                writer = _PartitionWriter(out_dir, table, month, schema, fmt)
+            batch.append(row)
+            if len(batch) >= batch_rows:
+                flush()
+        if writer:
+            flush()
+            writer.close()
+            written[month], writer = writer.rows, None
+    finally:
+        if writer:
+            # Failed mid-partition: the previous file stays in place
+            writer.abort()
+    return written
+
+def load_manifest(out_dir: str) -> Dict[str, Any]:
+    path = os.path.join(out_dir, MANIFEST)
+    if not os.path.exists(path):
+        return {"tables": {}}
+    with open(path) as f:
+        return json.load(f)
+
+def _refresh_cutoff(now: datetime, months: int) -> str:
+    """First month ('YYYY-MM') of the refresh window ending with now's month"""
+    index = now.year * 12 + (now.month - 1) - max(months - 1, 0)
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+def run_snapshot(
+    out_dir: str = SNAPSHOT_DIR,
+    fmt: str = SNAPSHOT_FORMAT,
+    since: Optional[str] = None,
+    full: bool = False,
+    refresh_months: int = SNAPSHOT_REFRESH_MONTHS
+) -> Dict[str, Any]:
+    """Refresh the snapshot in out_dir and return what was written"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown snapshot format: {fmt}")
+    started = time.time()
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = load_manifest(out_dir)
+    # Older partitions in another format would be mixed into scans
+    full = full or manifest.get("format", fmt) != fmt
+    cutoff = _refresh_cutoff(datetime.now(), refresh_months)
+
+    summary = {"format": fmt, "out_dir": os.path.abspath(out_dir), "tables": {}}
+    for table in crud.SNAPSHOT_TABLES:
+        existing = manifest["tables"].get(table, {})
+        if full:
+            start = None
+        elif since:
+            start = since
+        else:
+            months = [m for m in crud.get_snapshot_months(table) if m is not None]
+            start = min([m for m in months if m not in existing] + [cutoff])
+
+        rows = crud.iter_snapshot_rows(table, since=f"{start}-01" if start else None)
+        written = write_partitions(table, rows, out_dir, fmt)
+
+        # Partitions in the rewritten range with no rows left (deleted reports)
+        partitions = dict(existing) if start else {}
+        for month in list(partitions):
+            if month != UNKNOWN_MONTH and month >= start:
+                del partitions[month]
+        table_dir = os.path.join(out_dir, table)
+        if os.path.isdir(table_dir):
+            for name in os.listdir(table_dir):
+                month = name[len("month="):]
+                stale = start is None or (month != UNKNOWN_MONTH and month >= start)
+                if name.startswith("month=") and stale and month not in written:
+                    shutil.rmtree(os.path.join(table_dir, name))
+        partitions.update(written)
+        manifest["tables"][table] = dict(sorted(partitions.items()))
+        summary["tables"][table] = {"since": start, "partitions_written": len(written),
+                                    "rows_written": sum(written.values())}
+
+    manifest.update(
+        format=fmt,
+        embedding_dim=EMBEDDING_DIM,
+        generated_at=datetime.now(timezone.utc).isoformat(timespec="seconds")
+    )
+    tmp = os.path.join(out_dir, MANIFEST + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+    os.replace(tmp, os.path.join(out_dir, MANIFEST))
+
+    elapsed = time.time() - started
+    logging.info(f"Snapshot written to {out_dir} in {elapsed:.2f}s: {summary['tables']}")
+    summary["elapsed_seconds"] = round(elapsed, 3)
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a monthly-partitioned columnar snapshot of Dira data")
+    parser.add_argument("--out", default=SNAPSHOT_DIR)
+    parser.add_argument("--format", choices=FORMATS, default=SNAPSHOT_FORMAT)
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--full", action="store_true", help="rewrite every partition")
+    group.add_argument("--since", help="rewrite partitions from this month (YYYY-MM) on")
+    parser.add_argument("--refresh-months", type=int, default=SNAPSHOT_REFRESH_MONTHS)
+    args = parser.parse_args()
+    if args.since:
+        try:
+            datetime.strptime(args.since, "%Y-%m")
+        except ValueError:
+            parser.error("--since must be YYYY-MM")
+
+    result = run_snapshot(args.out, args.format, args.since, args.full, args.refresh_months)
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,389 @@
+"""
+Pipeline tracing for Dira
+Lightweight spans with W3C trace context (the `traceparent` header), so a
+report can be followed from the Jac walkers through nlp_service, db_api and
+notification_service. Finished spans are written as OTLP/JSON lines (one
+ExportTraceServiceRequest per line, the format of the OpenTelemetry
+collector's file exporter) to TRACE_FILE, which every service appends to.
+
+    python tracing.py [TRACE_FILE]    # per-stage latency summary
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import random
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() in ("1", "true", "yes")
+# Shared by all services by default (backend/traces.otlp.jsonl)
+TRACE_FILE = os.getenv("TRACE_FILE") or str(Path(__file__).resolve().parent.parent / "traces.otlp.jsonl")
+# Finished spans are buffered and appended at most this often
+TRACE_FLUSH_SECONDS = float(os.getenv("TRACE_FLUSH_SECONDS", "1.0"))
+TRACE_MAX_BUFFER = 2048
+
+# OTLP SpanKind / StatusCode values
+KIND_INTERNAL, KIND_SERVER, KIND_CLIENT = 1, 2, 3
+STATUS_UNSET, STATUS_OK, STATUS_ERROR = 0, 1, 2
+
+TRACEPARENT = "traceparent"
+
+_service_name = os.getenv("OTEL_SERVICE_NAME", "dira")
+_current: ContextVar[Optional["Span"]] = ContextVar("dira_current_span", default=None)
+
+def configure(service_name: str):
+    """Set the service.name resource attribute for spans from this process"""
+    global _service_name
+    _service_name = os.getenv("OTEL_SERVICE_NAME", service_name)
+
+# ============ Trace Context ============
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str]]:
+    """(trace_id, parent_span_id) from a W3C traceparent header, or None"""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    trace_id, span_id = parts[1].lower(), parts[2].lower()
+    try:
+        int(trace_id, 16), int(span_id, 16)
+    except ValueError:
+        return None
+    if trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return trace_id, span_id
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits) or 1:0{bits // 4}x}"
+
+class Span:
+    """One timed stage; ended spans are handed to the exporter"""
+
+    __slots__ = ("name", "kind", "trace_id", "span_id", "parent_id", "start_ns",
+                 "end_ns", "attributes", "status", "status_message", "service")
+
+    def __init__(self, name: str, kind: int = KIND_INTERNAL, trace_id: Optional[str] = None,
+                 parent_id: Optional[str] = None, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id or _new_id(128)
+        self.span_id = _new_id(64)
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.status = STATUS_UNSET
+        self.status_message = ""
+        self.service = _service_name
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def record_error(self, error: Any):
+        self.status = STATUS_ERROR
+        self.status_message = str(error)[:500]
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            exporter.export(self)
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+def start_span(name: str, kind: int = KIND_INTERNAL, parent: Any = None,
+               attributes: Optional[Dict[str, Any]] = None, root: bool = False) -> Span:
+    """
+    Start (but don't activate) a span. The parent is a Span, a traceparent
+    header, or the current span; root=True always starts a new trace.
+    """
+    trace_id = parent_id = None
+    if not root:
+        if parent is None:
+            parent = _current.get()
+        if isinstance(parent, Span):
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        else:
+            context = parse_traceparent(parent)
+            if context:
+                trace_id, parent_id = context
+    return Span(name, kind, trace_id, parent_id, attributes)
+
+@contextmanager
+def span(name: str, kind: int = KIND_INTERNAL, parent: Any = None, **attributes):
+    """Time the enclosed block as a child of the current span"""
+    s = start_span(name, kind, parent, attributes)
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.record_error(e)
+        raise
+    finally:
+        _current.reset(token)
+        s.end()
+
+def activate(s: Optional[Span]):
+    """Make s the current span; returns a token for deactivate()"""
+    return _current.set(s)
+
+def deactivate(token):
+    try:
+        _current.reset(token)
+    except ValueError:
+        # Token from another context (e.g. a different walker thread)
+        _current.set(None)
+
+def inject(headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Add the current span's traceparent to outgoing request headers"""
+    headers = dict(headers or {})
+    s = _current.get()
+    if s is not None:
+        headers[TRACEPARENT] = s.traceparent()
+    return headers
+
+# ============ OTLP/JSON File Export ============
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items() if v is not None]
+
+def to_otlp(spans: List[Span]) -> Dict[str, Any]:
+    """ExportTraceServiceRequest JSON for a batch of spans, grouped by service"""
+    by_service: Dict[str, List[Dict[str, Any]]] = {}
+    for s in spans:
+        otlp_span = {
+            "traceId": s.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": s.kind,
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns),
+            "attributes": _otlp_attributes(s.attributes),
+            "status": {"code": s.status, "message": s.status_message} if s.status_message else {"code": s.status}
+        }
+        if s.parent_id:
+            otlp_span["parentSpanId"] = s.parent_id
+        by_service.setdefault(s.service, []).append(otlp_span)
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": _otlp_attributes({"service.name": service, "process.pid": os.getpid()})},
+                "scopeSpans": [{"scope": {"name": "dira.tracing"}, "spans": otlp_spans}]
+            }
+            for service, otlp_spans in by_service.items()
+        ]
+    }
+
+class FileExporter:
+    """
+    Buffers finished spans and appends them as one OTLP/JSON line per flush.
+    Each line is written with a single O_APPEND write so services sharing
+    the file don't interleave.
+    """
+
+    def __init__(self, path: str, flush_seconds: float = TRACE_FLUSH_SECONDS, enabled: bool = TRACING_ENABLED):
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self.enabled = enabled
+        self._buffer: List[Span] = []
+        self._lock = threading.Lock()
+        self._flusher = None
+        self.dropped = 0
+
+    def export(self, s: Span):
+        if not self.enabled:
+            return
+        with self._lock:
+            if len(self._buffer) >= TRACE_MAX_BUFFER:
+                self.dropped += 1
+                return
+            self._buffer.append(s)
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._run, name="trace-flusher", daemon=True)
+                self._flusher.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            spans, self._buffer = self._buffer, []
+        if not spans:
+            return
+        line = (json.dumps(to_otlp(spans), separators=(",", ":")) + "\n").encode("utf-8")
+        try:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+        except OSError:
+            self.dropped += len(spans)
+
+exporter = FileExporter(TRACE_FILE)
+atexit.register(exporter.flush)
+
+# ============ Instrumentation ============
+
+class TraceMiddleware:
+    """
+    ASGI middleware: one SERVER span per HTTP request, continuing the
+    caller's trace when a traceparent header is present
+
+        app.add_middleware(TraceMiddleware, service_name="db_api")
+    """
+
+    def __init__(self, app, service_name: Optional[str] = None):
+        self.app = app
+        if service_name:
+            configure(service_name)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not exporter.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        header = None
+        for key, value in scope.get("headers", []):
+            if key == b"traceparent":
+                header = value.decode("latin-1")
+                break
+        method = scope.get("method", "GET")
+        s = start_span(f"{method} {scope.get('path', '')}", KIND_SERVER, parent=header, root=header is None,
+                       attributes={"http.method": method, "http.target": scope.get("path", "")})
+        token = _current.set(s)
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                s.set_attribute("http.status_code", message["status"])
+                if message["status"] >= 500:
+                    s.status = STATUS_ERROR
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        except BaseException as e:
+            s.record_error(e)
+            raise
+        finally:
+            _current.reset(token)
+            # Name by route template (/reports/{report_id}) rather than raw path
+            route = scope.get("route")
+            if route is not None and getattr(route, "path", None):
+                s.name = f"{method} {route.path}"
+                s.set_attribute("http.route", route.path)
+            s.end()
+
+def instrument_requests():
+    """
+    Give every call made with the requests library a CLIENT span and a
+    traceparent header (idempotent). Used by the Jac walkers, whose
+    requests.post/get calls all go through Session.request.
+    """
+    import requests
+    if getattr(requests.Session.request, "_dira_traced", False):
+        return
+    original = requests.Session.request
+
+    def traced_request(session, method, url, *args, **kwargs):
+        parent = _current.get()
+        if parent is None or not exporter.enabled:
+            return original(session, method, url, *args, **kwargs)
+        from urllib.parse import urlsplit
+        parts = urlsplit(str(url))
+        s = start_span(f"{method.upper()} {parts.path}", KIND_CLIENT, parent,
+                       {"http.method": method.upper(), "http.url": f"{parts.scheme}://{parts.netloc}{parts.path}",
+                        "net.peer.name": parts.netloc})
+        headers = dict(kwargs.pop("headers", None) or {})
+        headers[TRACEPARENT] = s.traceparent()
+        token = _current.set(s)
+        try:
+            response = original(session, method, url, *args, headers=headers, **kwargs)
+            s.set_attribute("http.status_code", response.status_code)
+            if response.status_code >= 500:
+                s.status = STATUS_ERROR
+            return response
+        except BaseException as e:
+            s.record_error(e)
+            raise
+        finally:
+            _current.reset(token)
+            s.end()
+
+    traced_request._dira_traced = True
+    requests.Session.request = traced_request
+
+# ============ Stage Summary ============
+
+def read_spans(path: str) -> List[Dict[str, Any]]:
+    """Flatten an OTLP/JSON lines file into span dicts with service and duration_ms"""
+    spans = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            for resource_spans in json.loads(line).get("resourceSpans", []):
+                attrs = {a["key"]: a["value"] for a in resource_spans.get("resource", {}).get("attributes", [])}
+                service = attrs.get("service.name", {}).get("stringValue", "")
+                for scope_spans in resource_spans.get("scopeSpans", []):
+                    for s in scope_spans.get("spans", []):
+                        s = dict(s, service=service)
+                        s["duration_ms"] = (int(s["endTimeUnixNano"]) - int(s["startTimeUnixNano"])) / 1e6
+                        spans.append(s)
+    return spans
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def stage_summary(spans: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Count, p50, p95 and total milliseconds per (service, span name), slowest total first"""
+    stages: Dict[Tuple[str, str], List[float]] = {}
+    for s in spans:
+        stages.setdefault((s["service"], s["name"]), []).append(s["duration_ms"])
+    rows = []
+    for (service, name), durations in stages.items():
+        durations.sort()
+        rows.append({
+            "service": service,
+            "name": name,
+            "count": len(durations),
+            "p50_ms": _percentile(durations, 0.5),
+            "p95_ms": _percentile(durations, 0.95),
+            "total_ms": sum(durations)
+        })
+    rows.sort(key=lambda row: row["total_ms"], reverse=True)
+    return rows
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else TRACE_FILE
+    print(f"{'service':<22} {'stage':<40} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'total ms':>11}")
+    for row in stage_summary(read_spans(path)):
+        print(f"{row['service']:<22} {row['name'][:40]:<40} {row['count']:>6} "
+              f"{row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['total_ms']:>11.1f}")
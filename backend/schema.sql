@@ -18,6 +18,8 @@ CREATE TABLE IF NOT EXISTS facilities (
     name VARCHAR(255) NOT NULL,
     location VARCHAR(255),
     organisation_id UUID REFERENCES organisations(id) ON DELETE CASCADE,
+    latitude DOUBLE PRECISION, -- Geocoded from location via the offline gazetteer
+    longitude DOUBLE PRECISION,
     created_at TIMESTAMP DEFAULT NOW()
 );
 
@@ -44,10 +46,25 @@ CREATE TABLE IF NOT EXISTS reports (
     reporter_id UUID REFERENCES reporters(id),
     image_data TEXT, -- Base64 encoded
     analysis_result TEXT, -- AI analysis
+    image_hash BIGINT, -- Perceptual hash (dHash) of the image
     embedding vector(384), -- Sentence transformer dimension
+    canonical_report_id UUID REFERENCES reports(id) ON DELETE SET NULL, -- Duplicate cluster root (NULL = canonical)
     created_at TIMESTAMP DEFAULT NOW()
 );
 
+-- Columns added after the initial release (CREATE TABLE IF NOT EXISTS won't add them)
+ALTER TABLE reports ADD COLUMN IF NOT EXISTS canonical_report_id UUID REFERENCES reports(id) ON DELETE SET NULL;
+
+ALTER TABLE facilities ADD COLUMN IF NOT EXISTS latitude DOUBLE PRECISION;
+ALTER TABLE facilities ADD COLUMN IF NOT EXISTS longitude DOUBLE PRECISION;
+
+-- 64-bit perceptual hash (dHash) of the report image, stored as signed BIGINT
+ALTER TABLE reports ADD COLUMN IF NOT EXISTS image_hash BIGINT;
+
+-- Full-text search vector for the lexical duplicate prefilter
+ALTER TABLE reports ADD COLUMN IF NOT EXISTS search_tsv tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', coalesce(title, '') || ' ' || coalesce(description, ''))) STORED;
+
 -- Report routing table (which orgs received which reports)
 CREATE TABLE IF NOT EXISTS report_routes (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
@@ -64,17 +81,127 @@ CREATE TABLE IF NOT EXISTS related_reports (
     report_id UUID REFERENCES reports(id) ON DELETE CASCADE,
     related_report_id UUID REFERENCES reports(id) ON DELETE CASCADE,
     similarity_score FLOAT,
-    relationship_type VARCHAR(50) DEFAULT 'duplicate', -- duplicate, similar
+    relationship_type VARCHAR(50) DEFAULT 'duplicate', -- duplicate, image_duplicate (image-hash match), similar
     created_at TIMESTAMP DEFAULT NOW(),
     UNIQUE(report_id, related_report_id)
 );
 
+-- Routing policy for the PostgreSQL intake path (IntakeAgentDB); mirrors
+-- the graph's Policy node, which db_walkers' process cannot reach
+CREATE TABLE IF NOT EXISTS routing_policies (
+    name VARCHAR(100) PRIMARY KEY,
+    rules JSONB NOT NULL DEFAULT '{}',
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Labels the LLM gave a report text (escalated classifications and audits
+-- of local predictions). The local classifier tier trains only on these, so
+-- it never learns from its own or the keyword fallback's guesses.
+CREATE TABLE IF NOT EXISTS classifier_labels (
+    id BIGSERIAL PRIMARY KEY,
+    field VARCHAR(20) NOT NULL, -- category, urgency
+    label VARCHAR(50) NOT NULL,
+    embedding vector(384) NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
 -- Indexes for performance
 CREATE INDEX IF NOT EXISTS idx_reports_status ON reports(status);
 CREATE INDEX IF NOT EXISTS idx_reports_category ON reports(category);
 CREATE INDEX IF NOT EXISTS idx_reports_submitted_at ON reports(submitted_at DESC);
+-- Duplicate search scores only a category's recent reports (plus full-text hits)
+CREATE INDEX IF NOT EXISTS idx_reports_category_submitted ON reports(category, submitted_at DESC);
+-- Feed walkers page through non-duplicate reports newest first
+CREATE INDEX IF NOT EXISTS idx_reports_feed ON reports(submitted_at DESC) WHERE status <> 'duplicate';
+-- One reporter per case-normalised email; reporters are upserted with
+-- INSERT ... ON CONFLICT (lower(email)). Existing databases may hold
+-- duplicates (exact, or differing only by case), so they are merged into the
+-- oldest row, with their reports re-pointed, before any unique index on
+-- reporters is built. Keep this merge ahead of the index statements below.
+-- Name-only submitters used to be stored under a shared placeholder (or
+-- empty) email, one row each; they become NULL emails first so the merge and
+-- the index leave them as separate reporters.
+UPDATE reporters SET email = NULL
+WHERE lower(btrim(email)) IN ('', 'anonymous@example.com');
+WITH ranked AS (
+    SELECT id, FIRST_VALUE(id) OVER (PARTITION BY lower(email) ORDER BY created_at, id) AS keep_id
+    FROM reporters WHERE email IS NOT NULL
+)
+UPDATE reports SET reporter_id = ranked.keep_id
+FROM ranked
+WHERE reports.reporter_id = ranked.id AND ranked.id <> ranked.keep_id;
+WITH ranked AS (
+    SELECT id, FIRST_VALUE(id) OVER (PARTITION BY lower(email) ORDER BY created_at, id) AS keep_id
+    FROM reporters WHERE email IS NOT NULL
+)
+DELETE FROM reporters USING ranked
+WHERE reporters.id = ranked.id AND ranked.id <> ranked.keep_id;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_reporters_email_lower ON reporters(lower(email));
+-- Superseded by idx_reporters_email_lower
+DROP INDEX IF EXISTS idx_reporters_email;
+CREATE INDEX IF NOT EXISTS idx_classifier_labels_field ON classifier_labels(field, created_at DESC);
 CREATE INDEX IF NOT EXISTS idx_report_routes_report_id ON report_routes(report_id);
 CREATE INDEX IF NOT EXISTS idx_report_routes_org_id ON report_routes(organisation_id);
+CREATE INDEX IF NOT EXISTS idx_facilities_org_id ON facilities(organisation_id);
+CREATE INDEX IF NOT EXISTS idx_reports_search_tsv ON reports USING gin(search_tsv);
+-- Multi-index hashing for near-duplicate images: any two hashes within
+-- Hamming distance 3 share at least one of these four 16-bit bands
+CREATE INDEX IF NOT EXISTS idx_reports_image_hash_b0 ON reports (((image_hash >> 48) & 65535)) WHERE image_hash IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_reports_image_hash_b1 ON reports (((image_hash >> 32) & 65535)) WHERE image_hash IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_reports_image_hash_b2 ON reports (((image_hash >> 16) & 65535)) WHERE image_hash IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_reports_image_hash_b3 ON reports ((image_hash & 65535)) WHERE image_hash IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_reports_canonical_id ON reports(canonical_report_id) WHERE canonical_report_id IS NOT NULL;
+
+-- Live report events: db_api LISTENs on report_events and streams these
+-- deltas to dashboards (/events/reports). Payloads stay well under
+-- pg_notify's 8000-byte limit: title and description are truncated.
+CREATE OR REPLACE FUNCTION notify_report_event() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('report_events', json_build_object(
+        'type', CASE WHEN TG_OP = 'INSERT' THEN 'report.created' ELSE 'report.updated' END,
+        'id', NEW.id,
+        'title', left(NEW.title, 200),
+        'description', left(NEW.description, 1000),
+        'status', NEW.status,
+        'previous_status', CASE WHEN TG_OP = 'UPDATE' THEN OLD.status END,
+        'category', NEW.category,
+        'urgency', NEW.urgency,
+        'canonical_report_id', NEW.canonical_report_id,
+        'submitted_at', to_char(NEW.submitted_at, 'YYYY-MM-DD HH24:MI:SS.US')
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS reports_notify_insert ON reports;
+CREATE TRIGGER reports_notify_insert AFTER INSERT ON reports
+    FOR EACH ROW EXECUTE FUNCTION notify_report_event();
+DROP TRIGGER IF EXISTS reports_notify_update ON reports;
+CREATE TRIGGER reports_notify_update AFTER UPDATE OF status, category, urgency ON reports
+    FOR EACH ROW
+    WHEN (OLD.status IS DISTINCT FROM NEW.status
+          OR OLD.category IS DISTINCT FROM NEW.category
+          OR OLD.urgency IS DISTINCT FROM NEW.urgency)
+    EXECUTE FUNCTION notify_report_event();
+
+CREATE OR REPLACE FUNCTION notify_route_event() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('report_events', json_build_object(
+        'type', CASE WHEN TG_OP = 'INSERT' THEN 'route.created' ELSE 'route.updated' END,
+        'id', NEW.id,
+        'report_id', NEW.report_id,
+        'organisation_id', NEW.organisation_id,
+        'organisation_name', (SELECT name FROM organisations WHERE id = NEW.organisation_id),
+        'status', NEW.status,
+        'sent_at', to_char(NEW.sent_at, 'YYYY-MM-DD HH24:MI:SS.US')
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS report_routes_notify ON report_routes;
+CREATE TRIGGER report_routes_notify AFTER INSERT OR UPDATE OF status ON report_routes
+    FOR EACH ROW EXECUTE FUNCTION notify_route_event();
 
 -- Vector similarity search index (HNSW for fast approximate search)
 -- Note: This will be created after we have some data
@@ -7,8 +7,42 @@ import sys
 import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'python'))
 
-from models import Organisation
+from models import Organisation, Facility
 import crud
+import geo
+
+# Where each seeded facility is (resolved to coordinates by the gazetteer)
+FACILITY_LOCATIONS = {
+    "Kabete Water Treatment Works": "Kabete",
+    "Dandora Estate Sewerage Treatment Plant": "Dandora",
+    "Nairobi Region Office": "Nairobi CBD",
+    "Road Maintenance Depot": "Industrial Area",
+    "Embakasi Substation": "Embakasi",
+    "Stima Plaza Control Centre": "Parklands",
+    "Central Police Station": "Nairobi CBD",
+    "Traffic Headquarters": "Nairobi CBD",
+    "Headquarters": "South C",
+    "Waste Compliance Unit": "South C",
+    "City Hall": "Nairobi CBD",
+    "Public Health Department": "Nairobi CBD",
+}
+
+def seed_facilities(org_id: str, facility_names):
+    """Create facility rows for an organisation if it has none yet"""
+    if crud.get_facilities_for_organisation(org_id):
+        return 0
+    gazetteer = geo.get_gazetteer()
+    for name in facility_names:
+        location = FACILITY_LOCATIONS.get(name, name)
+        coords = gazetteer.lookup(location)
+        crud.create_facility(Facility(
+            name=name,
+            location=location,
+            organisation_id=org_id,
+            latitude=coords[0] if coords else None,
+            longitude=coords[1] if coords else None
+        ))
+    return len(facility_names)
 
 def seed_organisations():
     """Seed initial Kenyan organisations"""
@@ -80,7 +114,7 @@ def seed_organisations():
                 break
         
         if not exists:
-            crud.create_organisation(org)
+            existing_id = crud.create_organisation(org)
             print(f"Created: {org.name}")
             created_count += 1
         else:
@@ -88,6 +122,10 @@ def seed_organisations():
             crud.update_organisation(existing_id, contact_email=org.contact_email)
             print(f"Updated email for: {org.name}")
             updated_count += 1
+        
+        facility_count = seed_facilities(existing_id, org.facilities)
+        if facility_count:
+            print(f"   Added {facility_count} facilities")
             
     print(f"\n Seeding complete! Created {created_count}, Updated {updated_count} organisations")
 
@@ -0,0 +1,82 @@
+"""
+Shared helpers for Dira benchmarks: latency percentiles, machine-readable
+result files and comparison against a stored baseline.
+"""
+
+import os
+import json
+import platform
+import subprocess
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Linear-interpolated percentile of an ascending list (q in 0..1)"""
+    if not sorted_values:
+        return 0.0
+    position = q * (len(sorted_values) - 1)
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+def latency_summary(values_ms: List[float]) -> Dict[str, float]:
+    values = sorted(values_ms)
+    return {
+        "count": len(values),
+        "mean_ms": sum(values) / len(values) if values else 0.0,
+        "p50_ms": percentile(values, 0.50),
+        "p95_ms": percentile(values, 0.95),
+        "p99_ms": percentile(values, 0.99),
+        "max_ms": values[-1] if values else 0.0
+    }
+
+def environment() -> Dict[str, Any]:
+    """Where and on what code the numbers were measured"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(__file__), timeout=5).stdout.strip()
+    except Exception:
+        commit = ""
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count()
+    }
+
+def write_results(path: str, results: Dict[str, Any]):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+def load_baseline(path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def compare_latencies(current: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+                      tolerance: float = 0.10, keys=("p50_ms", "p95_ms", "p99_ms"),
+                      min_delta_ms: float = 5.0) -> List[Dict[str, Any]]:
+    """
+    Regressions of current vs baseline stage summaries: a percentile that
+    grew by more than `tolerance` (fraction) and by at least `min_delta_ms`,
+    so jitter on sub-millisecond stages doesn't fail a run.
+    """
+    regressions = []
+    for stage, summary in current.items():
+        before = baseline.get(stage)
+        if not before:
+            continue
+        for key in keys:
+            old, new = before.get(key, 0.0), summary.get(key, 0.0)
+            if old and new > old * (1 + tolerance) and new - old >= min_delta_ms:
+                regressions.append({"stage": stage, "metric": key, "baseline": old, "current": new,
+                                    "change": (new - old) / old})
+    return regressions
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Synthetic Kenyan report corpus for Dira benchmarks
+Generates reproducible reports (same seed, same corpus) about potholes,
+outages, water, safety and health issues in places from the bundled
+gazetteer. A configurable share are rephrased reposts of earlier reports,
+so duplicate detection sees realistic traffic.
+
+    python benchmarks/corpus.py --size 500 --out corpus.json
+"""
+
+import os
+import csv
+import json
+import random
+import argparse
+from typing import Any, Dict, List, Optional
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(__file__), '..', 'backend', 'data', 'kenya_gazetteer.csv')
+
+ROADS = [
+    "Ngong Road", "Mombasa Road", "Thika Superhighway", "Jogoo Road", "Waiyaki Way",
+    "Moi Avenue", "Kenyatta Avenue", "Langata Road", "Outering Road", "Oginga Odinga Street"
+]
+
+# category -> list of (title, description, urgency); {place} and {road} are filled in.
+# Each issue has a second phrasing used for reposts of the same incident.
+ISSUES = {
+    "infrastructure": [
+        (("Huge pothole on {road} near {place}",
+          "A deep pothole on {road} by {place} has damaged several matatus. Cars swerve into oncoming traffic to avoid it."),
+         ("Dangerous pothole {road}, {place}",
+          "There is a very big pothole on {road} close to {place}; vehicles keep hitting it and swerving."),
+         "high"),
+        (("Collapsed footbridge in {place}",
+          "The footbridge over the river in {place} collapsed after the rains. Pupils now wade across to school."),
+         ("Footbridge down at {place}",
+          "Children in {place} are crossing the river on foot because the footbridge fell during the rains."),
+         "high"),
+        (("Broken street lights along {road}",
+          "Street lights on {road} in {place} have been off for two weeks, the stretch is completely dark at night."),
+         ("No street lighting on {road} {place}",
+          "For about two weeks the lights along {road} near {place} are not working and it is very dark."),
+         "medium"),
+        (("Blocked drainage flooding {place}",
+          "Drains along {road} in {place} are clogged with garbage and the road floods every time it rains."),
+         ("Flooding from blocked drains in {place}",
+          "Every rain {road} in {place} floods because the drainage is blocked by rubbish."),
+         "medium"),
+    ],
+    "utility": [
+        (("Power outage in {place} for two days",
+          "Hakuna stima in {place} since Monday. Kenya Power has not responded and food in shops is spoiling."),
+         ("No electricity {place}",
+          "{place} has been without power for two days now, Kenya Power has not come. Shops are losing stock."),
+         "high"),
+        (("Burst water pipe on {road}",
+          "A water main burst on {road} near {place} and clean water has been flowing onto the road since morning."),
+         ("Water pipe leaking heavily at {place}",
+          "Since morning a burst pipe on {road} by {place} is wasting a lot of water onto the road."),
+         "high"),
+        (("No water supply in {place}",
+          "Taps in {place} have been dry for a week. Residents are buying maji from vendors at high prices."),
+         ("Water shortage {place}",
+          "Residents of {place} have had no water in the taps for one week and are buying from vendors."),
+         "medium"),
+        (("Sewage overflowing in {place}",
+          "A sewer line near {road} in {place} is overflowing into homes and the market. The smell is unbearable."),
+         ("Sewer burst near {road}",
+          "Raw sewage from a burst sewer is flowing into houses and the market in {place}."),
+         "high"),
+    ],
+    "safety": [
+        (("Rising muggings near {place} stage",
+          "Several people have been robbed at night near the {place} matatu stage. There are no police patrols."),
+         ("Insecurity at {place} bus stage",
+          "People are being mugged at night around the stage in {place} and police never patrol."),
+         "high"),
+        (("Exposed live wires in {place}",
+          "Live electricity wires are hanging low near the primary school in {place}. Children play right under them."),
+         ("Dangerous hanging power cables {place}",
+          "Low hanging live cables next to the school in {place} are a danger to children."),
+         "high"),
+        (("Illegal dumping site in {place}",
+          "Garbage is being dumped and burned on the open field in {place}. The smoke is affecting residents."),
+         ("Burning garbage dump in {place}",
+          "People dump and burn rubbish on the field in {place} every evening and the smoke is choking everyone."),
+         "medium"),
+    ],
+    "health": [
+        (("Cholera cases reported in {place}",
+          "Several families in {place} have cholera symptoms after drinking water from a contaminated borehole."),
+         ("Suspected cholera outbreak {place}",
+          "Many people in {place} are sick with diarrhoea and vomiting, possibly from the borehole water."),
+         "high"),
+        (("Health centre in {place} out of drugs",
+          "The dispensary in {place} has had no basic medicine for three weeks. Patients are sent away."),
+         ("No medicine at {place} dispensary",
+          "For three weeks the {place} health centre has no drugs and turns patients away."),
+         "medium"),
+    ],
+    "general": [
+        (("Noise from club in {place}",
+          "A club on {road} in {place} plays loud music past 2am every night. Residents cannot sleep."),
+         ("Loud music at night {place}",
+          "Every night a bar near {road} in {place} plays very loud music until morning."),
+         "low"),
+        (("Abandoned vehicle on {road}",
+          "A broken down lorry has been left on {road} near {place} for a month and is narrowing the road."),
+         ("Lorry abandoned near {place}",
+          "An old lorry has been parked on {road} by {place} for weeks and blocks part of the road."),
+         "low"),
+    ],
+}
+
+# Rough share of real traffic per category
+CATEGORY_WEIGHTS = {"infrastructure": 0.3, "utility": 0.3, "safety": 0.2, "health": 0.1, "general": 0.1}
+
+FIRST_NAMES = ["Wanjiku", "Otieno", "Achieng", "Kamau", "Mwangi", "Njeri", "Kiprop", "Chebet", "Omondi", "Atieno",
+               "Mutua", "Wambui", "Hassan", "Amina", "Kiptoo", "Nyambura"]
+
+def load_places(path: str = GAZETTEER_PATH) -> List[str]:
+    with open(path, newline='') as f:
+        return [row["name"] for row in csv.DictReader(f)]
+
+def generate_corpus(size: int, duplicate_rate: float = 0.15, reporters: int = 200,
+                    anonymous_rate: float = 0.2, seed: int = 42,
+                    places: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Reports with their expected labels:
+    {title, description, name, email, category, urgency, duplicate_of}
+    duplicate_of is the index of the report a repost rephrases, else None.
+    """
+    rng = random.Random(seed)
+    places = places or load_places()
+    categories = list(CATEGORY_WEIGHTS)
+    weights = [CATEGORY_WEIGHTS[c] for c in categories]
+    reporter_pool = [(rng.choice(FIRST_NAMES), f"reporter{i}@example.co.ke") for i in range(reporters)]
+
+    corpus = []
+    originals = []  # (index, category, issue, place, road)
+    for i in range(size):
+        name, email = rng.choice(reporter_pool)
+        if rng.random() < anonymous_rate:
+            name = ""
+        if originals and rng.random() < duplicate_rate:
+            source, category, issue, place, road = rng.choice(originals)
+            (title, description) = issue[1]
+            duplicate_of = source
+        else:
+            category = rng.choices(categories, weights)[0]
+            issue = rng.choice(ISSUES[category])
+            place, road = rng.choice(places), rng.choice(ROADS)
+            (title, description) = issue[0]
+            duplicate_of = None
+            originals.append((i, category, issue, place, road))
+        corpus.append({
+            "title": title.format(place=place, road=road),
+            "description": description.format(place=place, road=road),
+            "name": name,
+            "email": email,
+            "category": category,
+            "urgency": issue[2],
+            "duplicate_of": duplicate_of
+        })
+    return corpus
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic Kenyan report corpus")
+    parser.add_argument("--size", type=int, default=200)
+    parser.add_argument("--duplicate-rate", type=float, default=0.15)
+    parser.add_argument("--reporters", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="-")
+    args = parser.parse_args()
+
+    corpus = generate_corpus(args.size, args.duplicate_rate, args.reporters, seed=args.seed)
+    text = json.dumps(corpus, indent=2)
+    if args.out == "-":
+        print(text)
+    else:
+        with open(args.out, "w") as f:
+            f.write(text)
+        print(f"Wrote {len(corpus)} reports to {args.out}")
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Duplicate-search micro-benchmark
+Loads synthetic 384-d report embeddings (clustered like real reports, with
+near-duplicate queries) into a scratch copy of the reports table and times
+crud.find_duplicate_reports and crud.search_reports_by_similarity with no
+vector index, HNSW at several ef_search values and IVFFlat at several probes.
+Recall is measured against exact cosine search in numpy. Results go to a
+JSON file, one record per (rows, index, parameter, function, threshold).
+
+The table lives in its own schema (default dira_bench) and the connection's
+search_path points crud at it, so application data is never touched.
+
+    export DATABASE_URL=postgresql://localhost/dira
+    python benchmarks/duplicate_search_benchmark.py --sizes 10000,100000,1000000
+"""
+
+import io
+import os
+import sys
+import time
+import uuid
+import random
+import struct
+import argparse
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'backend', 'python'))
+
+from common import environment, latency_summary, write_results
+from corpus import generate_corpus
+
+DIM = 384
+# Per-coordinate noise around a cluster centre: two reports about the same
+# kind of issue score ~0.75 cosine, below the 0.85 duplicate threshold
+CLUSTER_NOISE = 0.029
+# Noise added to a stored vector to make a near-duplicate query (~0.92 cosine)
+DUPLICATE_NOISE = 0.022
+
+def normalise(matrix: np.ndarray) -> np.ndarray:
+    return matrix / np.linalg.norm(matrix, axis=-1, keepdims=True)
+
+class SyntheticEmbeddings:
+    """Deterministic clustered unit vectors, generated in chunks"""
+
+    def __init__(self, clusters: int, seed: int):
+        self.rng = np.random.default_rng(seed)
+        self.centres = normalise(self.rng.standard_normal((clusters, DIM)).astype(np.float32))
+
+    def sample(self, count: int) -> np.ndarray:
+        which = self.rng.integers(0, len(self.centres), count)
+        noise = self.rng.standard_normal((count, DIM)).astype(np.float32) * CLUSTER_NOISE
+        return normalise(self.centres[which] + noise).astype(np.float32)
+
+    def near(self, vectors: np.ndarray) -> np.ndarray:
+        noise = self.rng.standard_normal(vectors.shape).astype(np.float32) * DUPLICATE_NOISE
+        return normalise(vectors + noise).astype(np.float32)
+
+# ============ Loading ============
+
+def _binary_copy(rows) -> bytes:
+    """PostgreSQL binary COPY payload for (id uuid, title, description, category, embedding vector)"""
+    parts = [b"PGCOPY\n\xff\r\n\x00", struct.pack(">ii", 0, 0)]
+    vector_header = struct.pack(">hh", DIM, 0)
+    for report_id, title, description, category, vector in rows:
+        parts.append(struct.pack(">h", 5))
+        for field in (report_id.bytes, title.encode(), description.encode(), category.encode()):
+            parts.append(struct.pack(">i", len(field)))
+            parts.append(field)
+        # pgvector binary format: int16 dim, int16 unused, float4[dim] big-endian
+        data = vector_header + vector.astype(">f4").tobytes()
+        parts.append(struct.pack(">i", len(data)))
+        parts.append(data)
+    parts.append(struct.pack(">h", -1))
+    return b"".join(parts)
+
+def create_table(cur, schema: str):
+    cur.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+    cur.execute(f"DROP TABLE IF EXISTS {schema}.reports")
+    cur.execute(f"CREATE TABLE {schema}.reports (LIKE public.reports INCLUDING ALL)")
+    drop_vector_indexes(cur, schema)
+
+def drop_vector_indexes(cur, schema: str):
+    cur.execute("""
+        SELECT indexname FROM pg_indexes
+        WHERE schemaname = %s AND tablename = 'reports'
+        AND (indexdef ILIKE '%%hnsw%%' OR indexdef ILIKE '%%ivfflat%%')
+    """, (schema,))
+    for row in cur.fetchall():
+        cur.execute(f"DROP INDEX {schema}.{row['indexname']}")
+
+def load_rows(cur, schema, ids, vectors, texts, start, stop, chunk=20000):
+    for offset in range(start, stop, chunk):
+        end = min(stop, offset + chunk)
+        rows = []
+        for i in range(offset, end):
+            text = texts[i % len(texts)]
+            # Unique text per row so crud's exact title+description match
+            # never short-circuits the vector search being measured
+            rows.append((ids[i], text["title"], f"{text['description']} Ref {i}.", text["category"], vectors[i]))
+        cur.copy_expert(
+            f"COPY {schema}.reports (id, title, description, category, embedding) FROM STDIN WITH (FORMAT binary)",
+            io.BytesIO(_binary_copy(rows))
+        )
+
+def build_index(cur, schema, kind, rows, args):
+    """Create the vector index; returns (seconds, size in MB)"""
+    start = time.perf_counter()
+    if kind == "hnsw":
+        cur.execute(f"""
+            CREATE INDEX bench_embedding_hnsw ON {schema}.reports USING hnsw (embedding vector_cosine_ops)
+            WITH (m = {args.hnsw_m}, ef_construction = {args.hnsw_ef_construction})
+        """)
+        name = "bench_embedding_hnsw"
+    else:
+        lists = args.ivf_lists or max(10, rows // 1000)
+        cur.execute(f"""
+            CREATE INDEX bench_embedding_ivfflat ON {schema}.reports USING ivfflat (embedding vector_cosine_ops)
+            WITH (lists = {lists})
+        """)
+        name = "bench_embedding_ivfflat"
+    seconds = time.perf_counter() - start
+    cur.execute("SELECT pg_relation_size(%s::regclass) AS size", (f"{schema}.{name}",))
+    return seconds, cur.fetchone()["size"] / (1024 * 1024)
+
+# ============ Measuring ============
+
+def exact_neighbours(vectors: np.ndarray, rows: int, query: np.ndarray):
+    """Cosine similarity of query to the first `rows` stored vectors (all unit length)"""
+    return vectors[:rows] @ query
+
+def make_queries(embeddings, vectors, texts, rows, count, rng):
+    """Half near-duplicates of stored reports, half new reports from the same clusters"""
+    queries = []
+    sources = rng.sample(range(rows), count // 2)
+    near = embeddings.near(vectors[sources])
+    for source, vector in zip(sources, near):
+        text = texts[source % len(texts)]
+        queries.append({"vector": vector, "title": text["title"], "description": text["description"]})
+    fresh = embeddings.sample(count - len(queries))
+    for vector in fresh:
+        text = rng.choice(texts)
+        queries.append({"vector": vector, "title": text["title"], "description": text["description"]})
+    return queries
+
+def measure(crud, queries, truths, ids, function, threshold, k):
+    latencies, recalls = [], []
+    with_duplicates = detected = 0
+    for query, sims in zip(queries, truths):
+        embedding = query["vector"].tolist()
+        start = time.perf_counter()
+        if function == "find_duplicate_reports":
+            found = crud.find_duplicate_reports(query["title"], query["description"], embedding,
+                                                threshold=threshold, limit=k)
+        else:
+            found = crud.search_reports_by_similarity(embedding, limit=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found_ids = {str(row["id"]) for row in found}
+
+        if function == "find_duplicate_reports":
+            truth = {str(ids[i]) for i in np.nonzero(sims >= threshold)[0]}
+            if truth:
+                with_duplicates += 1
+                detected += bool(found_ids & truth)
+                recalls.append(len(found_ids & truth) / min(len(truth), k))
+        else:
+            top = np.argpartition(-sims, k)[:k]
+            truth = {str(ids[i]) for i in top}
+            recalls.append(len(found_ids & truth) / k)
+
+    result = {"latency": latency_summary(latencies),
+              "recall_at_k": sum(recalls) / len(recalls) if recalls else None}
+    if function == "find_duplicate_reports":
+        result["queries_with_duplicates"] = with_duplicates
+        result["detection_rate"] = detected / with_duplicates if with_duplicates else None
+    return result
+
+def parse_list(text, cast=int):
+    return [cast(v) for v in text.split(",") if v.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark duplicate search with and without vector indexes")
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--thresholds", default="0.8,0.85,0.9")
+    parser.add_argument("--indexes", default="none,hnsw,ivfflat")
+    parser.add_argument("--hnsw-m", type=int, default=16)
+    parser.add_argument("--hnsw-ef-construction", type=int, default=64)
+    parser.add_argument("--ef-search", default="40,100,200,400",
+                        help="find_duplicate_reports takes up to 200 vector candidates; smaller ef_search caps them")
+    parser.add_argument("--ivf-lists", type=int, default=0, help="0 = rows / 1000")
+    parser.add_argument("--probes", default="1,5,10,20")
+    parser.add_argument("--clusters", type=int, default=2000)
+    parser.add_argument("--maintenance-work-mem", default="1GB")
+    parser.add_argument("--schema", default="dira_bench")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="leave the benchmark table in place")
+    parser.add_argument("--out", default=os.path.join(BENCH_DIR, "results", "duplicate_search.json"))
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        parser.error("DATABASE_URL must point at a PostgreSQL database with pgvector and the Dira schema")
+    if not args.schema.isidentifier():
+        parser.error("--schema must be a plain identifier")
+
+    # crud's unqualified `reports` resolves to the benchmark schema. One
+    # pooled connection, so SET hnsw.ef_search / ivfflat.probes apply to
+    # every query.
+    os.environ["PGOPTIONS"] = f"-c search_path={args.schema},public"
+    from db import Database, get_db_cursor
+    import crud
+    Database.initialize(min_conn=1, max_conn=1)
+
+    sizes = sorted(parse_list(args.sizes))
+    thresholds = parse_list(args.thresholds, float)
+    kinds = parse_list(args.indexes, str)
+    rng = random.Random(args.seed)
+    embeddings = SyntheticEmbeddings(args.clusters, args.seed)
+    texts = generate_corpus(5000, duplicate_rate=0.0, seed=args.seed)
+
+    print(f"Generating {sizes[-1]} embeddings...")
+    vectors = np.concatenate([embeddings.sample(min(100000, sizes[-1] - i)) for i in range(0, sizes[-1], 100000)])
+    ids = [uuid.UUID(int=rng.getrandbits(128), version=4) for _ in range(sizes[-1])]
+
+    records = []
+    with get_db_cursor() as cur:
+        create_table(cur, args.schema)
+        cur.execute(f"SET maintenance_work_mem = '{args.maintenance_work_mem}'")
+
+    loaded = 0
+    try:
+        for rows in sizes:
+            print(f"\n=== {rows} rows ===")
+            start = time.perf_counter()
+            with get_db_cursor() as cur:
+                load_rows(cur, args.schema, ids, vectors, texts, loaded, rows)
+            with get_db_cursor() as cur:
+                cur.execute(f"ANALYZE {args.schema}.reports")
+            print(f"Loaded {rows - loaded} rows in {time.perf_counter() - start:.1f}s")
+            loaded = rows
+
+            queries = make_queries(embeddings, vectors, texts, rows, args.queries, rng)
+            truths = [exact_neighbours(vectors, rows, q["vector"]) for q in queries]
+
+            for kind in kinds:
+                with get_db_cursor() as cur:
+                    drop_vector_indexes(cur, args.schema)
+                build_seconds = index_mb = None
+                if kind != "none":
+                    with get_db_cursor() as cur:
+                        build_seconds, index_mb = build_index(cur, args.schema, kind, rows, args)
+                    print(f"Built {kind} in {build_seconds:.1f}s ({index_mb:.0f} MB)")
+
+                settings = {"none": [None], "hnsw": parse_list(args.ef_search), "ivfflat": parse_list(args.probes)}[kind]
+                for setting in settings:
+                    with get_db_cursor() as cur:
+                        if kind == "hnsw":
+                            cur.execute(f"SET hnsw.ef_search = {int(setting)}")
+                        elif kind == "ivfflat":
+                            cur.execute(f"SET ivfflat.probes = {int(setting)}")
+                    runs = [("search_reports_by_similarity", None)] + [("find_duplicate_reports", t) for t in thresholds]
+                    for function, threshold in runs:
+                        result = measure(crud, queries, truths, ids, function, threshold, args.k)
+                        record = {
+                            "rows": rows,
+                            "index": kind,
+                            "ef_search": setting if kind == "hnsw" else None,
+                            "probes": setting if kind == "ivfflat" else None,
+                            "ivf_lists": (args.ivf_lists or max(10, rows // 1000)) if kind == "ivfflat" else None,
+                            "build_seconds": build_seconds,
+                            "index_mb": index_mb,
+                            "function": function,
+                            "threshold": threshold,
+                            **result
+                        }
+                        records.append(record)
+                        label = f"{kind}" + (f" ef_search={setting}" if kind == "hnsw" else "") + \
+                                (f" probes={setting}" if kind == "ivfflat" else "")
+                        recall = result["recall_at_k"]
+                        print(f"  {label:<22} {function:<29} t={threshold or '-':<5} "
+                              f"p50 {result['latency']['p50_ms']:7.2f} ms  p95 {result['latency']['p95_ms']:7.2f} ms  "
+                              f"recall@{args.k} {recall if recall is not None else float('nan'):.3f}")
+                    # Write as we go so a long 1M run leaves partial results
+                    write_results(args.out, {"benchmark": "duplicate_search", "environment": environment(),
+                                             "config": vars(args), "results": records})
+    finally:
+        if not args.keep:
+            with get_db_cursor() as cur:
+                cur.execute(f"DROP TABLE IF EXISTS {args.schema}.reports")
+        Database.close_all()
+
+    print(f"\nResults written to {args.out}")
+
+if __name__ == "__main__":
+    main()
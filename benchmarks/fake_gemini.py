@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Gemini generateContent API (and the OpenAI-compatible
+/chat/completions API)
+Answers the prompts nlp_service sends (classify, urgency, drafts, image
+analysis, insights) with plausible canned output after a configurable
+latency, so benchmarks measure Dira rather than a remote API and its quota.
+Point nlp_service at it with GEMINI_BASE_URL=http://127.0.0.1:<port>, or
+LLM_PROVIDER=openai and OPENAI_BASE_URL=http://127.0.0.1:<port>/v1.
+
+Given a cassette recorded with LLM_RECORD=true, recorded prompts get their
+recorded answer and latency, and other prompts a latency drawn from the
+recorded distribution.
+
+    python benchmarks/fake_gemini.py --port 8090 --latency-ms 600 --jitter-ms 200
+    python benchmarks/fake_gemini.py --port 8090 --cassette backend/python/llm_cassette.jsonl
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'python'))
+
+from llm_client import Cassette, ImagePart, content_key
+
+CATEGORY_KEYWORDS = [
+    ("utility", ["water", "stima", "power", "electricity", "sewer", "sewage", "maji", "pipe"]),
+    ("safety", ["mugg", "robbed", "insecurity", "live wire", "cables", "dump", "burn"]),
+    ("health", ["cholera", "dispensary", "medicine", "drugs", "sick", "health"]),
+    ("infrastructure", ["pothole", "road", "bridge", "street light", "drain"]),
+]
+
+def _request_parts(path: str, body: dict) -> list:
+    """The prompt as llm_client contents (text and ImagePart), for either API"""
+    parts = []
+    if path.endswith("/chat/completions"):
+        for message in body.get("messages", []):
+            content = message.get("content", "")
+            for part in [{"type": "text", "text": content}] if isinstance(content, str) else content:
+                if part.get("type") == "text":
+                    parts.append(part["text"])
+                elif part.get("type") == "image_url":
+                    header, data = part["image_url"]["url"].split(",", 1)
+                    parts.append(ImagePart(base64.b64decode(data), header[len("data:"):].split(";")[0]))
+        return parts
+    for content in body.get("contents", []):
+        for part in content.get("parts", []):
+            inline = part.get("inlineData") or part.get("inline_data")
+            if "text" in part:
+                parts.append(part["text"])
+            elif inline:
+                parts.append(ImagePart(base64.b64decode(inline["data"]),
+                                       inline.get("mimeType") or inline.get("mime_type")))
+    return parts
+
+def _prompt_text(parts: list) -> str:
+    return "\n".join(p for p in parts if isinstance(p, str))
+
+def _report_text(prompt: str) -> str:
+    marker = "Report:"
+    return prompt.split(marker, 1)[1].lower() if marker in prompt else prompt.lower()
+
+def answer(prompt: str) -> str:
+    """Canned model output for one of nlp_service's prompts"""
+    if prompt.startswith("Classify the following public report"):
+        text = _report_text(prompt)
+        category = next((c for c, words in CATEGORY_KEYWORDS if any(w in text for w in words)), "general")
+        return json.dumps({"category": category, "confidence": 0.9})
+    if prompt.startswith("Assess the urgency"):
+        text = _report_text(prompt)
+        if any(w in text for w in ["danger", "cholera", "burst", "collapsed", "live", "robbed", "hakuna"]):
+            return "high"
+        return "medium" if any(w in text for w in ["week", "dark", "flood"]) else "low"
+    if prompt.startswith("Draft a professional notification"):
+        return ("Dear Sir/Madam,\n\nWe have received a public report that requires your attention. "
+                "Please review the details in the Dira dashboard and dispatch a team.\n\nRegards,\nDira")
+    if prompt.startswith("Analyze this image"):
+        return "Confirmed: Infrastructure damage, High. The photo shows a damaged road surface."
+    if "data analyst" in prompt:
+        return "- **Volume** is steady.\n- **Utility** reports dominate.\n- Resolution rate is improving."
+    return "OK"
+
+class FakeGemini:
+    """Threaded HTTP server; start() runs it in the background"""
+
+    def __init__(self, port: int = 8090, latency_ms: float = 600.0, jitter_ms: float = 200.0,
+                 error_rate: float = 0.0, seed: int = 0, cassette: Optional[Cassette] = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.cassette = cassette
+        self.requests = 0
+        self.cassette_hits = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                parts = _request_parts(self.path, body)
+                with fake._lock:
+                    fake.requests += 1
+                    text, delay_ms = fake._replay(parts)
+                    fail = fake._rng.random() < fake.error_rate
+                time.sleep(delay_ms / 1000)
+                openai = self.path.endswith("/chat/completions")
+                if not (openai or self.path.endswith(":generateContent")):
+                    return self._send(404, {"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}})
+                if fail:
+                    return self._send(429, {"error": {"code": 429, "message": "Resource exhausted",
+                                                      "status": "RESOURCE_EXHAUSTED"}})
+                if text is None:
+                    text = answer(_prompt_text(parts))
+                if openai:
+                    return self._send(200, {
+                        "object": "chat.completion",
+                        "model": body.get("model", ""),
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": text},
+                                     "finish_reason": "stop"}],
+                        "usage": {"prompt_tokens": 50, "completion_tokens": 20, "total_tokens": 70}
+                    })
+                self._send(200, {
+                    "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP"}],
+                    "usageMetadata": {"promptTokenCount": 50, "candidatesTokenCount": 20, "totalTokenCount": 70}
+                })
+
+            def _send(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+
+    def _replay(self, parts: list):
+        """(recorded answer or None, delay in ms); called under the lock"""
+        if self.cassette is not None:
+            records = self.cassette.get(content_key(parts))
+            if records:
+                self.cassette_hits += 1
+                record = self._rng.choice(records)
+                return record["text"], record.get("latency_ms", 0.0)
+            latencies = self.cassette.latencies()
+            if latencies:
+                return None, self._rng.choice(latencies)
+        return None, max(0.0, self._rng.gauss(self.latency_ms, self.jitter_ms))
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self) -> "FakeGemini":
+        threading.Thread(target=self.server.serve_forever, name="fake-gemini", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a fake Gemini generateContent API")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=600.0)
+    parser.add_argument("--jitter-ms", type=float, default=200.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--cassette", default=None, help="LLM_RECORD cassette to replay answers and latencies from")
+    args = parser.parse_args()
+
+    fake = FakeGemini(args.port, args.latency_ms, args.jitter_ms, args.error_rate,
+                      cassette=Cassette(args.cassette) if args.cassette else None)
+    print(f"Fake Gemini listening on {fake.base_url}")
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        fake.stop()
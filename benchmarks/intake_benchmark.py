@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Load test for the Dira intake pipeline
+Starts nlp_service, db_api, notification_service and `jac serve` with a fake
+Gemini API (optionally replaying a recorded LLM cassette) and a local SMTP sink, submits a synthetic Kenyan corpus to
+IntakeAgent or IntakeAgentDB at a fixed concurrency, and reports throughput,
+end-to-end latency and p50/p95/p99 per stage (from the pipeline trace
+spans). Results are compared with a stored baseline; a regression beyond the
+tolerance exits non-zero.
+
+Requires DATABASE_URL pointing at a PostgreSQL + pgvector database with the
+schema loaded (backend/setup_db.py), and the ports 8001-8004 free.
+
+    python benchmarks/intake_benchmark.py --walker IntakeAgentDB --size 300 --concurrency 8
+    python benchmarks/intake_benchmark.py --save-baseline   # record the current numbers
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(BENCH_DIR, '..', 'backend')
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'python'))
+
+import tracing
+from common import BASELINE_DIR, compare_latencies, environment, latency_summary, load_baseline, write_results
+from corpus import generate_corpus
+from fake_gemini import FakeGemini
+from llm_client import Cassette
+from smtp_sink import SMTPSink
+
+# Ports the walkers call (hard-coded in main.jac / db_walkers.jac)
+NLP_PORT = 8001
+DB_API_PORT = 8002
+NOTIFICATION_PORT = 8003
+DB_API_DB_WALKERS_PORT = 8004
+
+WALKER_FILES = {"IntakeAgent": "main.jac", "IntakeAgentDB": "db_walkers.jac"}
+
+def port_open(port: int) -> bool:
+    with socket.socket() as s:
+        s.settimeout(0.2)
+        return s.connect_ex(("127.0.0.1", port)) == 0
+
+def wait_until(check, timeout: float, what: str):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if check():
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Timed out waiting for {what}")
+
+class Services:
+    """The backend processes, started with benchmark stand-ins in their environment"""
+
+    def __init__(self, walker: str, jac_port: int, env: dict, log_dir: str):
+        self.walker = walker
+        self.jac_port = jac_port
+        self.env = env
+        self.log_dir = log_dir
+        self.processes = []
+
+    def _spawn(self, name, args, cwd):
+        log = open(os.path.join(self.log_dir, f"{name}.log"), "w")
+        process = subprocess.Popen(args, cwd=cwd, env=self.env, stdout=log, stderr=subprocess.STDOUT)
+        self.processes.append((name, process, log))
+
+    def start(self, startup_timeout: float):
+        python_dir = os.path.join(BACKEND_DIR, 'python')
+        ports = [NLP_PORT, DB_API_PORT, NOTIFICATION_PORT, self.jac_port]
+        if self.walker == "IntakeAgentDB":
+            ports.append(DB_API_DB_WALKERS_PORT)
+        busy = [port for port in ports if port_open(port)]
+        if busy:
+            raise RuntimeError(f"Ports already in use: {busy} (stop running services or use --no-start)")
+
+        self._spawn("nlp_service", [sys.executable, "nlp_service.py"], python_dir)
+        self._spawn("db_api", [sys.executable, "db_api.py"], python_dir)
+        self._spawn("notification_service", [sys.executable, "notification_service.py"], python_dir)
+        if self.walker == "IntakeAgentDB":
+            self._spawn("db_api_8004", [sys.executable, "-m", "uvicorn", "db_api:app",
+                                        "--port", str(DB_API_DB_WALKERS_PORT)], python_dir)
+        self._spawn("jac", ["jac", "serve", WALKER_FILES[self.walker], "--port", str(self.jac_port)],
+                    os.path.join(BACKEND_DIR, 'jac'))
+
+        wait_until(lambda: requests.get(f"http://127.0.0.1:{DB_API_PORT}/health/ready", timeout=2).ok,
+                   startup_timeout, "db_api")
+        wait_until(lambda: requests.get(f"http://127.0.0.1:{NOTIFICATION_PORT}/metrics", timeout=2).ok,
+                   startup_timeout, "notification_service")
+        # 503 until spaCy and the embedding model are loaded
+        wait_until(lambda: requests.get(f"http://127.0.0.1:{NLP_PORT}/health/ready", timeout=2).ok,
+                   startup_timeout, "nlp_service models")
+        wait_until(lambda: port_open(self.jac_port), startup_timeout, "jac serve")
+
+    def stop(self):
+        # SIGINT lets uvicorn shut down cleanly so buffered trace spans are flushed
+        for _, process, _ in self.processes:
+            if process.poll() is None:
+                process.send_signal(signal.SIGINT)
+        for _, process, log in self.processes:
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+            log.close()
+
+def submit(url: str, report: dict) -> dict:
+    payload = {"report_data": {k: report[k] for k in ("title", "description", "name", "email")}}
+    start = time.perf_counter()
+    try:
+        response = requests.post(url, json=payload, timeout=120)
+        ok = response.status_code == 200
+    except requests.RequestException:
+        ok = False
+    return {"ok": ok, "latency_ms": (time.perf_counter() - start) * 1000}
+
+def stage_latencies(trace_file: str, since_ns: int) -> dict:
+    """p50/p95/p99 per "service: span name" for spans started after since_ns"""
+    durations = {}
+    if not os.path.exists(trace_file):
+        return {}
+    for s in tracing.read_spans(trace_file):
+        if int(s["startTimeUnixNano"]) >= since_ns:
+            durations.setdefault(f"{s['service']}: {s['name']}", []).append(s["duration_ms"])
+    return {stage: latency_summary(values) for stage, values in sorted(durations.items())}
+
+def print_report(results: dict):
+    print(f"\n{results['completed']} reports in {results['wall_seconds']:.1f}s "
+          f"-> {results['throughput_rps']:.2f} reports/s ({results['errors']} errors)")
+    e2e = results["end_to_end"]
+    print(f"End to end: p50 {e2e['p50_ms']:.0f} ms, p95 {e2e['p95_ms']:.0f} ms, p99 {e2e['p99_ms']:.0f} ms")
+    print(f"\n{'stage':<58} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for stage, s in sorted(results["stages"].items(), key=lambda item: -item[1]["p95_ms"]):
+        print(f"{stage[:58]:<58} {s['count']:>6} {s['p50_ms']:>9.1f} {s['p95_ms']:>9.1f} {s['p99_ms']:>9.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the Dira intake pipeline")
+    parser.add_argument("--walker", choices=sorted(WALKER_FILES), default="IntakeAgentDB")
+    parser.add_argument("--size", type=int, default=200, help="reports submitted (after warm-up)")
+    parser.add_argument("--warmup", type=int, default=10, help="reports submitted before measuring")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--duplicate-rate", type=float, default=0.15)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--gemini-latency-ms", type=float, default=600.0)
+    parser.add_argument("--gemini-jitter-ms", type=float, default=200.0)
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-provider", choices=["gemini", "openai"], default="gemini",
+                        help="API the fake serves and nlp_service's LLM_PROVIDER")
+    parser.add_argument("--llm-cassette", default=None,
+                        help="LLM_RECORD cassette; the fake replays its answers and latency distribution")
+    parser.add_argument("--smtp-latency-ms", type=float, default=50.0)
+    parser.add_argument("--jac-port", type=int, default=8000)
+    parser.add_argument("--no-start", action="store_true",
+                        help="drive already-running services (their TRACE_FILE must match --trace-file)")
+    parser.add_argument("--trace-file", default=None)
+    parser.add_argument("--startup-timeout", type=float, default=300.0)
+    parser.add_argument("--results", default=None, help="JSON results path")
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed fractional p50/p95/p99 growth")
+    args = parser.parse_args()
+
+    if not args.no_start and not os.getenv("DATABASE_URL"):
+        parser.error("DATABASE_URL must point at a PostgreSQL + pgvector database")
+
+    work_dir = tempfile.mkdtemp(prefix="dira-bench-")
+    trace_file = args.trace_file or os.path.join(work_dir, "traces.otlp.jsonl")
+    baseline_path = args.baseline or os.path.join(BASELINE_DIR, f"intake_{args.walker}.json")
+    results_path = args.results or os.path.join(work_dir, "results.json")
+
+    corpus = generate_corpus(args.warmup + args.size, args.duplicate_rate, seed=args.seed)
+    fake = sink = services = None
+    try:
+        if not args.no_start:
+            cassette = Cassette(args.llm_cassette) if args.llm_cassette else None
+            fake = FakeGemini(0, args.gemini_latency_ms, args.gemini_jitter_ms, args.gemini_error_rate,
+                              cassette=cassette).start()
+            sink = SMTPSink(0, args.smtp_latency_ms).start()
+            env = dict(
+                os.environ,
+                LLM_PROVIDER=args.llm_provider,
+                LLM_RECORD="false",
+                GEMINI_API_KEY="benchmark",
+                GEMINI_BASE_URL=fake.base_url,
+                OPENAI_API_KEY="benchmark",
+                OPENAI_BASE_URL=f"{fake.base_url}/v1",
+                SMTP_SERVER="127.0.0.1",
+                SMTP_PORT=str(sink.port),
+                SMTP_USERNAME="benchmark@dira.local",
+                SMTP_PASSWORD="benchmark",
+                SMTP_STARTTLS="false",
+                TRACING_ENABLED="true",
+                TRACE_FILE=trace_file,
+                TRACE_FLUSH_SECONDS="0.5",
+                PYTHONUNBUFFERED="1"
+            )
+            services = Services(args.walker, args.jac_port, env, work_dir)
+            print(f"Starting services (logs in {work_dir})...")
+            services.start(args.startup_timeout)
+
+        url = f"http://127.0.0.1:{args.jac_port}/walker/{args.walker}"
+        print(f"Warm-up: {args.warmup} reports")
+        for report in corpus[:args.warmup]:
+            submit(url, report)
+
+        print(f"Submitting {args.size} reports to {args.walker} with concurrency {args.concurrency}...")
+        since_ns = time.time_ns()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            outcomes = list(pool.map(lambda report: submit(url, report), corpus[args.warmup:]))
+        wall = time.perf_counter() - start
+    finally:
+        if services:
+            services.stop()
+        if fake:
+            fake.stop()
+        if sink:
+            sink.stop()
+
+    if args.no_start:
+        # Running services flush every TRACE_FLUSH_SECONDS
+        time.sleep(2)
+    completed = [o for o in outcomes if o["ok"]]
+    results = {
+        "benchmark": "intake",
+        "environment": environment(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("results", "baseline", "save_baseline")},
+        "completed": len(completed),
+        "errors": len(outcomes) - len(completed),
+        "wall_seconds": wall,
+        "throughput_rps": len(completed) / wall if wall else 0.0,
+        "end_to_end": latency_summary([o["latency_ms"] for o in completed]),
+        "stages": stage_latencies(trace_file, since_ns),
+        "gemini_requests": fake.requests if fake else None,
+        "cassette_hits": fake.cassette_hits if fake and fake.cassette else None,
+        "emails_delivered": sink.messages if sink else None
+    }
+
+    baseline = load_baseline(baseline_path)
+    if baseline:
+        current = dict(results["stages"], end_to_end=results["end_to_end"])
+        previous = dict(baseline["stages"], end_to_end=baseline["end_to_end"])
+        results["baseline"] = {"path": baseline_path, "commit": baseline["environment"].get("commit")}
+        results["regressions"] = compare_latencies(current, previous, args.tolerance)
+
+    write_results(results_path, results)
+    print_report(results)
+    print(f"\nResults written to {results_path}")
+
+    if args.save_baseline:
+        write_results(baseline_path, results)
+        print(f"Baseline saved to {baseline_path}")
+    elif baseline:
+        regressions = results["regressions"]
+        for r in regressions:
+            print(f"REGRESSION {r['stage']} {r['metric']}: {r['baseline']:.1f} -> {r['current']:.1f} ms "
+                  f"(+{r['change'] * 100:.0f}%)")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {baseline_path}")
+    else:
+        print("No baseline found; rerun with --save-baseline to record one")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Local SMTP sink for Dira benchmarks
+Accepts AUTH and any message over plain SMTP (run the services with
+SMTP_STARTTLS=false), counts deliveries and discards them, so SMTP latency
+is measured without sending real email.
+
+    python benchmarks/smtp_sink.py --port 2525
+"""
+
+import time
+import argparse
+import threading
+import socketserver
+
+class SMTPSink:
+    """Minimal RFC 5321 server: EHLO/HELO, AUTH, MAIL, RCPT, DATA, RSET, NOOP, QUIT"""
+
+    def __init__(self, port: int = 2525, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.messages = 0
+        self.recipients = []
+        self._lock = threading.Lock()
+        sink = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line):
+                self.wfile.write((line + "\r\n").encode())
+
+            def handle(self):
+                self.reply("220 dira-sink ESMTP")
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    command = line.decode(errors="replace").strip()
+                    verb = command.split(" ", 1)[0].upper()
+                    if verb == "EHLO":
+                        self.wfile.write(b"250-dira-sink\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n")
+                    elif verb == "HELO":
+                        self.reply("250 dira-sink")
+                    elif verb == "AUTH":
+                        self._auth(command)
+                    elif verb == "RCPT":
+                        with sink._lock:
+                            sink.recipients.append(command.split(":", 1)[-1].strip(" <>"))
+                        self.reply("250 OK")
+                    elif verb == "DATA":
+                        self.reply("354 End data with <CR><LF>.<CR><LF>")
+                        while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                            pass
+                        if sink.latency_ms:
+                            time.sleep(sink.latency_ms / 1000)
+                        with sink._lock:
+                            sink.messages += 1
+                        self.reply("250 OK queued")
+                    elif verb == "QUIT":
+                        self.reply("221 Bye")
+                        return
+                    elif verb in ("MAIL", "RSET", "NOOP"):
+                        self.reply("250 OK")
+                    else:
+                        self.reply("502 Command not implemented")
+
+            def _auth(self, command):
+                parts = command.split()
+                mechanism = parts[1].upper() if len(parts) > 1 else ""
+                if mechanism == "PLAIN" and len(parts) == 2:
+                    self.reply("334 ")
+                    self.rfile.readline()
+                elif mechanism == "LOGIN":
+                    # Username may come with the command; password always follows
+                    for _ in range(1 if len(parts) > 2 else 2):
+                        self.reply("334 VXNlcm5hbWU6")
+                        self.rfile.readline()
+                self.reply("235 Authentication successful")
+
+        class Server(socketserver.ThreadingTCPServer):
+            allow_reuse_address = True
+            daemon_threads = True
+
+        self.server = Server(("127.0.0.1", port), Handler)
+        self.port = self.server.server_address[1]
+
+    def start(self) -> "SMTPSink":
+        threading.Thread(target=self.server.serve_forever, name="smtp-sink", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Accept and discard SMTP mail")
+    parser.add_argument("--port", type=int, default=2525)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    sink = SMTPSink(args.port, args.latency_ms)
+    print(f"SMTP sink listening on 127.0.0.1:{sink.port}")
+    try:
+        sink.server.serve_forever()
+    except KeyboardInterrupt:
+        sink.stop()
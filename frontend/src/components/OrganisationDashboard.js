@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { runWalker } from '../jacService';
+import { runWalker, subscribeReportEvents, applyReportDelta } from '../jacService';
 
 function OrganisationDashboard() {
   const [reports, setReports] = useState([]);
@@ -11,9 +11,23 @@ function OrganisationDashboard() {
     fetchReports();
   }, [selectedOrg]);
 
-  const fetchReports = async () => {
+  // Live status changes of listed reports; a new route to this organisation
+  // brings a new report into the list
+  useEffect(() => subscribeReportEvents({
+    types: ['report.updated', 'route.created'],
+    onEvent: (type, delta) => {
+      if (type === 'route.created') {
+        if (delta.organisation_name === selectedOrg) fetchReports(true);
+      } else {
+        setReports((current) => applyReportDelta(current, type, delta));
+      }
+    },
+    onResync: () => fetchReports(true)
+  }), [selectedOrg]);
+
+  const fetchReports = async (quiet = false) => {
     try {
-      setLoading(true);
+      if (!quiet) setLoading(true);
       const response = await runWalker('get_org_reports', { org_name: selectedOrg, limit: 25 });
       
       let reportsList = [];
@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { runWalker } from '../jacService';
+import { runWalker, subscribeReportEvents, applyReportDelta } from '../jacService';
 
 function PublicTransparency() {
   const [reports, setReports] = useState([]);
@@ -13,9 +13,21 @@ function PublicTransparency() {
     fetchPublicReports();
   }, []);
 
-  const fetchPublicReports = async () => {
+  // Live status changes and new reports, instead of re-running the walker
+  useEffect(() => subscribeReportEvents({
+    types: ['report'],
+    onEvent: (type, delta) => {
+      setReports((current) => applyReportDelta(current, type, delta));
+      setTrackResult((tracked) => (
+        tracked && tracked.id === delta.id ? { ...tracked, status: delta.status } : tracked
+      ));
+    },
+    onResync: () => fetchPublicReports(true)
+  }), []);
+
+  const fetchPublicReports = async (quiet = false) => {
     try {
-      setLoading(true);
+      if (!quiet) setLoading(true);
       const response = await runWalker('get_public_reports', { limit: 25 });
       
       let reportsList = [];
@@ -2,6 +2,27 @@ import React, { useState, useRef } from 'react';
 import { runWalker } from '../jacService';
 import ReactMarkdown from 'react-markdown';
 
+// Phone photos are often 4000px+ and several MB; the vision model only needs
+// ~1600px. Re-encoding through a canvas also drops EXIF (including GPS).
+const MAX_IMAGE_SIDE = 1600;
+const IMAGE_QUALITY = 0.85;
+
+function downscaleImage(dataUrl) {
+  return new Promise((resolve, reject) => {
+    const img = new Image();
+    img.onload = () => {
+      const scale = Math.min(1, MAX_IMAGE_SIDE / Math.max(img.width, img.height));
+      const canvas = document.createElement('canvas');
+      canvas.width = Math.round(img.width * scale);
+      canvas.height = Math.round(img.height * scale);
+      canvas.getContext('2d').drawImage(img, 0, 0, canvas.width, canvas.height);
+      resolve(canvas.toDataURL('image/jpeg', IMAGE_QUALITY));
+    };
+    img.onerror = reject;
+    img.src = dataUrl;
+  });
+}
+
 function ReportForm() {
   const [formData, setFormData] = useState({
     title: '',
@@ -19,10 +40,16 @@ function ReportForm() {
     const file = e.target.files[0];
     if (file) {
       const reader = new FileReader();
-      reader.onloadend = () => {
+      reader.onloadend = async () => {
+        let imageData = reader.result;
+        try {
+          imageData = await downscaleImage(reader.result);
+        } catch (err) {
+          // Fall back to the original; the server normalises it anyway
+        }
         setFormData(prev => ({
           ...prev,
-          image_data: reader.result
+          image_data: imageData
         }));
       };
       reader.readAsDataURL(file);
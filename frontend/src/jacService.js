@@ -55,3 +55,68 @@ export const runWalker = async (walkerName, context = {}) => {
         throw error;
     }
 };
+
+// db_api serves the live event stream. The package.json proxy points at the
+// Jac server, so development talks to db_api directly (CORS_ORIGINS allows
+// localhost:3000); production builds default to the same origin, with
+// /events routed to db_api by the reverse proxy.
+const EVENTS_URL = process.env.REACT_APP_EVENTS_URL
+    || (process.env.NODE_ENV === 'development' ? 'http://localhost:8004' : '');
+
+const REPORT_EVENT_TYPES = ['report.created', 'report.updated', 'route.created', 'route.updated'];
+
+// Subscribe to live report/route changes (server-sent events from PostgreSQL
+// LISTEN/NOTIFY). onResync fires when deltas were missed and the list should
+// be refetched. Returns a function that closes the stream.
+export const subscribeReportEvents = ({ reportIds, types, onEvent, onResync } = {}) => {
+    if (typeof EventSource === 'undefined') {
+        return () => {};
+    }
+    const params = new URLSearchParams();
+    if (reportIds && reportIds.length) {
+        params.set('report_id', reportIds.join(','));
+    }
+    if (types && types.length) {
+        params.set('types', types.join(','));
+    }
+    const query = params.toString();
+    const source = new EventSource(`${EVENTS_URL}/events/reports${query ? `?${query}` : ''}`);
+
+    REPORT_EVENT_TYPES.forEach((type) => {
+        source.addEventListener(type, (event) => {
+            if (onEvent) {
+                onEvent(type, JSON.parse(event.data));
+            }
+        });
+    });
+    source.addEventListener('resync', () => {
+        if (onResync) {
+            onResync();
+        }
+    });
+    // EventSource reconnects by itself and resumes from the last event id
+    return () => source.close();
+};
+
+// Merge a report.created / report.updated delta into a newest-first feed
+// list; duplicates leave the feed
+export const applyReportDelta = (reports, type, delta, limit = 25) => {
+    if (delta.status === 'duplicate') {
+        return reports.filter((report) => report.id !== delta.id);
+    }
+    const index = reports.findIndex((report) => report.id === delta.id);
+    if (index >= 0) {
+        const next = reports.slice();
+        next[index] = {
+            ...reports[index],
+            status: delta.status,
+            category: delta.category,
+            urgency: delta.urgency
+        };
+        return next;
+    }
+    if (type === 'report.created') {
+        return [delta, ...reports].slice(0, limit);
+    }
+    return reports;
+};
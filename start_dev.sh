@@ -20,7 +20,7 @@ DB_API_PID=$!
 # Start Jac Backend
 echo "Starting Jac Backend on port 8002..."
 cd backend/jac
-./serve.sh 8002 > ../../jac_service.log 2>&1 &
+DB_API_URL=http://127.0.0.1:8004 ./serve.sh 8002 > ../../jac_service.log 2>&1 &
 JAC_PID=$!
 cd ../..
 
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test the benchmark stand-ins: synthetic corpus, fake Gemini, SMTP sink and
+baseline comparison (no services or database needed)
+"""
+
+import sys
+import os
+import json
+import smtplib
+import urllib.request
+from email.mime.text import MIMEText
+
+# Add benchmarks directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from corpus import generate_corpus
+from fake_gemini import FakeGemini
+from smtp_sink import SMTPSink
+from common import compare_latencies, latency_summary
+
+def test_corpus():
+    """The corpus is reproducible and reposts point at earlier reports"""
+    print("Testing synthetic corpus...")
+    a = generate_corpus(300, duplicate_rate=0.2, seed=7)
+    assert a == generate_corpus(300, duplicate_rate=0.2, seed=7)
+    assert a != generate_corpus(300, duplicate_rate=0.2, seed=8)
+
+    reposts = [(i, r) for i, r in enumerate(a) if r["duplicate_of"] is not None]
+    assert 30 <= len(reposts) <= 90, len(reposts)
+    for i, r in reposts:
+        original = a[r["duplicate_of"]]
+        assert r["duplicate_of"] < i and original["duplicate_of"] is None
+        assert r["category"] == original["category"] and r["title"] != original["title"]
+    assert {r["category"] for r in a} == {"infrastructure", "utility", "safety", "health", "general"}
+    print(f"   {len(a)} reports, {len(reposts)} reposts")
+
+def test_fake_gemini():
+    """generateContent returns Gemini-shaped responses to nlp_service's prompts"""
+    print("\nTesting fake Gemini...")
+    fake = FakeGemini(0, latency_ms=1, jitter_ms=0).start()
+    try:
+        body = {"contents": [{"role": "user", "parts": [{"text":
+            "Classify the following public report into one of these categories: ...\n    Report: Hakuna stima in Kibera"}]}]}
+        request = urllib.request.Request(
+            f"{fake.base_url}/v1beta/models/gemini-2.5-flash:generateContent",
+            data=json.dumps(body).encode(), headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request) as response:
+            text = json.loads(response.read())["candidates"][0]["content"]["parts"][0]["text"]
+        assert json.loads(text)["category"] == "utility"
+        assert fake.requests == 1
+    finally:
+        fake.stop()
+    print(f"   Classified as {json.loads(text)['category']}")
+
+def test_smtp_sink():
+    """smtplib can log in and deliver to the sink without TLS"""
+    print("\nTesting SMTP sink...")
+    sink = SMTPSink(0).start()
+    try:
+        msg = MIMEText("Report: burst pipe")
+        msg["Subject"] = "Public Report"
+        server = smtplib.SMTP("127.0.0.1", sink.port)
+        server.login("benchmark@dira.local", "benchmark")
+        server.sendmail("benchmark@dira.local", "water@nairobi.go.ke", msg.as_string())
+        server.quit()
+        assert sink.messages == 1 and sink.recipients == ["water@nairobi.go.ke"]
+    finally:
+        sink.stop()
+    print("   1 message delivered")
+
+def test_baseline_comparison():
+    """Only growth beyond the tolerance and the minimum delta is a regression"""
+    print("\nTesting baseline comparison...")
+    summary = latency_summary([float(v) for v in range(1, 101)])
+    assert round(summary["p50_ms"], 1) == 50.5 and round(summary["p99_ms"], 2) == 99.01
+
+    baseline = {"gemini": {"p50_ms": 600.0, "p95_ms": 900.0, "p99_ms": 1000.0},
+                "encode": {"p50_ms": 1.0, "p95_ms": 2.0, "p99_ms": 3.0}}
+    current = {"gemini": {"p50_ms": 620.0, "p95_ms": 1100.0, "p99_ms": 1050.0},
+               "encode": {"p50_ms": 1.5, "p95_ms": 3.0, "p99_ms": 4.5}}
+    regressions = compare_latencies(current, baseline, tolerance=0.10)
+    assert [(r["stage"], r["metric"]) for r in regressions] == [("gemini", "p95_ms")]
+    print(f"   Flagged gemini p95 +{regressions[0]['change'] * 100:.0f}%")
+
+if __name__ == "__main__":
+    try:
+        test_corpus()
+        test_fake_gemini()
+        test_smtp_sink()
+        test_baseline_comparison()
+        print("\nAll benchmark harness tests passed!")
+    except Exception as e:
+        print(f"\nTest failed: {e}")
+        import traceback
+        traceback.print_exc()
+        exit(1)
@@ -5,6 +5,7 @@ Test CRUD operations for the database layer
 
 import sys
 import os
+import threading
 
 # Add python directory to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'python'))
@@ -57,6 +58,11 @@ def test_crud_operations():
     assert retrieved_reporter.email == "john@example.com"
     print(f"   Retrieved reporter: {retrieved_reporter.name}")
     
+    # Same email in another case resolves to the same reporter
+    assert crud.upsert_reporter(Reporter(email=" John@Example.COM", is_anonymous=True)) == reporter_id
+    assert crud.get_reporter_by_email("JOHN@example.com").id == reporter_id
+    print("   Email upsert is case-insensitive")
+    
     # Test 3: Create Report with Embedding
     print("\nTesting Report CRUD...")
     
@@ -157,8 +163,48 @@ def test_crud_operations():
     infra_reports = crud.get_reports_by_category("infrastructure")
     print(f"   Found {len(infra_reports)} infrastructure reports")
     
+    # Test 8: Single-transaction intake
+    print("\nTesting Intake...")
+    intake_row = crud.create_intake_report(
+        Report(
+            title="Burst pipe flooding Elm Street",
+            description="Water everywhere near the Elm Street junction",
+            category="infrastructure",
+            urgency="high",
+            entities={"locations": ["Elm Street"]},
+            confidence=0.9,
+            status="unique",
+            embedding=[0.1] * 384
+        ),
+        reporter_email="john@example.com",
+        reporter_name="John Doe",
+        duplicates=[{"report_id": report_id, "score": 0.97}]
+    )
+    intake_id = str(intake_row['id'])
+    assert intake_row['status'] == "duplicate"
+    assert str(intake_row['reporter_id']) == reporter_id
+    assert str(intake_row['canonical_report_id']) in (report_id, str(crud.get_report(report_id).canonical_report_id))
+    print(f"   Intake stored report {intake_id} as duplicate of {intake_row['canonical_report_id']}")
+
+    # Named submitters without an email each keep their own reporter row
+    named = [
+        crud.create_intake_report(Report(title="Pothole", description="Pothole on Oak Road"), reporter_name=name)
+        for name in ("Ada", "Grace")
+    ]
+    assert named[0]['reporter_id'] != named[1]['reporter_id']
+    assert [crud.get_reporter(str(r['reporter_id'])).name for r in named] == ["Ada", "Grace"]
+    print("   Emailless reporters stored separately")
+
+    crud.create_report_routes(intake_id, [{"organisation_id": org_id, "message": "Forwarded"}], "routed")
+    assert len(crud.get_routes_for_report(intake_id)) == 1
+    assert crud.get_report(intake_id).status == "routed"
+    print("   Bulk routes recorded and status updated")
+
     # Cleanup
     print("\nCleaning up test data...")
+    crud.delete_report(intake_id)
+    for row in named:
+        crud.delete_report(str(row['id']))
     crud.delete_report(report_id)
     crud.delete_report(similar_report_id)
     crud.delete_organisation(org_id)
@@ -166,9 +212,85 @@ def test_crud_operations():
     
     print("\nAll CRUD tests passed!")
 
+def test_concurrent_cluster_merges(rounds=20):
+    """Overlapping merges in parallel transactions keep clusters flat"""
+    print("\nTesting concurrent cluster merges...")
+    for _ in range(rounds):
+        # Submitted in this order, so a is the oldest root
+        a, b, c, x1, x2 = [
+            crud.create_report(Report(title=f"Cluster race {name}", description="Burst pipe", status="unique"))
+            for name in ("a", "b", "c", "x1", "x2")
+        ]
+        barrier = threading.Barrier(2)
+        errors = []
+
+        def attach(report_id, duplicate_ids):
+            try:
+                barrier.wait()
+                crud.attach_to_cluster(report_id, duplicate_ids)
+            except Exception as e:
+                errors.append(e)
+
+        # x1 merges {a, b}; x2 merges {b, c} at the same time
+        threads = [
+            threading.Thread(target=attach, args=(x1, [b, a])),
+            threading.Thread(target=attach, args=(x2, [c, b]))
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert not errors, errors
+
+        ids = [a, b, c, x1, x2]
+        canonical = {i: crud.get_report(i).canonical_report_id for i in ids}
+        for report_id, root in canonical.items():
+            # Flat: every member points straight at a root
+            assert root is None or crud.get_report(str(root)).canonical_report_id is None, canonical
+        cluster = crud.get_report_cluster(a)
+        assert cluster['canonical_report_id'] == a and cluster['count'] == 5, cluster
+        for report_id in ids:
+            crud.delete_report(report_id)
+    print(f"   {rounds} racing merges left one flat cluster each")
+
+def test_bulk_dedup_rewrite():
+    """A dedup pass replaces text links, keeps image matches and re-points members it didn't score"""
+    print("\nTesting bulk duplicate rewrite...")
+    embedding = [0.1] * 384
+    a = crud.create_report(Report(title="Dedup pass a", description="Burst pipe", status="unique"))
+    b = str(crud.create_intake_report(
+        Report(title="Dedup pass b", description="Burst pipe", status="unique", embedding=embedding),
+        duplicates=[{"report_id": a, "score": 0.95}]
+    )['id'])
+    c = str(crud.create_intake_report(
+        Report(title="Dedup pass c", description="Photo of the pipe", status="unique", embedding=embedding),
+        duplicates=[{"report_id": a, "score": 0.9, "match_type": "image"}]
+    )['id'])
+    # No embedding: never part of a pass
+    d = crud.create_report(Report(title="Dedup pass d", description="Burst pipe", status="unique"))
+    crud.attach_to_cluster(d, [a])
+
+    # The text pass no longer pairs b with a; c is only an image match
+    counts = crud.bulk_apply_duplicate_clusters([a, b, c], [])
+    assert counts["kept_image_duplicates"] == 1 and counts["links_removed"] == 1, counts
+    assert crud.get_report(b).status == "unique" and crud.get_report(b).canonical_report_id is None
+    assert not [r for r in crud.get_related_reports(b) if r.relationship_type == "duplicate"]
+    assert crud.get_report(c).status == "duplicate" and str(crud.get_report(c).canonical_report_id) == a
+
+    # a becomes a duplicate of b: everything that pointed at a follows it
+    counts = crud.bulk_apply_duplicate_clusters([b], [(a, b, 0.9)])
+    for member in (a, c, d):
+        assert str(crud.get_report(member).canonical_report_id) == b, (member, counts)
+    print(f"   {counts}")
+
+    for report_id in (d, c, b, a):
+        crud.delete_report(report_id)
+
 if __name__ == "__main__":
     try:
         test_crud_operations()
+        test_concurrent_cluster_merges()
+        test_bulk_dedup_rewrite()
     except Exception as e:
         print(f"\nTest failed: {e}")
         import traceback
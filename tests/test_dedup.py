@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Test the bulk duplicate clustering used by /dedup/run (no database needed)
+"""
+
+import sys
+import os
+
+# Add python directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'python'))
+
+import numpy as np
+from dedup import cluster_embeddings
+
+def test_cluster_embeddings():
+    """Near-duplicates of a report join it, scored against it"""
+    print("Testing cluster_embeddings...")
+    dim = 16
+    base = np.zeros(dim, dtype=np.float32); base[0] = 1.0
+    other = np.zeros(dim, dtype=np.float32); other[1] = 1.0
+
+    def near(vec, k, eps):
+        v = vec.copy(); v[k] = eps
+        return v / np.linalg.norm(v)
+
+    # 0: original, 1: unrelated, 2 and 3: reposts of 0, 4: repost of 1
+    matrix = np.vstack([
+        base,
+        other,
+        near(base, 5, 0.2),
+        near(base, 6, 0.3),
+        near(other, 7, 0.1),
+    ]).astype(np.float32)
+
+    # Small block size exercises the blocked path
+    roots, root_score = cluster_embeddings(matrix, threshold=0.85, block_size=2)
+    assert roots == [0, 1, 0, 0, 1], roots
+    assert 0 not in root_score and 1 not in root_score
+    for i in (2, 3, 4):
+        assert abs(root_score[i] - float(matrix[i] @ matrix[roots[i]])) < 1e-6
+    print(f"   Cluster roots: {roots}")
+
+def test_no_chaining():
+    """A~B and B~C don't pull C into A's cluster when A and C differ"""
+    print("\nTesting chained near-duplicates...")
+
+    def unit(angle):
+        return np.array([np.cos(angle), np.sin(angle)], dtype=np.float32)
+
+    # Neighbours are 25 degrees apart (cos 0.906), A and C 50 degrees (cos 0.643)
+    a, b, c = unit(0.0), unit(np.radians(25)), unit(np.radians(50))
+    matrix = np.vstack([a, b, c])
+    roots, root_score = cluster_embeddings(matrix, threshold=0.85)
+    assert roots == [0, 0, 2], roots
+    assert abs(root_score[1] - float(a @ b)) < 1e-6 and 2 not in root_score
+
+    # C is similar to both A and B: it joins A with its score against A
+    c = unit(np.radians(12))
+    roots, root_score = cluster_embeddings(np.vstack([a, b, c]), threshold=0.85, block_size=1)
+    assert roots == [0, 0, 0], roots
+    assert abs(root_score[2] - float(a @ c)) < 1e-6
+    print(f"   Roots {roots}, scores {root_score}")
+
+if __name__ == "__main__":
+    try:
+        test_cluster_embeddings()
+        test_no_chaining()
+        print("\nAll dedup tests passed!")
+    except Exception as e:
+        print(f"\nTest failed: {e}")
+        import traceback
+        traceback.print_exc()
+        exit(1)
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Test the live report event hub (fan-out, filtering, replay and resync)
+"""
+
+import sys
+import os
+import json
+import asyncio
+
+# Add python directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'python'))
+
+import events
+
+REPORT_A = "11111111-1111-1111-1111-111111111111"
+REPORT_B = "22222222-2222-2222-2222-222222222222"
+
+def payload(event_type, **fields):
+    return json.dumps({"type": event_type, **fields})
+
+async def drain(subscriber):
+    """Everything queued for subscriber right now"""
+    await asyncio.sleep(0)
+    items = []
+    while True:
+        item = await subscriber.get(0.01)
+        if item is None:
+            return items
+        items.append(item)
+
+def test_format_sse():
+    """Messages follow the text/event-stream framing"""
+    print("Testing SSE formatting...")
+    message = events.format_sse({"id": REPORT_A, "status": "resolved"}, event="report.updated",
+                                event_id="abc-7", retry_ms=3000)
+    assert message == (
+        "id: abc-7\nevent: report.updated\nretry: 3000\n"
+        f'data: {{"id":"{REPORT_A}","status":"resolved"}}\n\n'
+    )
+    assert events.format_sse("one\ntwo") == "data: one\ndata: two\n\n"
+    print("   Framing OK")
+
+def test_filtering():
+    """Subscribers only get the types and reports they asked for"""
+    print("\nTesting subscriber filters...")
+
+    async def run():
+        hub = events.EventHub()
+        everything = hub.subscribe()
+        reports_only = hub.subscribe(types=["report"])
+        one_report = hub.subscribe(report_ids=[REPORT_A])
+
+        hub.publish(payload("report.created", id=REPORT_A, status="pending"))
+        hub.publish(payload("report.updated", id=REPORT_B, status="resolved", previous_status="pending"))
+        hub.publish(payload("route.created", id="r1", report_id=REPORT_A, organisation_name="KPLC"))
+
+        seen = {name: [item[2] for item in await drain(sub)]
+                for name, sub in (("all", everything), ("reports", reports_only), ("one", one_report))}
+        assert seen["all"] == ["report.created", "report.updated", "route.created"], seen
+        assert seen["reports"] == ["report.created", "report.updated"], seen
+        assert seen["one"] == ["report.created", "route.created"], seen
+
+        # The type is moved out of the payload into the SSE event name
+        hub.publish(payload("report.updated", id=REPORT_A, status="resolved"))
+        (_, event_id, event_type, data), = await drain(one_report)
+        assert event_id == f"{hub.boot}-4" and "type" not in data
+
+        hub.unsubscribe(everything)
+        assert hub.subscriber_count() == 2
+        print(f"   {seen}")
+
+    asyncio.run(run())
+
+def test_replay():
+    """Last-Event-ID replays missed events, or asks for a resync when it can't"""
+    print("\nTesting Last-Event-ID replay...")
+
+    async def run():
+        hub = events.EventHub(replay=3)
+        for i in range(2):
+            hub.publish(payload("report.created", id=f"report-{i}"))
+
+        caught_up = hub.subscribe(last_event_id=f"{hub.boot}-1")
+        assert [item[1] for item in await drain(caught_up)] == [f"{hub.boot}-2"]
+        assert await drain(hub.subscribe(last_event_id=f"{hub.boot}-2")) == []
+
+        for i in range(2, 6):
+            hub.publish(payload("report.created", id=f"report-{i}"))
+        # Event 2 fell out of the buffer, events 4-6 are still there
+        assert await drain(hub.subscribe(last_event_id=f"{hub.boot}-1")) == [events.RESYNC]
+        assert len(await drain(hub.subscribe(last_event_id=f"{hub.boot}-3"))) == 3
+        # Ids from another process, or from the future
+        assert await drain(hub.subscribe(last_event_id="deadbeef-3")) == [events.RESYNC]
+        assert await drain(hub.subscribe(last_event_id=f"{hub.boot}-99")) == [events.RESYNC]
+
+        # A LISTEN reconnect may have missed notifications: everyone refetches
+        old_boot = hub.boot
+        listener = hub.subscribe()
+        hub.resync_all()
+        assert hub.boot != old_boot
+        assert await drain(listener) == [events.RESYNC]
+        assert await drain(hub.subscribe(last_event_id=f"{old_boot}-6")) == [events.RESYNC]
+        print("   Replay and resync OK")
+
+    asyncio.run(run())
+
+def test_overflow():
+    """A subscriber that falls behind gets one resync instead of an unbounded queue"""
+    print("\nTesting slow subscriber overflow...")
+
+    async def run():
+        hub = events.EventHub()
+        slow = events.Subscriber(asyncio.get_running_loop(), max_queue=5)
+        hub._subscribers.add(slow)
+        for i in range(50):
+            hub.publish(payload("report.created", id=f"report-{i}"))
+        items = await drain(slow)
+        assert len(items) == 6 and items[-1] is events.RESYNC, items
+
+        # Delivery resumes once the resync has been read
+        hub.publish(payload("report.created", id="after"))
+        (item,) = await drain(slow)
+        assert item[3]["id"] == "after"
+        print(f"   Queue capped at {slow.max_queue} events + resync")
+
+    asyncio.run(run())
+
+def test_malformed_payload():
+    """Payloads without JSON or a type are dropped"""
+    print("\nTesting malformed payloads...")
+
+    async def run():
+        counted = []
+        hub = events.EventHub(on_event=counted.append)
+        subscriber = hub.subscribe()
+        for bad in ("not json", "[1, 2]", json.dumps({"id": REPORT_A})):
+            hub.publish(bad)
+        hub.publish(payload("report.created", id=REPORT_A))
+        assert [item[2] for item in await drain(subscriber)] == ["report.created"]
+        assert counted == ["report.created"]
+        print("   Ignored 3 malformed payloads")
+
+    asyncio.run(run())
+
+def test_sse_stream():
+    """The stream starts with ready, sends keepalives when idle and unsubscribes on close"""
+    print("\nTesting SSE stream...")
+
+    async def run():
+        hub = events.EventHub()
+        subscriber = hub.subscribe()
+        stream = events.sse_stream(hub, subscriber, heartbeat=0.01)
+
+        ready = await stream.__anext__()
+        assert ready.startswith("event: ready\nretry: 3000\n"), ready
+        assert await stream.__anext__() == ": keepalive\n\n"
+
+        hub.publish(payload("report.updated", id=REPORT_A, status="in_progress"))
+        message = await stream.__anext__()
+        assert message.startswith(f"id: {hub.boot}-1\nevent: report.updated\n"), message
+
+        hub.resync_all()
+        assert await stream.__anext__() == "event: resync\ndata: {}\n\n"
+
+        await stream.aclose()
+        assert hub.subscriber_count() == 0
+        print("   Stream OK")
+
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    try:
+        test_format_sse()
+        test_filtering()
+        test_replay()
+        test_overflow()
+        test_malformed_payload()
+        test_sse_stream()
+        print("\nAll event tests passed!")
+    except Exception as e:
+        print(f"\nTest failed: {e}")
+        import traceback
+        traceback.print_exc()
+        exit(1)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test the streaming report export encoders (NDJSON and CSV)
+"""
+
+import sys
+import os
+import io
+import csv
+import json
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+# Add python directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'python'))
+
+import export
+
+COLUMNS = ["id", "title", "entities", "confidence", "submitted_at", "canonical_report_id"]
+
+def rows(count):
+    for i in range(count):
+        yield (
+            f"00000000-0000-0000-0000-{i:012d}",
+            f'Burst pipe, "Kibera" #{i}\nsecond line',
+            {"locations": ["Kibera"], "organisations": []},
+            0.9,
+            datetime(2025, 3, 1, 8, 30, i % 60),
+            None
+        )
+
+def test_ndjson():
+    """One object per line with ISO timestamps and nested JSON kept as JSON"""
+    print("Testing NDJSON export...")
+    chunks = list(export.ndjson_chunks(COLUMNS, rows(1201), chunk_rows=500))
+    assert len(chunks) == 3
+    lines = "".join(chunks).splitlines()
+    assert len(lines) == 1201
+    first = json.loads(lines[0])
+    assert first["submitted_at"] == "2025-03-01T08:30:00"
+    assert first["entities"]["locations"] == ["Kibera"] and first["canonical_report_id"] is None
+    assert list(first) == COLUMNS
+    print(f"   {len(lines)} lines in {len(chunks)} chunks")
+
+def test_csv():
+    """Header plus rows that round-trip through a CSV reader"""
+    print("\nTesting CSV export...")
+    text = "".join(export.csv_chunks(COLUMNS, rows(3), chunk_rows=2))
+    parsed = list(csv.reader(io.StringIO(text)))
+    assert parsed[0] == COLUMNS and len(parsed) == 4
+    assert parsed[1][1] == 'Burst pipe, "Kibera" #0\nsecond line'
+    assert json.loads(parsed[1][2]) == {"locations": ["Kibera"], "organisations": []}
+    assert parsed[1][4] == "2025-03-01T08:30:00" and parsed[1][5] == ""
+
+    assert "".join(export.csv_chunks(["id", "title"], iter([]))) == "id,title\r\n"
+    assert list(export.ndjson_chunks(["id"], iter([]))) == []
+    print(f"   {len(parsed) - 1} rows parsed back")
+
+def test_parse_bound():
+    """since/until accept dates and ISO datetimes and reject anything else"""
+    print("\nTesting since/until parsing...")
+    assert export.parse_bound("2025-01-01") == datetime(2025, 1, 1)
+    assert export.parse_bound(" 2025-01-01T08:30:00 ") == datetime(2025, 1, 1, 8, 30)
+    assert export.parse_bound("2025-01-01T08:30:00Z") == datetime(2025, 1, 1, 8, 30, tzinfo=timezone.utc)
+    assert export.parse_bound("2025-01-01T08:30:00+03:00").utcoffset() == timedelta(hours=3)
+    for bad in ("", "yesterday", "2025-13-01", "2025-01-01'; DROP TABLE reports; --", "01/02/2025"):
+        try:
+            export.parse_bound(bad)
+        except ValueError:
+            continue
+        raise AssertionError(f"accepted {bad!r}")
+    print("   Dates and datetimes parsed, 5 bad values rejected")
+
+def test_constant_memory():
+    """Peak memory while encoding doesn't grow with the number of rows"""
+    print("\nTesting export memory...")
+    peaks = {}
+    for count in (10000, 100000):
+        tracemalloc.start()
+        total = sum(len(chunk) for chunk in export.encode("ndjson", COLUMNS, rows(count)))
+        peaks[count] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        assert total > count * 100
+    assert peaks[100000] < peaks[10000] * 1.5, peaks
+    print(f"   Peak {peaks[10000] // 1024} KB at 10k rows, {peaks[100000] // 1024} KB at 100k rows")
+
+if __name__ == "__main__":
+    try:
+        test_ndjson()
+        test_csv()
+        test_parse_bound()
+        test_constant_memory()
+        print("\nAll export tests passed!")
+    except Exception as e:
+        print(f"\nTest failed: {e}")
+        import traceback
+        traceback.print_exc()
+        exit(1)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Test offline geocoding and the facility grid index (no database needed)
+"""
+
+import sys
+import os
+
+# Add python directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'python'))
+
+import geo
+from geo import Gazetteer, GridIndex, haversine_km
+
+def test_gazetteer_lookup():
+    """Place names resolve from exact names, aliases and longer phrases"""
+    print("Testing Gazetteer...")
+    gazetteer = Gazetteer()
+    assert gazetteer.lookup("Kisumu") is not None
+    assert gazetteer.lookup("kibra") == gazetteer.lookup("Kibera")
+    assert gazetteer.lookup("Embakasi, Nairobi") == gazetteer.lookup("Embakasi")
+    assert gazetteer.lookup("Kabete Water Treatment Works") == gazetteer.lookup("Kabete")
+    assert gazetteer.lookup("Atlantis") is None
+    print("   Names, aliases and phrases resolved")
+
+def test_grid_nearest():
+    """Nearest facilities come back closest first and respect the radius"""
+    print("\nTesting GridIndex...")
+    gazetteer = Gazetteer()
+    index = GridIndex()
+    for place in ["Embakasi", "Kabete", "Mombasa", "Kisumu"]:
+        lat, lon = gazetteer.lookup(place)
+        index.insert(lat, lon, place)
+
+    lat, lon = gazetteer.lookup("Dandora")
+    nearest = index.nearest(lat, lon, max_km=25)
+    names = [item for _, item in nearest]
+    assert names == ["Embakasi", "Kabete"], names
+    assert nearest[0][0] < nearest[1][0]
+    print(f"   Near Dandora: {names}")
+
+    lat, lon = gazetteer.lookup("Nairobi")
+    mombasa = gazetteer.lookup("Mombasa")
+    distance = haversine_km(lat, lon, *mombasa)
+    assert 400 < distance < 500
+    print(f"   Nairobi-Mombasa: {distance:.0f} km")
+
+def test_nearest_organisations_filters_before_limit():
+    """Eligible organisations are found even behind many closer ineligible facilities"""
+    print("\nTesting nearest_organisations in a dense area...")
+    gazetteer = Gazetteer()
+    lat, lon = gazetteer.lookup("Embakasi")
+    index = GridIndex()
+    # 80 utility facilities right at the report, one police post a little further
+    for i in range(80):
+        index.insert(lat + i * 1e-5, lon, {
+            "organisation_id": f"u{i}", "organisation_name": f"Utility {i}", "organisation_type": "utility",
+            "contact_email": None, "name": f"Substation {i}"
+        })
+    index.insert(lat + 0.02, lon, {
+        "organisation_id": "p1", "organisation_name": "Police", "organisation_type": "government",
+        "contact_email": None, "name": "Embakasi Police Post"
+    })
+
+    original = geo._facility_index
+    geo._facility_index = index
+    try:
+        by_type = geo.nearest_organisations(["Embakasi"], org_types=["government"])
+        by_id = geo.nearest_organisations(["Embakasi"], organisation_ids=["p1", "u79"], limit=5)
+    finally:
+        geo._facility_index = original
+    assert [o["id"] for o in by_type] == ["p1"], by_type
+    assert [o["id"] for o in by_id] == ["u79", "p1"], by_id
+    print(f"   Found {by_type[0]['facility']} at {by_type[0]['distance_km']} km")
+
+if __name__ == "__main__":
+    try:
+        test_gazetteer_lookup()
+        test_grid_nearest()
+        test_nearest_organisations_filters_before_limit()
+        print("\nAll geo tests passed!")
+    except Exception as e:
+        print(f"\nTest failed: {e}")
+        import traceback
+        traceback.print_exc()
+        exit(1)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Test the perceptual-hash BK-tree and image analysis cache (no database needed)
+"""
+
+import sys
+import os
+import random
+
+# Add python directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'python'))
+
+from image_index import BKTree, ImageAnalysisCache, corroborated, hamming, to_db, to_hex, parse_hash
+
+def flip_bits(h, count, rng):
+    for bit in rng.sample(range(64), count):
+        h ^= 1 << bit
+    return h
+
+def test_bk_tree_matches_brute_force():
+    """Radius search returns exactly what a linear scan would"""
+    print("Testing BKTree...")
+    rng = random.Random(42)
+    hashes = [rng.getrandbits(64) for _ in range(2000)]
+    tree = BKTree()
+    for i, h in enumerate(hashes):
+        tree.add(h, i)
+
+    for _ in range(50):
+        query = flip_bits(rng.choice(hashes), rng.randint(0, 6), rng)
+        expected = sorted(i for i, h in enumerate(hashes) if hamming(query, h) <= 6)
+        found = sorted(i for _, i in tree.search(query, 6))
+        assert found == expected, (found, expected)
+    print(f"   {tree.size} hashes, radius searches agree with a linear scan")
+
+def test_cache_near_duplicates():
+    """Near-identical hashes hit, distant ones miss, and the cache stays bounded"""
+    print("\nTesting ImageAnalysisCache...")
+    rng = random.Random(7)
+    cache = ImageAnalysisCache(max_entries=100, max_distance=5)
+    pipe = rng.getrandbits(64)
+    cache.put(f"{pipe:016x}", "Confirmed: Burst pipe, High")
+
+    hit = cache.get(f"{flip_bits(pipe, 3, rng):016x}")
+    assert hit["analysis"] == "Confirmed: Burst pipe, High" and hit["distance"] == 3
+    assert cache.get(f"{flip_bits(pipe, 20, rng):016x}") is None
+
+    for _ in range(250):
+        cache.put(rng.getrandbits(64), "other")
+    assert len(cache) <= 100
+    assert cache.stats()["hits"] == 1
+    print(f"   Hit at distance 3, miss at 20, {len(cache)} entries after 251 puts")
+
+def test_hash_conversions():
+    """Hex <-> signed BIGINT round trips, including the top bit"""
+    print("\nTesting hash conversions...")
+    for value in ["0000000000000000", "7fffffffffffffff", "8000000000000000", "ffffffffffffffff", "a1b2c3d4e5f60718"]:
+        stored = to_db(value)
+        assert -(1 << 63) <= stored < (1 << 63)
+        assert to_hex(stored) == value
+        assert parse_hash(stored) == int(value, 16)
+    assert to_db(None) is None and to_hex("") is None
+    print("   Round trips preserved")
+
+def test_image_match_corroboration():
+    """Photo matches only count as duplicates with similar text or the same category"""
+    print("\nTesting image match corroboration...")
+    dark_photo = {"category": "safety", "text_similarity": 0.12}
+    assert not corroborated(dark_photo)
+    assert not corroborated(dark_photo, category="utility")
+    assert corroborated(dark_photo, category="safety")
+    assert corroborated({"category": "utility", "text_similarity": 0.71})
+    # No embedding stored for the older report: category is the only evidence
+    assert not corroborated({"category": "utility", "text_similarity": None})
+    print("   Unrelated texts stay related, not duplicates")
+
+if __name__ == "__main__":
+    try:
+        test_bk_tree_matches_brute_force()
+        test_cache_near_duplicates()
+        test_hash_conversions()
+        test_image_match_corroboration()
+        print("\nAll image index tests passed!")
+    except Exception as e:
+        print(f"\nTest failed: {e}")
+        import traceback
+        traceback.print_exc()
+        exit(1)
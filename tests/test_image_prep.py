@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Test image normalisation before vision analysis (requires Pillow)
+"""
+
+import sys
+import os
+import io
+import base64
+
+# Add python directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'python'))
+
+from PIL import Image
+import image_prep
+
+def make_photo(width=4000, height=3000, with_exif=True):
+    """A large JPEG with some structure and camera-style EXIF"""
+    image = Image.effect_mandelbrot((width, height), (-2.0, -1.2, 1.0, 1.2), 64).convert("RGB")
+    buffer = io.BytesIO()
+    exif = Image.Exif()
+    if with_exif:
+        exif[0x010F] = "PhoneMaker"  # Make
+        exif[0x0112] = 6  # Orientation: rotate 90 CW
+    image.save(buffer, format="JPEG", quality=95, exif=exif)
+    return buffer.getvalue()
+
+def test_prepare_image():
+    """Uploads are downscaled, re-encoded and stripped of EXIF"""
+    print("Testing prepare_image...")
+    raw = make_photo()
+    prepared = image_prep.prepare_image(raw)
+
+    assert max(prepared.width, prepared.height) <= image_prep.VISION_MAX_SIDE
+    # Orientation 6 was applied to the pixels: the landscape photo is now portrait
+    assert prepared.height > prepared.width
+    assert len(prepared.data) < len(raw) / 5, (len(prepared.data), len(raw))
+
+    reopened = Image.open(io.BytesIO(prepared.data))
+    assert not reopened.getexif(), dict(reopened.getexif())
+    print(f"   {len(raw)} -> {len(prepared.data)} bytes, {prepared.width}x{prepared.height} {prepared.mime_type}")
+
+def test_hash_and_limits():
+    """Re-encoded copies hash alike; oversized and non-image uploads are rejected"""
+    print("\nTesting perceptual hash and limits...")
+    a = image_prep.prepare_image(make_photo())
+    b = image_prep.prepare_image(make_photo(2000, 1500))
+    distance = bin(int(a.phash, 16) ^ int(b.phash, 16)).count("1")
+    assert distance <= 6, distance
+    print(f"   Hamming distance between resized copies: {distance}")
+
+    data_url = "data:image/jpeg;base64," + base64.b64encode(make_photo(200, 100, with_exif=False)).decode()
+    assert image_prep.prepare_image(image_prep.decode_data_url(data_url)).width == 200
+
+    try:
+        image_prep.decode_data_url("A" * (image_prep.MAX_UPLOAD_BYTES * 2))
+        raise AssertionError("oversized upload accepted")
+    except image_prep.ImageTooLarge:
+        pass
+
+    try:
+        image_prep.prepare_image(b"not an image")
+        raise AssertionError("garbage accepted")
+    except image_prep.InvalidImage:
+        pass
+    print("   Size cap and invalid data rejected")
+
+if __name__ == "__main__":
+    try:
+        test_prepare_image()
+        test_hash_and_limits()
+        print("\nAll image preparation tests passed!")
+    except Exception as e:
+        print(f"\nTest failed: {e}")
+        import traceback
+        traceback.print_exc()
+        exit(1)
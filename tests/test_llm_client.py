@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Test the LLM client abstraction: cassette recording, offline replay and the
+fake API answering from a cassette (no network or API key needed)
+"""
+
+import sys
+import os
+import json
+import time
+import tempfile
+import urllib.request
+
+# Add python directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'python'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+import llm_client
+from llm_client import Cassette, ImagePart, LLMClient, LLMUnavailable, RecordingClient, ReplayClient, content_key
+from fake_gemini import FakeGemini
+
+class EchoClient(LLMClient):
+    """Stands in for a live provider"""
+    provider = "echo"
+    model = "echo-1"
+
+    def generate(self, contents, operation=""):
+        time.sleep(0.02)
+        parts = contents if isinstance(contents, list) else [contents]
+        return f"{operation}: " + " ".join(p for p in parts if isinstance(p, str))
+
+def test_content_key():
+    """Keys depend on text and image bytes, not on how the contents are wrapped"""
+    print("Testing content keys...")
+    assert content_key("Report: burst pipe") == content_key(["Report: burst pipe"])
+    assert content_key("Report: burst pipe") != content_key("Report: burst pipe ")
+    photo = ImagePart(b"\xff\xd8jpeg", "image/jpeg")
+    assert content_key(["Analyze", photo]) == content_key(["Analyze", ImagePart(b"\xff\xd8jpeg", "image/jpeg")])
+    assert content_key(["Analyze", photo]) != content_key(["Analyze", ImagePart(b"\xff\xd8other", "image/jpeg")])
+    print("   Keys are stable")
+
+def test_record_then_replay():
+    """Recorded answers replay offline with their recorded latency"""
+    print("\nTesting record and replay...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cassette.jsonl")
+        recorder = RecordingClient(EchoClient(), Cassette(path))
+        assert recorder.generate("Hakuna maji Kibera", "classify") == "classify: Hakuna maji Kibera"
+        recorder.generate(["Analyze this image", ImagePart(b"img", "image/webp")], "analyze_image")
+
+        with open(path) as f:
+            records = [json.loads(line) for line in f]
+        assert [r["operation"] for r in records] == ["classify", "analyze_image"]
+        assert records[0]["provider"] == "echo" and records[0]["latency_ms"] >= 20
+
+        replay = ReplayClient(Cassette(path))
+        replay.warm_up()
+        assert replay.model == "echo-1"
+        start = time.perf_counter()
+        assert replay.generate(["Hakuna maji Kibera"]) == "classify: Hakuna maji Kibera"
+        assert time.perf_counter() - start >= 0.015
+        assert replay.generate(["Analyze this image", ImagePart(b"img", "image/webp")]) == \
+            "analyze_image: Analyze this image"
+
+        fast = ReplayClient(Cassette(path), latency="none")
+        try:
+            fast.generate("Never recorded", "assess_urgency")
+            raise AssertionError("expected a cassette miss")
+        except LLMUnavailable:
+            pass
+        assert (replay.hits, fast.misses) == (2, 1)
+    print("   2 exchanges recorded and replayed")
+
+def test_from_env():
+    """LLM_* variables select the provider; no key means no client"""
+    print("\nTesting configuration...")
+    saved = dict(os.environ)
+    try:
+        for name in ("LLM_PROVIDER", "LLM_MODEL", "LLM_RECORD", "GEMINI_API_KEY", "OPENAI_API_KEY"):
+            os.environ.pop(name, None)
+        assert llm_client.from_env() is None
+
+        os.environ.update(LLM_PROVIDER="openai", OPENAI_API_KEY="key", LLM_MODEL="llama3",
+                          OPENAI_BASE_URL="http://127.0.0.1:11434/v1/")
+        client = llm_client.from_env()
+        assert client.provider == "openai" and client.model == "llama3"
+        assert client.base_url == "http://127.0.0.1:11434/v1"
+
+        os.environ.update(LLM_RECORD="true")
+        assert isinstance(llm_client.from_env(), RecordingClient)
+
+        os.environ.update(LLM_PROVIDER="replay", LLM_REPLAY_LATENCY="none")
+        client = llm_client.from_env()
+        assert client.provider == "replay" and client.latency == "none"
+    finally:
+        os.environ.clear()
+        os.environ.update(saved)
+    print("   gemini, openai, record and replay configured")
+
+def post(url, body):
+    request = urllib.request.Request(url, data=json.dumps(body).encode(), headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read()), time.perf_counter() - start
+
+def test_fake_api_replays_cassette():
+    """The fake answers recorded prompts from the cassette and samples its latencies"""
+    print("\nTesting fake API with a cassette...")
+    with tempfile.TemporaryDirectory() as tmp:
+        cassette = Cassette(os.path.join(tmp, "cassette.jsonl"))
+        cassette.append({"key": content_key("Report: recorded prompt"), "operation": "classify",
+                         "text": '{"category": "health", "confidence": 0.8}', "latency_ms": 30.0})
+        fake = FakeGemini(0, latency_ms=1, jitter_ms=0, cassette=cassette).start()
+        try:
+            # Recorded prompt, in the request shape of llm_client.OpenAICompatibleClient
+            body, elapsed = post(f"{fake.base_url}/v1/chat/completions", {"model": "gpt-4o-mini", "messages": [
+                {"role": "user", "content": [{"type": "text", "text": "Report: recorded prompt"}]}]})
+            assert json.loads(body["choices"][0]["message"]["content"])["category"] == "health"
+            assert elapsed >= 0.025
+
+            # Unrecorded Gemini request: canned answer, latency from the recorded distribution
+            body, elapsed = post(f"{fake.base_url}/v1beta/models/gemini-2.5-flash:generateContent", {"contents": [
+                {"role": "user", "parts": [{"text": "Assess the urgency of this public report\n    Report: burst pipe"}]}]})
+            assert body["candidates"][0]["content"]["parts"][0]["text"] == "high" and elapsed >= 0.025
+            assert (fake.requests, fake.cassette_hits) == (2, 1)
+        finally:
+            fake.stop()
+    print("   Recorded answer and latency served")
+
+if __name__ == "__main__":
+    try:
+        test_content_key()
+        test_record_then_replay()
+        test_from_env()
+        test_fake_api_replays_cassette()
+        print("\nAll LLM client tests passed!")
+    except Exception as e:
+        print(f"\nTest failed: {e}")
+        import traceback
+        traceback.print_exc()
+        exit(1)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Test the nearest-centroid local classifier tier (no database needed)
+"""
+
+import sys
+import os
+import json
+
+# Add python directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'python'))
+
+import numpy as np
+import local_classifier
+from local_classifier import CentroidClassifier, LocalTier, MIN_SAMPLES_PER_LABEL
+
+def make_cluster(center, n, rng):
+    """n noisy unit vectors around a center"""
+    points = center + 0.05 * rng.standard_normal((n, len(center)))
+    return points / np.linalg.norm(points, axis=1, keepdims=True)
+
+def test_centroid_classifier():
+    """Classifier separates well-separated clusters with high confidence"""
+    print("Testing CentroidClassifier...")
+    rng = np.random.default_rng(0)
+    dim = 384
+    water = np.zeros(dim); water[0] = 1.0
+    roads = np.zeros(dim); roads[1] = 1.0
+
+    embeddings = np.vstack([make_cluster(water, 20, rng), make_cluster(roads, 20, rng)])
+    labels = ["utility"] * 20 + ["infrastructure"] * 20
+
+    clf = CentroidClassifier().fit(embeddings, labels)
+    assert clf.is_trained
+    assert sorted(clf.labels) == ["infrastructure", "utility"]
+
+    label, confidence = clf.predict(make_cluster(water, 1, rng)[0])
+    assert label == "utility"
+    assert confidence > 0.9
+    print(f"   Predicted {label} ({confidence:.3f})")
+
+    label, confidence = clf.predict(make_cluster(roads, 1, rng)[0])
+    assert label == "infrastructure"
+    print(f"   Predicted {label} ({confidence:.3f})")
+
+def test_sparse_labels_are_skipped():
+    """Labels with too few examples get no centroid"""
+    print("\nTesting sparse label handling...")
+    rng = np.random.default_rng(1)
+    embeddings = make_cluster(np.ones(8), MIN_SAMPLES_PER_LABEL - 1, rng)
+    clf = CentroidClassifier().fit(embeddings, ["health"] * len(embeddings))
+    assert not clf.is_trained
+    assert clf.predict(embeddings[0]) is None
+    print("   Untrained classifier defers to the next tier")
+
+def axis(i, dim=384):
+    v = np.zeros(dim); v[i] = 1.0
+    return v
+
+def train_tier(stored):
+    """LocalTier trained from stored {field: rows}, plus the (field, labels) it asked for"""
+    requested = []
+
+    def fake_labelled_embeddings(field, labels, limit):
+        requested.append((field, tuple(labels)))
+        return stored.get(field, [])
+
+    original = local_classifier.get_labelled_embeddings
+    local_classifier.get_labelled_embeddings = fake_labelled_embeddings
+    try:
+        tier = LocalTier(threshold=0.75)
+        counts = tier.train()
+    finally:
+        local_classifier.get_labelled_embeddings = original
+    return tier, counts, requested
+
+def test_local_tier_trains_on_llm_labels():
+    """LocalTier.train fits each field from the stored LLM labels"""
+    print("\nTesting LocalTier training...")
+    rng = np.random.default_rng(2)
+    stored = {"category": [], "urgency": []}
+    for i, label in enumerate(local_classifier.CATEGORIES):
+        # pgvector values arrive as text unless the adapter is registered
+        stored["category"] += [{"label": label, "embedding": json.dumps(v.tolist()) if i % 2 else list(v)}
+                               for v in make_cluster(axis(i), 10, rng)]
+
+    tier, counts, requested = train_tier(stored)
+    assert counts == {"category": 50, "urgency": 0}
+    assert requested == [("category", tuple(local_classifier.CATEGORIES)), ("urgency", tuple(local_classifier.URGENCIES))]
+    assert tier.predict("category", make_cluster(axis(2), 1, rng)[0])[0] == local_classifier.CATEGORIES[2]
+    # No labels yet: urgency defers to the LLM
+    assert tier.predict("urgency", make_cluster(axis(0), 1, rng)[0]) is None
+    print(f"   {tier.summary()['models']['category']['labels']}")
+
+def test_missing_labels_escalate():
+    """Until every label has a centroid, reports go to the LLM instead of the nearest trained label"""
+    print("\nTesting label starvation...")
+    rng = np.random.default_rng(3)
+    # Only utility and infrastructure have enough LLM examples so far
+    stored = {"category": [{"label": "utility", "embedding": list(v)} for v in make_cluster(axis(0), 10, rng)]
+                          + [{"label": "infrastructure", "embedding": list(v)} for v in make_cluster(axis(1), 10, rng)]
+                          + [{"label": "safety", "embedding": list(v)} for v in make_cluster(axis(2), 2, rng)]}
+    tier, _, _ = train_tier(stored)
+
+    # A safety report sits slightly closer to the utility centroid; the two
+    # trained centroids alone would label it utility with high confidence
+    safety_report = axis(2) + 0.2 * axis(0)
+    label, confidence = tier.models["category"].predict(safety_report)
+    assert label == "utility" and confidence > tier.threshold, (label, confidence)
+    assert tier.predict("category", safety_report) is None
+    assert tier.predict("category", make_cluster(axis(0), 1, rng)[0]) is None
+
+    stats = tier.summary()["models"]["category"]
+    assert stats["missing_labels"] == ["safety", "health", "general"], stats
+    assert stats["local"] == 0 and stats["escalated"] == 2
+    print(f"   Escalated while {stats['missing_labels']} have no centroid")
+
+if __name__ == "__main__":
+    try:
+        test_centroid_classifier()
+        test_sparse_labels_are_skipped()
+        test_local_tier_trains_on_llm_labels()
+        test_missing_labels_escalate()
+        print("\nAll local classifier tests passed!")
+    except Exception as e:
+        print(f"\nTest failed: {e}")
+        import traceback
+        traceback.print_exc()
+        exit(1)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Test the Prometheus-style service metrics (no services needed)
+"""
+
+import sys
+import os
+import asyncio
+
+# Add python directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'python'))
+
+import metrics
+
+def sample(text, line_prefix):
+    """Value of the first exposition line starting with line_prefix"""
+    for line in text.splitlines():
+        if line.startswith(line_prefix + " "):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"{line_prefix} not in output")
+
+def test_exposition_format():
+    """Counters, gauges and cumulative histogram buckets render as Prometheus text"""
+    print("Testing exposition format...")
+    registry = metrics.Registry()
+    errors = metrics.Counter("gemini_errors_total", "Failed Gemini calls", ["operation"], registry=registry)
+    latency = metrics.Histogram("gemini_request_duration_seconds", "Latency", ["operation"],
+                                buckets=(0.1, 1.0), registry=registry)
+    pool = metrics.Gauge("db_pool_connections", "Pool", ["state"], registry=registry)
+
+    errors.labels("classify").inc()
+    errors.labels(operation="classify").inc()
+    for seconds in (0.05, 0.5, 3.0):
+        latency.labels("classify").observe(seconds)
+    pool.labels("in_use").set_function(lambda: 4)
+
+    text = registry.render()
+    assert "# TYPE gemini_request_duration_seconds histogram" in text
+    assert sample(text, 'gemini_errors_total{operation="classify"}') == 2
+    assert sample(text, 'gemini_request_duration_seconds_bucket{operation="classify",le="0.1"}') == 1
+    assert sample(text, 'gemini_request_duration_seconds_bucket{operation="classify",le="1"}') == 2
+    assert sample(text, 'gemini_request_duration_seconds_bucket{operation="classify",le="+Inf"}') == 3
+    assert sample(text, 'gemini_request_duration_seconds_count{operation="classify"}') == 3
+    assert sample(text, 'db_pool_connections{state="in_use"}') == 4
+
+    try:
+        metrics.Counter("gemini_errors_total", "duplicate", registry=registry)
+        raise AssertionError("duplicate metric registered")
+    except ValueError:
+        pass
+    print(f"   {len(text.splitlines())} exposition lines rendered")
+
+class Route:
+    path = "/reports/{report_id}"
+
+def test_middleware_labels_by_route():
+    """Requests are recorded under their route template, not the raw path"""
+    print("\nTesting MetricsMiddleware...")
+    observed = {}
+
+    async def app(scope, receive, send):
+        observed["in_flight"] = metrics.http_requests_in_flight.labels("test_api").get()
+        scope["route"] = Route()
+        await send({"type": "http.response.start", "status": 404, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    middleware = metrics.MetricsMiddleware(app, service_name="test_api")
+    for report_id in ("a1", "b2"):
+        scope = {"type": "http", "method": "GET", "path": f"/reports/{report_id}", "headers": []}
+        asyncio.run(middleware(scope, receive, send))
+
+    text = metrics.REGISTRY.render()
+    labels = 'service="test_api",method="GET",route="/reports/{report_id}"'
+    assert sample(text, f'http_requests_total{{{labels},status="404"}}') == 2
+    assert sample(text, f'http_request_duration_seconds_count{{{labels}}}') == 2
+    assert "/reports/a1" not in text
+    assert observed["in_flight"] == 1 and metrics.http_requests_in_flight.labels("test_api").get() == 0
+    print("   Two requests recorded under one route label")
+
+def test_streaming_paths_skip_latency():
+    """Streams are counted but kept out of the latency histogram and in-flight gauge"""
+    print("\nTesting streaming paths...")
+    observed = {}
+
+    class StreamRoute:
+        path = "/events/reports"
+
+    async def app(scope, receive, send):
+        observed["in_flight"] = metrics.http_requests_in_flight.labels("stream_api").get()
+        scope["route"] = StreamRoute()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    middleware = metrics.MetricsMiddleware(app, service_name="stream_api", streaming_paths=("/events/reports",))
+    asyncio.run(middleware({"type": "http", "method": "GET", "path": "/events/reports", "headers": []}, receive, send))
+
+    text = metrics.REGISTRY.render()
+    labels = 'service="stream_api",method="GET",route="/events/reports"'
+    assert sample(text, f'http_requests_total{{{labels},status="200"}}') == 1
+    assert f'http_request_duration_seconds_count{{{labels}}}' not in text
+    assert observed["in_flight"] == 0
+    print("   Stream counted without a latency sample")
+
+if __name__ == "__main__":
+    try:
+        test_exposition_format()
+        test_middleware_labels_by_route()
+        test_streaming_paths_skip_latency()
+        print("\nAll metrics tests passed!")
+    except Exception as e:
+        print(f"\nTest failed: {e}")
+        import traceback
+        traceback.print_exc()
+        exit(1)
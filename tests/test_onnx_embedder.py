@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Test the ONNX embedder's acceptance gate: cosine agreement and duplicate
+decisions against the torch reference (no model or ONNX Runtime needed)
+"""
+
+import sys
+import os
+import json
+import tempfile
+
+# Add python directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'python'))
+
+import numpy as np
+import onnx_embedder
+
+def test_cosine_agreement():
+    """The gate reports the worst row, whatever the row norms"""
+    print("Testing cosine agreement...")
+    rng = np.random.default_rng(0)
+    reference = rng.standard_normal((8, 384)).astype(np.float32)
+    # Scaling doesn't change cosine similarity
+    assert onnx_embedder.cosine_agreement(reference, reference * 3.0) > 0.9999
+
+    candidate = reference + 0.01 * rng.standard_normal(reference.shape).astype(np.float32)
+    close = onnx_embedder.cosine_agreement(reference, candidate)
+    assert close >= onnx_embedder.MIN_COSINE_AGREEMENT, close
+
+    # One bad row is enough to fail the whole check
+    candidate[3] = rng.standard_normal(384)
+    worst = onnx_embedder.cosine_agreement(reference, candidate)
+    assert worst < 0.5, worst
+    print(f"   Close rows {close:.4f}, with one unrelated row {worst:.4f}")
+
+def test_decision_agreement():
+    """Pairs that cross the duplicate threshold count as mismatches"""
+    print("\nTesting duplicate decision agreement...")
+    threshold = onnx_embedder.DUPLICATE_THRESHOLD
+    reference = np.array([0.95, 0.90, 0.86, 0.60, 0.84])
+    same = onnx_embedder.decision_agreement(reference, reference - 0.005, threshold)
+    assert same["pairs_above"] == 3 and same["pairs_below"] == 2
+    assert same["mismatches"] == 0 and abs(same["max_abs_delta"] - 0.005) < 1e-9
+
+    # 0.86 drops below and 0.84 rises above the threshold
+    crossed = onnx_embedder.decision_agreement(reference, np.array([0.95, 0.90, 0.849, 0.60, 0.851]), threshold)
+    assert crossed["mismatches"] == 2, crossed
+    print(f"   {crossed}")
+
+def test_pair_similarities():
+    """Pair similarities are cosines of the model's embeddings"""
+    print("\nTesting pair similarities...")
+
+    class FakeModel:
+        def encode(self, texts):
+            return np.array([[1.0, 0.0] if "water" in t else [1.0, 1.0] for t in texts])
+
+    sims = onnx_embedder.pair_similarities(FakeModel(), [("water", "water main"), ("water", "road")])
+    assert np.allclose(sims, [1.0, np.sqrt(0.5)]), sims
+    assert len(onnx_embedder.DUPLICATE_PAIRS) == 10
+    print(f"   {sims.round(3).tolist()}")
+
+def test_cached_agreement_and_check():
+    """Old agreement records are re-checked; rejected models raise"""
+    print("\nTesting cached agreement records...")
+    export_dir = tempfile.mkdtemp()
+    assert onnx_embedder._cached_agreement(export_dir) is None
+
+    open(os.path.join(export_dir, "model.int8.onnx"), "wb").close()
+    agreement_path = os.path.join(export_dir, "agreement.json")
+    with open(agreement_path, "w") as f:
+        # Written before the duplicate-decision check existed
+        json.dump({"min_cosine": 0.995, "accepted": True}, f)
+    assert onnx_embedder._cached_agreement(export_dir) is None
+
+    record = {"min_cosine": 0.995, "duplicate_decisions": {"mismatches": 1}, "accepted": False}
+    with open(agreement_path, "w") as f:
+        json.dump(record, f)
+    assert onnx_embedder._cached_agreement(export_dir) == record
+    try:
+        onnx_embedder._check_accepted(record)
+        raise AssertionError("rejected model was accepted")
+    except RuntimeError as e:
+        assert "mismatches" in str(e)
+    onnx_embedder._check_accepted({**record, "accepted": True})
+    print("   Stale records re-exported, rejected models refused")
+
+if __name__ == "__main__":
+    try:
+        test_cosine_agreement()
+        test_decision_agreement()
+        test_pair_similarities()
+        test_cached_agreement_and_check()
+        print("\nAll ONNX embedder tests passed!")
+    except Exception as e:
+        print(f"\nTest failed: {e}")
+        import traceback
+        traceback.print_exc()
+        exit(1)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Test the day-bucket index walkers use to visit pre-PostgreSQL report nodes
+"""
+
+import sys
+import os
+
+# Add jac directory (Python helpers imported by the walkers) to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'jac'))
+
+import report_buckets
+
+# Stand-ins for the Jac nodes; the index only looks at class names and fields
+class Node:
+    def __init__(self):
+        self.children = []
+
+    def out_nodes(self):
+        return list(self.children)
+
+class Root(Node):
+    pass
+
+class Organisation(Node):
+    pass
+
+class ReportBucket(Node):
+    reads = 0
+
+    def __init__(self, key):
+        super().__init__()
+        self.key = key
+
+    def out_nodes(self):
+        ReportBucket.reads += 1
+        return super().out_nodes()
+
+class Report(Node):
+    def __init__(self, id, submitted_at, status="submitted"):
+        super().__init__()
+        self.id = id
+        self.submitted_at = submitted_at
+        self.status = status
+
+def build_graph(days, per_day):
+    """Root with one organisation, a pre-bucketing report and `days` day buckets"""
+    root = Root()
+    root.children.append(Organisation())
+    root.children.append(Report("legacy", "2024-12-31 09:00:00"))
+    for day in range(1, days + 1):
+        bucket = ReportBucket(f"2025-01-{day:02d}")
+        for n in range(per_day):
+            status = "duplicate" if n == 0 else "submitted"
+            bucket.children.append(Report(f"r{day}-{n}", f"2025-01-{day:02d} 10:{n:02d}:00", status))
+        root.children.append(bucket)
+    return root
+
+def test_shard_nodes():
+    """Buckets and root-attached reports newest first, bounded by since_key"""
+    print("Testing shard_nodes...")
+    root = build_graph(days=5, per_day=2)
+    assert report_buckets.bucket_key("2025-01-06 08:00:00.123456") == "2025-01-06"
+    assert report_buckets.bucket_key(None) == "unknown"
+
+    ReportBucket.reads = 0
+    shards = report_buckets.shard_nodes(root, root.out_nodes)
+    assert [type(s).__name__ for s in shards] == ["ReportBucket"] * 5 + ["Report"]
+    assert shards[-1].id == "legacy"
+    # Listing shards never opens a bucket
+    assert ReportBucket.reads == 0
+
+    recent = report_buckets.shard_nodes(root, root.out_nodes, since_key="2025-01-04")
+    assert [s.key for s in recent] == ["2025-01-05", "2025-01-04"]
+    print(f"   {len(shards)} shards, {len(recent)} since 2025-01-04")
+
+def test_index_cached_per_root():
+    """root's out-nodes are listed once per root"""
+    print("\nTesting the per-root index cache...")
+    root = build_graph(days=2, per_day=1)
+    calls = []
+
+    def list_nodes():
+        calls.append(1)
+        return root.out_nodes()
+
+    report_buckets.shard_nodes(root, list_nodes)
+    report_buckets.shard_nodes(root, list_nodes)
+    assert len(calls) == 1, calls
+    other = build_graph(days=1, per_day=1)
+    assert len(report_buckets.shard_nodes(other, other.out_nodes)) == 2
+    print("   Index built once per root")
+
+if __name__ == "__main__":
+    try:
+        test_shard_nodes()
+        test_index_cached_per_root()
+        print("\nAll report bucket tests passed!")
+    except Exception as e:
+        print(f"\nTest failed: {e}")
+        import traceback
+        traceback.print_exc()
+        exit(1)
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Test the compiled routing policy used by RouterAgent and IntakeAgentDB
+"""
+
+import sys
+import os
+
+# Add jac directory (Python helpers imported by the walkers) to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'jac'))
+
+import routing_table
+
+ORGANISATIONS = [
+    {"id": "1", "name": "Kenya Power (KPLC)", "type": "utility", "contact_email": "a@x"},
+    {"id": "2", "name": "Nairobi County Government", "type": "government", "contact_email": "b@x"},
+    {"id": "3", "name": "National Police Service (NPS)", "type": "government", "contact_email": "c@x"},
+    {"id": "4", "name": "Kenyatta National Hospital", "type": "health", "contact_email": "d@x"},
+]
+
+def names(orgs):
+    return sorted(o["name"] for o in orgs)
+
+def test_default_mapping():
+    """Without rules, categories map to the historical org types"""
+    print("Testing default category mapping...")
+    routing_table.set_policy_rules("{}")
+    index = routing_table.OrgIndex(ORGANISATIONS)
+    assert names(routing_table.route(index, "utility")) == ["Kenya Power (KPLC)"]
+    assert len(routing_table.route(index, "infrastructure")) == 3
+    assert len(routing_table.route(index, "general")) == 4
+    print("   Defaults match the old if/elif chains")
+
+def test_policy_rules():
+    """Rules match on urgency, confidence and locations, by priority"""
+    print("\nTesting policy rules...")
+    routing_table.set_policy_rules({
+        "category_org_types": {"health": ["health"]},
+        "rules": [
+            {
+                "name": "nairobi-water-emergencies",
+                "priority": 10,
+                "match": {"category": ["utility"], "urgency": ["high"], "location": ["Nairobi"]},
+                "route_to": {"org_types": ["utility"], "organisations": ["Nairobi County Government"]}
+            },
+            {
+                "name": "low-confidence-review",
+                "priority": 1,
+                "match": {"max_confidence": 0.4},
+                "route_to": {"organisations": ["Nairobi County Government"]}
+            }
+        ]
+    })
+    index = routing_table.OrgIndex(ORGANISATIONS)
+
+    report = {"category": "utility", "urgency": "high", "confidence": 0.9,
+              "entities": '{"locations": ["Nairobi"]}'}
+    assert names(routing_table.route(index, report)) == ["Kenya Power (KPLC)", "Nairobi County Government"]
+    assert routing_table.explain(report)["matched_rules"] == ["nairobi-water-emergencies"]
+
+    # Same report elsewhere falls through to the category default
+    report["entities"] = {"locations": ["Kisumu"]}
+    assert names(routing_table.route(index, report)) == ["Kenya Power (KPLC)"]
+
+    # Category-less rule applies to any category
+    unsure = {"category": "safety", "urgency": "low", "confidence": 0.3}
+    assert names(routing_table.route(index, unsure)) == ["Nairobi County Government"]
+
+    assert names(routing_table.route(index, "health")) == ["Kenyatta National Hospital"]
+    print("   Rules applied in priority order")
+
+def test_db_index_is_cached():
+    """The DB organisation list is fetched once per TTL"""
+    print("\nTesting DB index caching...")
+    routing_table.set_policy_rules("{}")
+    routing_table.invalidate()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return ORGANISATIONS
+
+    for _ in range(5):
+        routing_table.db_orgs_for("safety", fetch)
+    assert len(calls) == 1, calls
+    print("   Organisations fetched once for 5 routing decisions")
+
+def test_db_policy_is_loaded():
+    """IntakeAgentDB's process applies the persisted policy, and picks up edits"""
+    print("\nTesting persisted policy on the DB path...")
+    routing_table.set_policy_rules("{}")
+    routing_table.invalidate()
+    persisted = {"rules": {}}
+    policy_calls = []
+
+    def fetch_policy():
+        policy_calls.append(1)
+        return persisted["rules"]
+
+    def fetch():
+        return ORGANISATIONS
+
+    report = {"category": "utility", "urgency": "high", "entities": {"locations": ["Nairobi"]}}
+    assert names(routing_table.db_orgs_for(report, fetch, fetch_policy)) == ["Kenya Power (KPLC)"]
+
+    persisted["rules"] = {"rules": [{
+        "name": "high-urgency-water",
+        "match": {"category": ["utility"], "urgency": ["high"]},
+        "route_to": {"organisations": ["Nairobi County Government"]}
+    }]}
+    # Cached until the TTL expires (or the tables are invalidated)
+    assert names(routing_table.db_orgs_for(report, fetch, fetch_policy)) == ["Kenya Power (KPLC)"]
+    routing_table.invalidate()
+    assert names(routing_table.db_orgs_for(report, fetch, fetch_policy)) == ["Nairobi County Government"]
+    assert len(policy_calls) == 2, policy_calls
+
+    # An unreachable db_api keeps the last good policy
+    def failing():
+        raise ConnectionError("db_api down")
+
+    routing_table.invalidate()
+    assert names(routing_table.db_orgs_for(report, fetch, failing)) == ["Nairobi County Government"]
+    print("   Persisted rule applied after reload")
+
+def test_db_route_applies_policy_before_proximity():
+    """Nearest facilities only trim the category default; matched rules win"""
+    print("\nTesting policy-then-proximity routing...")
+    routing_table.set_policy_rules({"rules": [{
+        "name": "high-urgency-water",
+        "match": {"category": ["utility"], "urgency": ["high"]},
+        "route_to": {"organisations": ["Nairobi County Government"]}
+    }]})
+    routing_table.invalidate()
+    asked = []
+
+    def fetch():
+        return ORGANISATIONS
+
+    def find_nearest(locations, organisation_ids):
+        asked.append(sorted(organisation_ids))
+        # Pretend only the police have a facility near the report
+        return [o for o in ORGANISATIONS if o["id"] == "3" and o["id"] in organisation_ids]
+
+    located = {"entities": {"locations": ["Embakasi"]}}
+    urgent_water = {"category": "utility", "urgency": "high", **located}
+    assert names(routing_table.db_route(urgent_water, ["Embakasi"], fetch, None, find_nearest)) == \
+        ["Nairobi County Government"]
+    assert asked == []
+
+    # Default fan-out to every government org is trimmed to the nearest one
+    safety = {"category": "safety", "urgency": "low", **located}
+    assert names(routing_table.db_route(safety, ["Embakasi"], fetch, None, find_nearest)) == \
+        ["National Police Service (NPS)"]
+    assert asked == [["2", "3"]]
+
+    # Nobody nearby: keep every policy target rather than dropping the report
+    water = {"category": "utility", "urgency": "low", **located}
+    assert names(routing_table.db_route(water, ["Embakasi"], fetch, None, find_nearest)) == \
+        ["Kenya Power (KPLC)"]
+    routing_table.set_policy_rules("{}")
+    print("   Rules decide targets, proximity ranks within them")
+
+def test_all_orgs_ignores_policy():
+    """Broadcasts reach every organisation even under a catch-all rule"""
+    print("\nTesting broadcast to all organisations...")
+
+    class Organisation:
+        def __init__(self, org):
+            self.__dict__.update(org)
+
+    class Root:
+        pass
+
+    routing_table.set_policy_rules({
+        "category_org_types": {"*": ["health"]},
+        "rules": [{"name": "catch-all", "route_to": {"org_types": ["nonexistent"]}}]
+    })
+    root = Root()
+    nodes = [Organisation(org) for org in ORGANISATIONS]
+    scans = []
+
+    def list_nodes():
+        scans.append(1)
+        return nodes
+
+    assert routing_table.graph_orgs_for(root, "*", list_nodes) == []
+    assert len(routing_table.all_orgs(root, list_nodes)) == 4
+    assert len(scans) == 1, scans
+    routing_table.set_policy_rules("{}")
+    print("   Catch-all rule doesn't narrow the broadcast")
+
+def test_graph_route_uses_proximity():
+    """The graph path trims a category default to the nearest organisations too"""
+    print("\nTesting graph routing by proximity...")
+
+    class Organisation:
+        def __init__(self, org):
+            self.__dict__.update(org)
+
+    class Root:
+        pass
+
+    routing_table.set_policy_rules("{}")
+    routing_table.invalidate()
+    root = Root()
+    nodes = [Organisation(org) for org in ORGANISATIONS]
+    asked = []
+
+    def find_nearest(locations, org_types):
+        asked.append((locations, org_types))
+        # Database rows for the same organisations, nearest first
+        return [{"id": "db-3", "name": "National Police Service (NPS)", "type": "government"}]
+
+    report = {"category": "safety", "urgency": "low", "entities": '{"locations": ["Embakasi"]}'}
+    selected = routing_table.graph_route(root, report, lambda: nodes, find_nearest)
+    assert [o.name for o in selected] == ["National Police Service (NPS)"], selected
+    assert asked == [(["Embakasi"], ["government"])]
+
+    # No locations: every policy target, no lookup
+    assert len(routing_table.graph_route(root, {"category": "safety"}, lambda: nodes, find_nearest)) == 2
+    assert len(asked) == 1
+    print("   Nearest government organisation selected")
+
+if __name__ == "__main__":
+    try:
+        test_default_mapping()
+        test_policy_rules()
+        test_db_index_is_cached()
+        test_db_policy_is_loaded()
+        test_db_route_applies_policy_before_proximity()
+        test_all_orgs_ignores_policy()
+        test_graph_route_uses_proximity()
+        print("\nAll routing table tests passed!")
+    except Exception as e:
+        print(f"\nTest failed: {e}")
+        import traceback
+        traceback.print_exc()
+        exit(1)
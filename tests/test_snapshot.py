@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Test the monthly-partitioned Parquet / Arrow IPC snapshot writer (no database needed)
+"""
+
+import sys
+import os
+import json
+import tempfile
+from datetime import datetime
+
+# Add python directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'python'))
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import crud
+from snapshot import EMBEDDING_DIM, SCHEMAS, UNKNOWN_MONTH, partition_dir, write_partitions, _refresh_cutoff
+
+def report_rows(months, per_month):
+    """Rows in crud.SNAPSHOT_TABLES["reports"] order, oldest first"""
+    for m in months:
+        for i in range(per_month):
+            embedding = [((i + d) % 7) / 7.0 for d in range(EMBEDDING_DIM)] if i % 3 else None
+            yield (f"r-{m}-{i}", f"Burst pipe {i}", "Maji yamepasuka", "utility", "high", "routed", 0.9,
+                   json.dumps({"locations": ["Kibera"]}), datetime(2025, m, 1 + i % 28, 8, 0), datetime(2025, m, 1),
+                   None, None, None, -1234567890123 if i == 0 else None, i % 2 == 0, embedding)
+
+def test_parquet_partitions():
+    """One zstd Parquet file per month with fixed-size float32 embeddings"""
+    print("Testing Parquet partitions...")
+    with tempfile.TemporaryDirectory() as out:
+        written = write_partitions("reports", report_rows([1, 2, 3], 120), out, "parquet", batch_rows=50)
+        assert written == {"2025-01": 120, "2025-02": 120, "2025-03": 120}
+
+        path = os.path.join(partition_dir(out, "reports", "2025-02"), "part-0.parquet")
+        metadata = pq.ParquetFile(path).metadata
+        assert metadata.num_row_groups == 3
+        assert metadata.row_group(0).column(0).compression == "ZSTD"
+
+        table = pq.read_table(path, memory_map=True)
+        assert table.schema.field("embedding").type == pa.list_(pa.float32(), EMBEDDING_DIM)
+        assert table.column("embedding").null_count == 40
+        vectors = table.column("embedding").combine_chunks()
+        assert len(vectors.values) == 120 * EMBEDDING_DIM
+        assert table.column("image_hash")[0].as_py() == -1234567890123
+
+        # Hive partitioning: the month comes back as a column
+        dataset = pq.read_table(os.path.join(out, "reports"))
+        assert dataset.num_rows == 360 and "month" in dataset.column_names
+        assert not [n for n in os.listdir(partition_dir(out, "reports", "2025-01")) if n.startswith(".")]
+    print(f"   {sum(written.values())} rows in {len(written)} partitions")
+
+def test_arrow_ipc_memory_map():
+    """Arrow IPC partitions are readable zero-copy through a memory map"""
+    print("\nTesting Arrow IPC partitions...")
+    with tempfile.TemporaryDirectory() as out:
+        write_partitions("reports", report_rows([4], 30), out, "arrow")
+        path = os.path.join(partition_dir(out, "reports", "2025-04"), "part-0.arrow")
+        with pa.memory_map(path) as source:
+            table = pa.ipc.open_file(source).read_all()
+            assert table.num_rows == 30
+            assert pa.total_allocated_bytes() < 30 * EMBEDDING_DIM * 4
+            assert table.column("embedding")[1].values.to_pylist()[1] == pa.scalar(2 / 7.0, pa.float32()).as_py()
+
+        # Rewriting a month in the other format replaces its files
+        write_partitions("reports", report_rows([4], 10), out, "parquet")
+        assert os.listdir(partition_dir(out, "reports", "2025-04")) == ["part-0.parquet"]
+    print("   30 rows memory mapped")
+
+def test_routes_and_unknown_month():
+    """Rows without a timestamp go to the unknown partition; unordered input is rejected"""
+    print("\nTesting routes partitions...")
+    with tempfile.TemporaryDirectory() as out:
+        assert set(SCHEMAS) == set(crud.SNAPSHOT_TABLES)
+        rows = [("rt-1", "r-1", "o-1", "Nairobi Water", "utility", "Burst pipe", "sent", datetime(2025, 5, 2)),
+                ("rt-2", "r-2", "o-1", "Nairobi Water", "utility", None, "sent", None)]
+        assert write_partitions("report_routes", rows, out) == {"2025-05": 1, UNKNOWN_MONTH: 1}
+
+        unordered = [rows[0], ("rt-3", "r-3", None, None, None, None, "sent", datetime(2025, 6, 1)), rows[0]]
+        try:
+            write_partitions("report_routes", unordered, out)
+            raise AssertionError("expected unordered rows to fail")
+        except ValueError:
+            pass
+        # The failed run left the earlier May file in place
+        table = pq.read_table(os.path.join(partition_dir(out, "report_routes", "2025-05"), "part-0.parquet"))
+        assert table.num_rows == 1
+    print("   Partitions by sent_at")
+
+def test_refresh_cutoff():
+    print("\nTesting refresh window...")
+    assert _refresh_cutoff(datetime(2025, 3, 15), 2) == "2025-02"
+    assert _refresh_cutoff(datetime(2025, 1, 15), 2) == "2024-12"
+    assert _refresh_cutoff(datetime(2025, 1, 15), 13) == "2024-01"
+    assert _refresh_cutoff(datetime(2025, 1, 15), 0) == "2025-01"
+    print("   Window spans year boundaries")
+
+if __name__ == "__main__":
+    try:
+        test_parquet_partitions()
+        test_arrow_ipc_memory_map()
+        test_routes_and_unknown_month()
+        test_refresh_cutoff()
+        print("\nAll snapshot tests passed!")
+    except Exception as e:
+        print(f"\nTest failed: {e}")
+        import traceback
+        traceback.print_exc()
+        exit(1)
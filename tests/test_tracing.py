@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Test pipeline tracing: trace context, span nesting and the OTLP/JSON file sink
+(no services needed)
+"""
+
+import sys
+import os
+import json
+import asyncio
+import tempfile
+
+# Add python directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'python'))
+
+import tracing
+
+def use_temp_file():
+    path = os.path.join(tempfile.mkdtemp(), "traces.otlp.jsonl")
+    tracing.exporter = tracing.FileExporter(path, enabled=True)
+    return path
+
+def test_trace_context():
+    """traceparent headers round trip and malformed ones are ignored"""
+    print("Testing trace context...")
+    s = tracing.start_span("walker", root=True)
+    assert tracing.parse_traceparent(s.traceparent()) == (s.trace_id, s.span_id)
+    for bad in [None, "", "00-abc-def-01", "00-" + "0" * 32 + "-" + "1" * 16 + "-01", "00-" + "z" * 32 + "-" + "1" * 16 + "-01"]:
+        assert tracing.parse_traceparent(bad) is None, bad
+
+    child = tracing.start_span("remote", parent=s.traceparent())
+    assert child.trace_id == s.trace_id and child.parent_id == s.span_id
+    print(f"   {s.traceparent()}")
+
+def test_spans_written_as_otlp():
+    """Nested spans share a trace and are flushed as OTLP/JSON lines"""
+    print("\nTesting span nesting and file export...")
+    path = use_temp_file()
+    tracing.configure("test_service")
+
+    with tracing.span("IntakeAgent") as root:
+        with tracing.span("embedding.encode", batch_size=1):
+            assert tracing.inject()["traceparent"].split("-")[1] == root.trace_id
+        try:
+            with tracing.span("gemini.generate_content"):
+                raise RuntimeError("quota exceeded")
+        except RuntimeError:
+            pass
+    assert tracing.current_span() is None
+    tracing.exporter.flush()
+
+    with open(path) as f:
+        batch = json.loads(f.readline())
+    resource = batch["resourceSpans"][0]
+    assert {"key": "service.name", "value": {"stringValue": "test_service"}} in resource["resource"]["attributes"]
+
+    spans = {s["name"]: s for s in tracing.read_spans(path)}
+    assert set(spans) == {"IntakeAgent", "embedding.encode", "gemini.generate_content"}
+    assert spans["embedding.encode"]["parentSpanId"] == spans["IntakeAgent"]["spanId"]
+    assert "parentSpanId" not in spans["IntakeAgent"]
+    assert spans["gemini.generate_content"]["status"]["code"] == tracing.STATUS_ERROR
+    assert {"key": "batch_size", "value": {"intValue": "1"}} in spans["embedding.encode"]["attributes"]
+
+    rows = tracing.stage_summary(tracing.read_spans(path))
+    assert rows[0]["name"] == "IntakeAgent" and all(row["count"] == 1 for row in rows)
+    print(f"   {len(spans)} spans exported, slowest stage: {rows[0]['name']}")
+
+def test_middleware_continues_caller_trace():
+    """The ASGI middleware opens a SERVER span under the incoming traceparent"""
+    print("\nTesting TraceMiddleware...")
+    path = use_temp_file()
+    caller = tracing.start_span("POST /find_duplicates", tracing.KIND_CLIENT, root=True)
+    seen = {}
+
+    async def app(scope, receive, send):
+        seen["span"] = tracing.current_span()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/find_duplicates",
+        "headers": [(b"traceparent", caller.traceparent().encode())]
+    }
+    asyncio.run(tracing.TraceMiddleware(app, service_name="nlp_service")(scope, receive, send))
+    tracing.exporter.flush()
+
+    (server,) = tracing.read_spans(path)
+    assert server["traceId"] == caller.trace_id and server["parentSpanId"] == caller.span_id
+    assert server["kind"] == tracing.KIND_SERVER and server["service"] == "nlp_service"
+    assert seen["span"].span_id == server["spanId"]
+    print(f"   Server span {server['name']} continues trace {server['traceId'][:8]}...")
+
+if __name__ == "__main__":
+    try:
+        test_trace_context()
+        test_spans_written_as_otlp()
+        test_middleware_continues_caller_trace()
+        print("\nAll tracing tests passed!")
+    except Exception as e:
+        print(f"\nTest failed: {e}")
+        import traceback
+        traceback.print_exc()
+        exit(1)